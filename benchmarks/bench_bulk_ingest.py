@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Benchmark of OCFLRepository.add_many with different numbers of workers.
+
+Usage::
+
+    python benchmarks/bench_bulk_ingest.py --objects 2000 --files 5
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from generators import make_object
+
+from ocflcore import FileSystemStorage, OCFLRepository, StorageRoot, TopLevelLayout
+
+
+def make_objects(objects, files, size):
+    """Generate objects with the given number of files."""
+    for i in range(objects):
+        yield make_object(f"object-{i:07d}", files=files, size=size)[0]
+
+
+def run(objects, files, size, workers):
+    """Ingest objects into a fresh repository and return the elapsed time."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = FileSystemStorage(os.path.join(tmpdir, "root"))
+        workspace = FileSystemStorage(os.path.join(tmpdir, "workspace"))
+        repository = OCFLRepository(
+            StorageRoot(TopLevelLayout()), storage, workspace_storage=workspace
+        )
+        repository.initialize()
+        start = time.perf_counter()
+        if workers == 0:
+            for obj in make_objects(objects, files, size):
+                repository.add(obj)
+        else:
+            results = repository.add_many(
+                make_objects(objects, files, size), workers=workers
+            )
+            assert all(r.error is None for r in results)
+        return time.perf_counter() - start
+
+
+def main():
+    """Run the benchmark (0 workers means a loop calling ``add()``)."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--objects", type=int, default=2000)
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--size", type=int, default=16 * 1024)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 4, 8])
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        elapsed = run(args.objects, args.files, args.size, workers)
+        print(
+            f"workers={workers:<3} {elapsed:8.2f}s "
+            f"{args.objects / elapsed:10.0f} objects/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
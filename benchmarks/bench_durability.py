@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Benchmark of OCFLRepository.add for each durability level.
+
+Usage::
+
+    python benchmarks/bench_durability.py --files 1000 --size 102400 --dir /data
+
+Use ``--dir`` to run on the file system of interest; temporary directories are
+often on tmpfs where flushing is free.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from generators import make_object
+
+from ocflcore import FileSystemStorage, OCFLRepository, StorageRoot, TopLevelLayout
+
+
+def run(files, size, durability, directory):
+    """Add an object to a fresh repository and return the elapsed time."""
+    obj, _ = make_object(files=files, size=size)
+    with tempfile.TemporaryDirectory(dir=directory) as tmpdir:
+        storage = FileSystemStorage(os.path.join(tmpdir, "root"), durability=durability)
+        workspace = FileSystemStorage(
+            os.path.join(tmpdir, "workspace"), durability=durability
+        )
+        repository = OCFLRepository(
+            StorageRoot(TopLevelLayout()), storage, workspace_storage=workspace
+        )
+        repository.initialize()
+        start = time.perf_counter()
+        repository.add(obj)
+        return time.perf_counter() - start
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=100 * 1024)
+    parser.add_argument("--dir", default=None)
+    parser.add_argument(
+        "--durability",
+        nargs="+",
+        default=list(FileSystemStorage.durability_levels),
+    )
+    args = parser.parse_args()
+
+    total_mb = args.files * args.size / 1024 / 1024
+    for durability in args.durability:
+        elapsed = run(args.files, args.size, durability, args.dir)
+        print(
+            f"durability={durability:<7} {elapsed:8.2f}s "
+            f"{args.files / elapsed:10.0f} files/s {total_mb / elapsed:8.1f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Benchmark of building the inventories of all versions of an object.
+
+Compares building a separate ``Inventory`` per version number (quadratic in
+the number of versions) with ``Inventory.for_versions()`` (single pass).
+
+Usage::
+
+    python benchmarks/bench_inventory.py --versions 500 --files 5000
+"""
+
+import argparse
+import time
+
+from generators import make_object
+
+from ocflcore.persistence.inventory import Inventory
+
+
+def per_version(obj, serialize):
+    """Build one inventory per version number."""
+    for version_number in obj.version_numbers:
+        inventory = Inventory(obj, version=version_number)
+        inventory.json if serialize else inventory.to_dict()
+
+
+def single_pass(obj, serialize):
+    """Build all inventories in a single pass."""
+    for inventory in Inventory.for_versions(obj):
+        inventory.json if serialize else inventory.to_dict()
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--versions", type=int, nargs="+", default=[25, 50, 100])
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--changes", type=int, default=10)
+    parser.add_argument(
+        "--serialize", action="store_true", help="Include JSON serialization."
+    )
+    args = parser.parse_args()
+
+    for versions in args.versions:
+        obj, _ = make_object(
+            files=args.files,
+            size=8,
+            versions=versions,
+            changes=args.changes / args.files,
+            content=False,
+        )
+        for func in [per_version, single_pass]:
+            start = time.perf_counter()
+            func(obj, args.serialize)
+            elapsed = time.perf_counter() - start
+            print(
+                f"versions={versions:<5} files={args.files:<6} "
+                f"{func.__name__:<12} {elapsed:8.3f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
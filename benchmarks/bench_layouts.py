@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Benchmark of object create and lookup latency per storage layout.
+
+Only the object root directories and their conformance declarations are
+created, so the benchmark measures the cost of the directory hierarchy.
+
+Usage::
+
+    python benchmarks/bench_layouts.py --objects 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from ocflcore import HashAndIdNTupleLayout, HashedNTupleLayout, TopLevelLayout
+
+
+def run(layout, object_ids, root):
+    """Create and look up all objects, returning the elapsed times."""
+    start = time.perf_counter()
+    for object_id in object_ids:
+        path = os.path.join(root, layout.path_for_id(object_id))
+        os.makedirs(path)
+        open(os.path.join(path, "0=ocfl_object_1.1"), "wb").close()
+    create = time.perf_counter() - start
+
+    lookups = random.sample(object_ids, len(object_ids))
+    start = time.perf_counter()
+    for object_id in lookups:
+        path = os.path.join(root, layout.path_for_id(object_id))
+        os.stat(os.path.join(path, "0=ocfl_object_1.1"))
+    lookup = time.perf_counter() - start
+    return create, lookup
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--objects", type=int, default=100000)
+    parser.add_argument("--dir", default=None, help="Directory to run in.")
+    args = parser.parse_args()
+
+    object_ids = [f"ark:/12345/object-{i:08d}" for i in range(args.objects)]
+    layouts = [
+        ("top-level", TopLevelLayout()),
+        ("0004-hashed-n-tuple", HashedNTupleLayout()),
+        ("0003-hash-and-id-n-tuple", HashAndIdNTupleLayout()),
+    ]
+    for name, layout in layouts:
+        if isinstance(layout, TopLevelLayout):
+            # Top-level paths must be a single path element.
+            ids = [HashAndIdNTupleLayout.encode_id(i) for i in object_ids]
+        else:
+            ids = object_ids
+        with tempfile.TemporaryDirectory(dir=args.dir) as root:
+            create, lookup = run(layout, ids, root)
+        n = len(ids)
+        print(
+            f"{name:<26} create {create / n * 1e6:8.1f} us/object "
+            f"lookup {lookup / n * 1e6:8.1f} us/object"
+        )
+
+
+if __name__ == "__main__":
+    main()
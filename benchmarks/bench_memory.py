@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Benchmark of the memory used by the files of an object.
+
+Measures the memory (with ``tracemalloc``) held by the files of all versions
+of an object where each version modifies a few files of the previous version.
+The object is either created in memory with ``FilesManager.add()``, derived
+version by version with ``OCFLVersion.from_previous()``, or loaded from an
+inventory.
+
+Usage::
+
+    python benchmarks/bench_memory.py --files 100000 --versions 10
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from generators import make_object
+
+from ocflcore import FileSystemStorage
+from ocflcore.persistence.inventory import Inventory, object_from_inventory
+
+
+def measure(func):
+    """Memory held by the result of a function, in bytes."""
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def load_all(inventory):
+    """Load an object and the files of all its versions."""
+    # Content is never opened, the storage root does not need to exist.
+    storage = FileSystemStorage("bench-root")
+    obj = object_from_inventory(inventory, storage, "bench-object")
+    for v in obj.versions:
+        len(v.files)
+    return obj
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--versions", type=int, default=10)
+    parser.add_argument("--changes", type=int, default=10)
+    args = parser.parse_args()
+
+    total = args.files * args.versions
+
+    def create(derived):
+        obj, _ = make_object(
+            files=args.files,
+            size=8,
+            versions=args.versions,
+            changes=args.changes / args.files,
+            derived=derived,
+            content=False,
+        )
+        return obj
+
+    obj, created = measure(lambda: create(False))
+    inventory = Inventory(obj).to_dict()
+    del obj
+    _, derived = measure(lambda: create(True))
+    _, loaded = measure(lambda: load_all(inventory))
+    for name, size in [("created", created), ("derived", derived), ("loaded", loaded)]:
+        print(
+            f"{name:<8} {size / 1024 / 1024:8.1f} MB "
+            f"{size / total:6.0f} bytes/file ({total} files)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Benchmark of sequential vs. parallel content writes in OCFLRepository.add.
+
+Usage::
+
+    python benchmarks/bench_parallel_add.py --files 10000 --size 102400
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from generators import make_object
+
+from ocflcore import FileSystemStorage, OCFLRepository, StorageRoot, TopLevelLayout
+
+
+def run(files, size, max_workers):
+    """Add an object to a fresh repository and return the elapsed time."""
+    obj, _ = make_object(files=files, size=size)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = FileSystemStorage(os.path.join(tmpdir, "root"))
+        workspace = FileSystemStorage(os.path.join(tmpdir, "workspace"))
+        repository = OCFLRepository(
+            StorageRoot(TopLevelLayout()),
+            storage,
+            workspace_storage=workspace,
+            max_workers=max_workers,
+        )
+        repository.initialize()
+        start = time.perf_counter()
+        repository.add(obj)
+        return time.perf_counter() - start
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--size", type=int, default=100 * 1024)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    total_mb = args.files * args.size / 1024 / 1024
+    for workers in args.workers:
+        elapsed = run(args.files, args.size, workers)
+        print(
+            f"max_workers={workers:<3} {elapsed:8.2f}s "
+            f"{args.files / elapsed:10.0f} files/s {total_mb / elapsed:8.1f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
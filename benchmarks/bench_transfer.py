@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Benchmark of writing a large local file with the storage transfer modes.
+
+The ``stream`` case wraps the file so it is copied through the Python
+read/write loop, which was the only method before zero-copy transfers.
+
+Usage::
+
+    python benchmarks/bench_transfer.py --size 4096 --dir /data/tmp
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from ocflcore import FileSystemStorage
+
+
+class Stream:
+    """Wrapper hiding the file descriptor of a file."""
+
+    def __init__(self, fp):
+        """Constructor."""
+        self._fp = fp
+
+    def read(self, size=-1):
+        """Read from the file."""
+        return self._fp.read(size)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1024, help="Size in MB.")
+    parser.add_argument("--dir", default=None, help="Directory to run in.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmpdir:
+        src = os.path.join(tmpdir, "source.bin")
+        with open(src, "wb") as fp:
+            for _ in range(args.size):
+                fp.write(os.urandom(1024 * 1024))
+
+        cases = [("stream", "copy"), ("copy", "copy"), ("link", "link")]
+        for name, mode in cases:
+            storage = FileSystemStorage(os.path.join(tmpdir, name), mode)
+            with open(src, "rb") as fp:
+                stream = Stream(fp) if name == "stream" else fp
+                start = time.perf_counter()
+                storage.write("target.bin", stream)
+                elapsed = time.perf_counter() - start
+            print(f"{name:<8} {elapsed:8.3f}s {args.size / elapsed:10.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
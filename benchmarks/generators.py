@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Synthetic OCFL objects for the benchmarks.
+
+Content is generated deterministically from a content number, so files are
+created with a callable regenerating their stream when written instead of
+holding all payloads in memory.
+"""
+
+import hashlib
+import random
+from datetime import datetime, timezone
+from io import BytesIO
+
+from ocflcore import OCFLObject, OCFLVersion
+
+
+def make_content(number, size):
+    """Generate the bytes of a content number."""
+    prefix = number.to_bytes(8, "big")
+    if size <= len(prefix):
+        return prefix[:size]
+    rest = random.Random(number).getrandbits(8 * (size - 8)).to_bytes(size - 8, "big")
+    return prefix + rest
+
+
+def content_file(number, size):
+    """Stream factory and digest of a content number."""
+    digest = hashlib.sha512(make_content(number, size)).hexdigest()
+    return (lambda: BytesIO(make_content(number, size))), digest
+
+
+def make_object(
+    object_id="bench-object",
+    files=1000,
+    size=4096,
+    versions=1,
+    dedup=0.0,
+    changes=0.1,
+    derived=False,
+    content=True,
+):
+    """Create an object with synthetic content.
+
+    :param files: Number of files in each version.
+    :param size: Size of each file in bytes.
+    :param versions: Number of versions.
+    :param dedup: Fraction of the files of the first version duplicating the
+        content of another file.
+    :param changes: Fraction of the files modified by each further version.
+    :param derived: Whether further versions are derived from the previous
+        version with ``OCFLVersion.from_previous()``.
+    :param content: Whether files have a stream of their content. Without,
+        only their digests are set (e.g. to measure memory).
+    :returns: A tuple of the object and the number of unique content bytes.
+    """
+    unique = max(1, round(files * (1 - dedup)))
+    current = {i: i % unique for i in range(files)}
+    counter = unique
+    digests = {}
+
+    def version_file(i):
+        number = current[i]
+        if number not in digests:
+            stream, digest = content_file(number, size)
+            digests[number] = (stream if content else None), digest
+        return (f"data/file-{i:07d}.bin",) + digests[number]
+
+    o = OCFLObject(object_id)
+    for n in range(versions):
+        modified = []
+        if n:
+            for i in range(max(1, round(files * changes))):
+                modified.append((n * 7919 + i) % files)
+                current[modified[-1]] = counter
+                counter += 1
+        if n and derived:
+            v = OCFLVersion.from_previous(o.head, datetime.now(timezone.utc))
+            for i in modified:
+                v.files.replace(*version_file(i))
+        else:
+            v = OCFLVersion(datetime.now(timezone.utc))
+            for i in current:
+                v.files.add(*version_file(i))
+        o.versions.append(v)
+    return o, counter * size
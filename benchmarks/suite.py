@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Benchmark suite of the hot paths of OCFL Core.
+
+Runs each benchmark for every combination of the given parameters in a
+separate process (so the peak RSS is per benchmark) inside a temporary
+directory, and reports MB/s, files/s, peak RSS and inventory size. Results
+can be written as JSON and compared with the results of another commit.
+
+Usage::
+
+    python benchmarks/suite.py --files 1000 10000 --output results.json
+    python benchmarks/suite.py --files 1000 10000 --compare results.json
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+from generators import make_content, make_object
+
+from ocflcore import (
+    FileSystemStorage,
+    OCFLRepository,
+    StorageRoot,
+    StreamDigest,
+    TopLevelLayout,
+)
+from ocflcore.persistence.inventory import Inventory
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    """Register a benchmark function."""
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def make_repository(tmpdir):
+    """Create a repository in a directory."""
+    repository = OCFLRepository(
+        StorageRoot(TopLevelLayout()),
+        FileSystemStorage(os.path.join(tmpdir, "root")),
+        workspace_storage=FileSystemStorage(os.path.join(tmpdir, "workspace")),
+    )
+    repository.initialize()
+    return repository
+
+
+def timed(func, *args):
+    """Call a function and return its elapsed time."""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+@benchmark
+def ingest(tmpdir, files, size, versions, dedup):
+    """Add an object with ``OCFLRepository.add``."""
+    obj, nbytes = make_object(files=files, size=size, versions=versions, dedup=dedup)
+    repository = make_repository(tmpdir)
+    elapsed = timed(repository.add, obj)
+    inventory = os.path.join(tmpdir, "root", obj.id, "inventory.json")
+    return {
+        "elapsed": elapsed,
+        "bytes": nbytes,
+        "files": files * versions,
+        "inventory_bytes": os.path.getsize(inventory),
+    }
+
+
+@benchmark
+def inventory_json(tmpdir, files, size, versions, dedup):
+    """Serialize the root inventory with ``Inventory.json``."""
+    obj, _ = make_object(files=files, size=size, versions=versions, dedup=dedup)
+    result = {}
+
+    def serialize():
+        result["inventory_bytes"] = len(Inventory(obj).json)
+
+    result["elapsed"] = timed(serialize)
+    result["bytes"] = result["inventory_bytes"]
+    result["files"] = files * versions
+    return result
+
+
+@benchmark
+def stream_digest(tmpdir, files, size, versions, dedup):
+    """Compute digests with ``StreamDigest.digest``."""
+    streams = [BytesIO(make_content(i, size)) for i in range(files)]
+
+    def digest():
+        for stream in streams:
+            StreamDigest(stream).digest
+
+    return {"elapsed": timed(digest), "bytes": files * size, "files": files}
+
+
+@benchmark
+def list_objects(tmpdir, files, size, versions, dedup):
+    """List ``files`` objects with ``OCFLRepository.list_objects``."""
+    repository = make_repository(tmpdir)
+    for i in range(files):
+        path = os.path.join(tmpdir, "root", f"object-{i:07d}")
+        os.makedirs(path)
+        open(os.path.join(path, "0=ocfl_object_1.1"), "wb").close()
+    count = []
+    elapsed = timed(lambda: count.append(sum(1 for _ in repository.list_objects())))
+    assert count == [files]
+    return {"elapsed": elapsed, "bytes": 0, "files": files}
+
+
+@benchmark
+def validate(tmpdir, files, size, versions, dedup):
+    """Validate an object with ``OCFLRepository.validate``."""
+    obj, _ = make_object(files=files, size=size, versions=versions, dedup=dedup)
+    repository = make_repository(tmpdir)
+    repository.add(obj)
+    reports = []
+    elapsed = timed(lambda: reports.append(repository.validate(obj.id)))
+    assert reports[0].valid
+    metrics = reports[0].metrics
+    return {"elapsed": elapsed, "bytes": metrics.bytes, "files": metrics.files}
+
+
+def peak_rss():
+    """Peak resident set size of the process in MB."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def run_child(name, params, directory, queue):
+    """Run a benchmark in a child process and put its result on a queue."""
+    with tempfile.TemporaryDirectory(dir=directory) as tmpdir:
+        result = BENCHMARKS[name](tmpdir, **params)
+    result["peak_rss_mb"] = peak_rss()
+    queue.put(result)
+
+
+def run(name, params, directory=None, repeat=1):
+    """Run a benchmark, keeping the fastest of several runs."""
+    best = None
+    for _ in range(repeat):
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=run_child, args=(name, params, directory, queue)
+        )
+        process.start()
+        result = queue.get()
+        process.join()
+        if best is None or result["elapsed"] < best["elapsed"]:
+            best = result
+    elapsed = max(best["elapsed"], 1e-9)
+    best["mb_per_s"] = best["bytes"] / 1024 / 1024 / elapsed
+    best["files_per_s"] = best["files"] / elapsed
+    return {"benchmark": name, "params": params, **best}
+
+
+def git_commit():
+    """Commit of the working directory, if in a git repository."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result):
+    """Key identifying a benchmark and its parameters."""
+    return json.dumps([result["benchmark"], result["params"]], sort_keys=True)
+
+
+def print_result(result, baseline=None):
+    """Print a result, compared with a baseline result if given."""
+    params = " ".join(f"{k}={v}" for k, v in result["params"].items())
+    line = (
+        f"{result['benchmark']:<15} {params:<45} {result['elapsed']:8.3f}s "
+        f"{result['mb_per_s']:9.1f} MB/s {result['files_per_s']:10.0f} files/s"
+    )
+    if result.get("peak_rss_mb") is not None:
+        line += f" {result['peak_rss_mb']:7.1f} MB RSS"
+    if result.get("inventory_bytes"):
+        line += f" inventory {result['inventory_bytes'] / 1024:.0f} KB"
+    if baseline is not None:
+        line += f" ({baseline['elapsed'] / result['elapsed']:.2f}x)"
+    print(line)
+
+
+def main():
+    """Run the benchmark suite."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--benchmarks", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS)
+    )
+    parser.add_argument("--files", type=int, nargs="+", default=[1000])
+    parser.add_argument("--size", type=int, nargs="+", default=[4096])
+    parser.add_argument("--versions", type=int, nargs="+", default=[1])
+    parser.add_argument("--dedup", type=float, nargs="+", default=[0.0])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--dir", default=None, help="Directory to run in.")
+    parser.add_argument("--output", help="Write the results as JSON to a file.")
+    parser.add_argument("--compare", help="JSON results to compare with.")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = {result_key(r): r for r in json.load(fp)["results"]}
+
+    results = []
+    for name in args.benchmarks:
+        for files, size, versions, dedup in itertools.product(
+            args.files, args.size, args.versions, args.dedup
+        ):
+            params = {
+                "files": files,
+                "size": size,
+                "versions": versions,
+                "dedup": dedup,
+            }
+            result = run(name, params, directory=args.dir, repeat=args.repeat)
+            print_result(result, baseline.get(result_key(result)))
+            results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "date": datetime.now(timezone.utc).isoformat(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "results": results,
+                },
+                fp,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
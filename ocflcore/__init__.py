@@ -8,17 +8,29 @@
 
 """Pythonic API for interacting with an OCFL storage root."""
 
-from .domain.layouts import StorageLayout, TopLevelLayout
+from .domain.layouts import (
+    HashAndIdNTupleLayout,
+    HashedNTupleLayout,
+    StorageLayout,
+    TopLevelLayout,
+)
 from .domain.ocflobj import OCFLObject, OCFLVersion
 from .domain.root import StorageRoot
+from .persistence.async_repository import AsyncOCFLRepository
+from .persistence.index import ObjectIndex
 from .persistence.repository import OCFLRepository
-from .persistence.storage import FileSystemStorage
+from .persistence.storage import AsyncFileSystemStorage, FileSystemStorage
 from .stream import StreamDigest
 from .version import __version__
 
 __all__ = (
     "__version__",
+    "AsyncFileSystemStorage",
+    "AsyncOCFLRepository",
     "FileSystemStorage",
+    "HashAndIdNTupleLayout",
+    "HashedNTupleLayout",
+    "ObjectIndex",
     "OCFLObject",
     "OCFLRepository",
     "OCFLVersion",
@@ -9,9 +9,12 @@
 """OCFL storage hierarchies."""
 
 from .base import StorageLayout
+from .hashed import HashAndIdNTupleLayout, HashedNTupleLayout
 from .toplevel import TopLevelLayout
 
 __all__ = (
+    "HashAndIdNTupleLayout",
+    "HashedNTupleLayout",
     "StorageLayout",
     "TopLevelLayout",
 )
@@ -27,6 +27,11 @@ class StorageLayout:
             result["extension"] = self.extension
         return result or None
 
+    @property
+    def config(self):
+        """Get the extension configuration (for ``extensions/*/config.json``)."""
+        return None
+
     @property
     def json_bytes(self):
         """Get the JSON serialization of this storage root."""
@@ -35,4 +40,16 @@ class StorageLayout:
 
     def path_for(self, obj):
         """Compute path for a given object."""
+        return self.path_for_id(obj.id)
+
+    def path_for_id(self, object_id):
+        """Compute path for a given object identifier."""
         raise NotImplementedError()
+
+    def id_for_path(self, path):
+        """Get the object identifier from an object path.
+
+        Returns ``None`` if the identifier cannot be derived from the path,
+        in which case it must be read from the inventory.
+        """
+        return None
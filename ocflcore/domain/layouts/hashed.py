@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+
+"""Storage layouts distributing objects over a hashed directory tree.
+
+See the OCFL community extensions:
+
+- https://ocfl.github.io/extensions/0003-hash-and-id-n-tuple-storage-layout.html
+- https://ocfl.github.io/extensions/0004-hashed-n-tuple-storage-layout.html
+"""
+
+import re
+from urllib.parse import unquote
+
+from ...stream import new_hash
+from .base import StorageLayout
+
+
+class HashedNTupleLayout(StorageLayout):
+    """Hashed n-tuple storage layout (extension 0004).
+
+    The object path is made of ``number_of_tuples`` directories of
+    ``tuple_size`` characters from the digest of the object id, followed by
+    the full digest (or only the remainder if ``short_object_root``).
+    """
+
+    description = "Hashed n-tuple storage layout"
+    extension = "0004-hashed-n-tuple-storage-layout"
+
+    def __init__(
+        self,
+        digest_algorithm="sha256",
+        tuple_size=3,
+        number_of_tuples=3,
+        short_object_root=False,
+    ):
+        """Constructor."""
+        digest_size = len(new_hash(digest_algorithm).hexdigest())
+        if (tuple_size == 0) != (number_of_tuples == 0):
+            raise ValueError("Tuple size and number of tuples must both be 0.")
+        if short_object_root and tuple_size == 0:
+            raise ValueError("Short object root requires tuples.")
+        max_size = digest_size - 1 if short_object_root else digest_size
+        if tuple_size * number_of_tuples > max_size:
+            raise ValueError("Tuples are longer than the digest.")
+        self.digest_algorithm = digest_algorithm
+        self.tuple_size = tuple_size
+        self.number_of_tuples = number_of_tuples
+        self.short_object_root = short_object_root
+
+    @property
+    def config(self):
+        """Get the extension configuration."""
+        return {
+            "extensionName": self.extension,
+            "digestAlgorithm": self.digest_algorithm,
+            "tupleSize": self.tuple_size,
+            "numberOfTuples": self.number_of_tuples,
+            "shortObjectRoot": self.short_object_root,
+        }
+
+    def _digest(self, object_id):
+        """Compute the hex digest of an object identifier."""
+        h = new_hash(self.digest_algorithm)
+        h.update(object_id.encode("utf8"))
+        return h.hexdigest()
+
+    def _tuples(self, digest):
+        """Split the start of a digest into tuples."""
+        tuples = []
+        if self.tuple_size == 0:
+            return tuples
+        for start in range(0, self.tuple_size * self.number_of_tuples, self.tuple_size):
+            end = start + self.tuple_size
+            tuples.append(digest[start:end])
+        return tuples
+
+    def path_for_id(self, object_id):
+        """Compute the path of an object from the digest of its identifier."""
+        digest = self._digest(object_id)
+        if self.short_object_root:
+            offset = self.tuple_size * self.number_of_tuples
+            name = digest[offset:]
+        else:
+            name = digest
+        return "/".join(self._tuples(digest) + [name])
+
+
+class HashAndIdNTupleLayout(HashedNTupleLayout):
+    """Hash and id n-tuple storage layout (extension 0003).
+
+    Like the hashed n-tuple layout, but the last directory is the encoded
+    object identifier, so the identifier can be recognized from the path.
+    """
+
+    description = "Hash and id n-tuple storage layout"
+    extension = "0003-hash-and-id-n-tuple-storage-layout"
+
+    max_encoded_length = 100
+    _unsafe_chars = re.compile(r"[^A-Za-z0-9\-_]")
+
+    def __init__(self, digest_algorithm="sha256", tuple_size=3, number_of_tuples=3):
+        """Constructor."""
+        super().__init__(
+            digest_algorithm=digest_algorithm,
+            tuple_size=tuple_size,
+            number_of_tuples=number_of_tuples,
+        )
+
+    @property
+    def config(self):
+        """Get the extension configuration."""
+        return {
+            "extensionName": self.extension,
+            "digestAlgorithm": self.digest_algorithm,
+            "tupleSize": self.tuple_size,
+            "numberOfTuples": self.number_of_tuples,
+        }
+
+    @classmethod
+    def encode_id(cls, object_id):
+        """Percent-encode characters other than letters, digits, - and _."""
+        return cls._unsafe_chars.sub(
+            lambda m: "".join(f"%{b:02x}" for b in m.group().encode("utf8")),
+            object_id,
+        )
+
+    def path_for_id(self, object_id):
+        """Compute the path of an object from its digest and identifier."""
+        digest = self._digest(object_id)
+        name = self.encode_id(object_id)
+        max_length = self.max_encoded_length
+        if len(name) > max_length:
+            name = f"{name[:max_length]}-{digest}"
+        return "/".join(self._tuples(digest) + [name])
+
+    def id_for_path(self, path):
+        """Decode the object ID, unless it was truncated."""
+        name = path.rsplit("/", 1)[-1]
+        if len(name) > self.max_encoded_length:
+            return None
+        return unquote(name)
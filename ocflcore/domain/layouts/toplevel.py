@@ -17,6 +17,10 @@ class TopLevelLayout(StorageLayout):
     description = "Top-level hierarchy"
     extension = None
 
-    def path_for(self, obj):
+    def path_for_id(self, object_id):
         """Top-level just uses the object ID."""
-        return obj.id
+        return object_id
+
+    def id_for_path(self, path):
+        """Top-level paths are the object ID."""
+        return path
@@ -8,55 +8,71 @@
 
 """Logical representation of an OCFL Object."""
 
-from ..errors import LogicalPathError
+import os
+import sys
+from functools import partial
+from itertools import chain
+
+from ..errors import LogicalPathError, OCFLFileNotFoundError
+from .validation import (
+    validate_digest_algo,
+    validate_fixity_algo,
+    validate_object_id,
+    validate_path,
+    validate_path_elem,
+    validate_paths,
+    validate_spec,
+)
 
 
 #
-# Validators
+# Logical files for a version
 #
-def validate_fixity_algo(algo):
-    """Validate accepted digest algorithms."""
-    assert algo in ["md5", "sha1", "sha256", "sha512", "blake2b-512"]
-
-
-def validate_digest_algo(algo):
-    """Validate accepted digest algorithms."""
-    assert algo in ["sha256", "sha512"]
-
-
-def validate_spec(spec):
-    """Validate a version for the OCFL spec."""
-    assert spec in ["1.0", "1.1"]
-
-
-def validate_path(path):
-    """Validate a path according to OCFL."""
-    # See 3.5.3.1
-    assert path[0] != "/"
-    assert path[-1] != "/"
-    for path_elem in path.split("/"):
-        validate_path_elem(path_elem)
-
-
-def validate_path_elem(path_elem):
-    """Validate a path element according to OCFL."""
-    # See 3.5.3.1
-    assert "/" not in path_elem
-    assert path_elem not in ["", ".", ".."]
+def _intern(digest):
+    """Intern a digest (which may be ``None``)."""
+    return digest if digest is None else sys.intern(digest)
 
 
-#
-# Logical files for a version
-#
 class VersionFile:
-    """Represents a file associated with a version."""
+    """Represents a file associated with a version.
+
+    A file may be created without a digest, in which case the digest (and
+    any fixity digests) is computed while the file is written to the
+    workspace, and afterwards set with ``resolve()``.
+
+    Instead of an open stream, a file may be created with a path or a
+    callable opening the stream. It is then only opened when written (and
+    closed afterwards) or with ``open()``, so that files with duplicate
+    content are never opened and large objects do not hold a file descriptor
+    per file.
+
+    Files use slots, and logical paths and digests are interned, so that
+    the many files of large objects share equal strings.
+    """
+
+    __slots__ = (
+        "_logical_path",
+        "_stream",
+        "_digest",
+        "_fixity",
+        "_fixity_algorithms",
+    )
 
-    def __init__(self, logical_path, stream, digest, fixity=None):
-        """Constructor for a file."""
-        self._logical_path = logical_path
+    def __init__(
+        self, logical_path, stream, digest, fixity=None, fixity_algorithms=None
+    ):
+        """Constructor for a file.
+
+        :param stream: A stream, a path of a local file or a callable
+            returning a stream.
+        """
+        if isinstance(stream, (str, os.PathLike)):
+            stream = partial(open, os.fspath(stream), "rb")
+        self._logical_path = sys.intern(logical_path)
         self._stream = stream
-        self._digest = digest
+        self._digest = _intern(digest)
         self._fixity = fixity
+        self._fixity_algorithms = fixity_algorithms
 
     @property
     def digest(self):
@@ -65,7 +81,18 @@ class VersionFile:
 
     @property
     def stream(self):
-        """The logical path inside the version."""
+        """The stream of the file, or a callable opening the stream."""
+        return self._stream
+
+    def open(self):
+        """Open the stream of the file.
+
+        For a file created with a path or a callable (e.g. files read from
+        storage), a new stream is opened which must be closed, e.g. by using
+        it as a context manager. Otherwise the stream itself is returned.
+        """
+        if callable(self._stream):
+            return self._stream()
         return self._stream
 
     @property
@@ -78,35 +105,375 @@ class VersionFile:
         """The logical path inside the version."""
         return self._logical_path
 
-    def content_path(self, idx, content_directory):
-        """Generate a content path for this file relative to object root."""
-        return f"v{idx}/{content_directory}/{self.logical_path}"
+    @property
+    def deferred(self):
+        """Whether the digest will be computed when the file is written."""
+        return self._digest is None
 
+    @property
+    def fixity_algorithms(self):
+        """Fixity algorithms to compute for a deferred file."""
+        return self._fixity_algorithms or []
+
+    def resolve(self, digest, fixity=None):
+        """Set the digest computed while writing a deferred file."""
+        self._digest = _intern(digest)
+        self._fixity = fixity
+
+    def content_path(self, idx, content_directory, width=0):
+        """Generate a content path for this file relative to object root.
+
+        :param width: Number of digits of zero-padded version names.
+        """
+        return f"v{idx:0{width}d}/{content_directory}/{self.logical_path}"
 
-class FilesManager:
-    """Files manager for an OCFL version."""
 
-    def __init__(self, inventory=None):
+class _RenamedFile(VersionFile):
+    """A deferred file renamed before its digest was computed.
+
+    The digest and fixity are those of the original file, so that the
+    stream is only read once, for whichever of the two files is resolved.
+    """
+
+    __slots__ = ("_origin",)
+
+    def __init__(self, logical_path, origin):
         """Constructor."""
+        super().__init__(
+            logical_path,
+            origin.stream,
+            None,
+            fixity_algorithms=origin.fixity_algorithms,
+        )
+        self._origin = origin
+
+    @property
+    def digest(self):
+        """The digest of the original file."""
+        return self._origin.digest
+
+    @property
+    def fixity(self):
+        """The fixity of the original file."""
+        return self._origin.fixity
+
+    @property
+    def deferred(self):
+        """Whether the original file is not resolved yet."""
+        return self._origin.deferred
+
+    def resolve(self, digest, fixity=None):
+        """Resolve the original file."""
+        self._origin.resolve(digest, fixity=fixity)
+
+
+class FilesManager:
+    """Files manager for an OCFL version.
+
+    The files of a version may be derived from the files of a parent version
+    (see ``OCFLVersion.from_previous()``), in which case only the files which
+    are added, replaced or removed are held. Unchanged files are looked up in
+    the parent, which must not be modified afterwards.
+
+    Every ``max_depth`` derived versions, unchanged files are looked up in a
+    snapshot of all files of the parent instead, so that lookups never go
+    through more than ``max_depth`` versions.
+    """
+
+    max_depth = 32
+    """Maximum number of versions a lookup goes through."""
+
+    def __init__(self, inventory=None, loader=None, parent=None):
+        """Constructor.
+
+        :param loader: Callable returning an iterable of ``VersionFile``
+            (optional). It is called on first access to the files, so that
+            files can be loaded lazily. With a parent, it returns instead a
+            tuple of the files added or replaced and the logical paths
+            removed relative to the parent.
+        :param parent: Files manager of the parent version (optional).
+        """
         self._files = {}
+        self._removed = set()
+        self._loader = loader
+        self._parent = parent
+        # Files manager in which unchanged files are looked up.
+        self._base = parent
+        if parent is not None and parent._depth >= self.max_depth:
+            self._base = FilesManager()
+            for f in parent:
+                self._base._files[f.logical_path] = f
+        self._depth = 0 if self._base is None else self._base._depth + 1
+        # Number of files below each directory, relative to the base.
+        self._directories = None
+
+    def _load(self):
+        """Load the files from the loader."""
+        if self._loader is not None:
+            loader, self._loader = self._loader, None
+            if self._parent is None:
+                for f in loader():
+                    self._files[f.logical_path] = f
+            else:
+                files, removed = loader()
+                for f in files:
+                    self._files[f.logical_path] = f
+                self._removed.update(removed)
+
+    @property
+    def parent(self):
+        """Files manager of the parent version, if derived from one."""
+        return self._parent
+
+    def changed(self):
+        """Iterate over the files added or replaced relative to the parent.
+
+        Without a parent, all files are changed.
+        """
+        self._load()
+        for f in self._files.values():
+            yield f
 
     def __len__(self):
         """Number of versions."""
-        return len(self._files)
+        self._load()
+        if self._base is None:
+            return len(self._files)
+        added = sum(1 for p in self._files if p not in self._base)
+        return len(self._base) - len(self._removed) + added
 
     def __iter__(self):
         """Iterator over the files."""
+        self._load()
+        if self._base is not None:
+            for f in self._base:
+                path = f.logical_path
+                if path not in self._files and path not in self._removed:
+                    yield f
         for f in self._files.values():
             yield f
 
-    def add(self, logical_path, stream, digest, fixity=None):
-        """Add a new file to the version."""
-        if logical_path in self._files:
+    def __contains__(self, logical_path):
+        """Check if a logical path is present in the version."""
+        manager = self
+        while manager is not None:
+            manager._load()
+            if logical_path in manager._files:
+                return True
+            if logical_path in manager._removed:
+                return False
+            manager = manager._base
+        return False
+
+    def __getitem__(self, logical_path):
+        """Get a file by its logical path."""
+        manager = self
+        while manager is not None:
+            manager._load()
+            f = manager._files.get(logical_path)
+            if f is not None:
+                return f
+            if logical_path in manager._removed:
+                break
+            manager = manager._base
+        raise OCFLFileNotFoundError(f"No file with path {logical_path}.")
+
+    def _set(self, f):
+        """Add or replace a file."""
+        self._removed.discard(f.logical_path)
+        self._files[f.logical_path] = f
+
+    def _directory_counts(self):
+        """Number of files below each directory, relative to the base.
+
+        Built from the files on first use, then updated as files are added
+        and removed.
+        """
+        if self._directories is None:
+            self._load()
+            self._directories = {}
+            for path in self._files:
+                if self._base is None or path not in self._base:
+                    self._count(path, 1)
+            for path in self._removed:
+                self._count(path, -1)
+        return self._directories
+
+    def _count(self, logical_path, delta):
+        """Update the number of files of the directories of a path."""
+        if self._directories is None:
+            return
+        directory = logical_path
+        while "/" in directory:
+            directory = directory.rpartition("/")[0]
+            self._directories[directory] = self._directories.get(directory, 0) + delta
+
+    def _check_new(self, logical_path, ignore=None, validated=False):
+        """Validate a new logical path against the files of the version.
+
+        Besides duplicates, detects paths conflicting with a file which is
+        also a directory of the path, or which are a directory of files.
+
+        :param ignore: Logical path of a file to ignore (optional).
+        :param validated: Whether the syntax of the path was already
+            validated (e.g. with ``validate_paths()``).
+        """
+        if logical_path in self:
             raise LogicalPathError("Logical path already present in version.")
-        validate_path(logical_path)
-        self._files[logical_path] = VersionFile(
-            logical_path, stream, digest, fixity=fixity
-        )
+        if not validated:
+            validate_path(logical_path)
+        directory = logical_path
+        while "/" in directory:
+            directory = directory.rpartition("/")[0]
+            if directory != ignore and directory in self:
+                raise LogicalPathError(
+                    f"Logical path {logical_path!r} conflicts with the file "
+                    f"{directory!r}."
+                )
+        count = 0
+        manager = self
+        while manager is not None:
+            count += manager._directory_counts().get(logical_path, 0)
+            manager = manager._base
+        if ignore is not None and ignore.startswith(f"{logical_path}/"):
+            count -= 1
+        if count > 0:
+            raise LogicalPathError(
+                f"Logical path {logical_path!r} is a directory of another path."
+            )
+
+    def _add_new(self, f):
+        """Add a file with a new logical path."""
+        self._set(f)
+        self._count(f.logical_path, 1)
+
+    def add(self, logical_path, stream, digest, fixity=None):
+        """Add a new file to the version.
+
+        :param stream: A stream, a path of a local file or a callable
+            returning a stream (see ``VersionFile``).
+        :param fixity: Dictionary of fixity algorithm to digest (optional).
+        """
+        self._check_new(logical_path)
+        for algo in fixity or {}:
+            validate_fixity_algo(algo)
+        self._add_new(VersionFile(logical_path, stream, digest, fixity=fixity))
+
+    def add_many(self, files):
+        """Add many new files to the version.
+
+        The whole listing is validated before any file is added: the paths
+        of the listing with ``validate_paths()``, then each path against the
+        files already in the version.
+
+        :param files: Iterable of tuples ``(logical_path, stream, digest)``
+            or ``(logical_path, stream, digest, fixity)``.
+        """
+        new_files = []
+        for logical_path, stream, digest, *fixity in files:
+            fixity = fixity[0] if fixity else None
+            for algo in fixity or {}:
+                validate_fixity_algo(algo)
+            new_files.append(VersionFile(logical_path, stream, digest, fixity=fixity))
+        validate_paths(f.logical_path for f in new_files)
+        for f in new_files:
+            self._check_new(f.logical_path, validated=True)
+        for f in new_files:
+            self._add_new(f)
+
+    def add_stream(self, logical_path, stream, fixity=None):
+        """Add a new file for which the digest is not yet known.
+
+        The stream does not need to be seekable. The digest and fixity
+        digests are computed while the stream is written into the workspace,
+        and the manifest entry (or deduplication) is decided afterwards.
+
+        :param fixity: Iterable of fixity algorithms to compute (optional).
+        """
+        self._check_new(logical_path)
+        fixity = list(fixity or [])
+        for algo in fixity:
+            validate_fixity_algo(algo)
+        self._add_new(VersionFile(logical_path, stream, None, fixity_algorithms=fixity))
+
+    def replace(self, logical_path, stream, digest, fixity=None):
+        """Replace the content of an existing file.
+
+        :param fixity: Dictionary of fixity algorithm to digest (optional).
+        """
+        if logical_path not in self:
+            raise OCFLFileNotFoundError(f"No file with path {logical_path}.")
+        for algo in fixity or {}:
+            validate_fixity_algo(algo)
+        self._set(VersionFile(logical_path, stream, digest, fixity=fixity))
+
+    def remove(self, logical_path):
+        """Remove a file from the version."""
+        if logical_path not in self:
+            raise OCFLFileNotFoundError(f"No file with path {logical_path}.")
+        self._files.pop(logical_path, None)
+        if self._base is not None and logical_path in self._base:
+            self._removed.add(logical_path)
+        self._count(logical_path, -1)
+
+    def rename(self, logical_path, new_logical_path):
+        """Move a file to a new logical path, keeping its content."""
+        f = self[logical_path]
+        self._check_new(new_logical_path, ignore=logical_path)
+        self.remove(logical_path)
+        if f.deferred:
+            # The stream may only be read once.
+            self._add_new(_RenamedFile(new_logical_path, f))
+        else:
+            self._add_new(
+                VersionFile(
+                    new_logical_path,
+                    f.stream,
+                    f.digest,
+                    fixity=f.fixity,
+                    fixity_algorithms=f.fixity_algorithms,
+                )
+            )
+
+    def state(self, parent_state=None):
+        """Map the digests of the files to their logical paths.
+
+        The state of derived files is derived from the state of the parent
+        (``parent_state``, if already computed), sharing the lists of logical
+        paths of the digests which are unchanged.
+        """
+        self._load()
+        if self._base is None:
+            result = {}
+            for f in self._files.values():
+                if f.digest in result:
+                    result[f.digest].append(f.logical_path)
+                else:
+                    result[f.digest] = [f.logical_path]
+            return result
+
+        if parent_state is None:
+            parent_state = self._base.state()
+        result = dict(parent_state)
+        copied = set()
+
+        def paths(digest):
+            # Copy a list of the parent before it is modified.
+            if digest not in copied:
+                copied.add(digest)
+                result[digest] = list(result.get(digest, ()))
+            return result.setdefault(digest, [])
+
+        for path in chain(self._removed, self._files):
+            if path in self._base:
+                digest = self._base[path].digest
+                digest_paths = paths(digest)
+                digest_paths.remove(path)
+                if not digest_paths:
+                    del result[digest]
+        for f in self._files.values():
+            paths(f.digest).append(f.logical_path)
+        return result
 
 
 #
@@ -115,13 +482,33 @@ class FilesManager:
 class OCFLVersion:
     """Logical representation of a version."""
 
-    def __init__(self, creation_time):
-        """Constructor."""
+    def __init__(
+        self, creation_time, message=None, user=None, files_loader=None, parent=None
+    ):
+        """Constructor.
+
+        :param files_loader: Callable returning the files of the version,
+            called on first access to the files (optional). See
+            ``FilesManager``.
+        :param parent: Version the files are derived from (optional).
+        """
         self._created = creation_time
-        self._files = FilesManager()
+        self._files = FilesManager(
+            loader=files_loader, parent=None if parent is None else parent.files
+        )
         self._version_index = None
-        self._user = None
-        self._message = None
+        self._user = user
+        self._message = message
+
+    @classmethod
+    def from_previous(cls, previous, creation_time, message=None, user=None):
+        """Create a version with the files of a previous version.
+
+        Files are then added, replaced, renamed or removed as changes to the
+        previous version, which must not be modified afterwards. Unchanged
+        files are neither copied nor validated again.
+        """
+        return cls(creation_time, message=message, user=user, parent=previous)
 
     @property
     def index(self):
@@ -151,12 +538,7 @@ class OCFLVersion:
     @property
     def state(self):
         """Version state."""
-        result = {}
-        for f in self.files:
-            if f.digest not in result:
-                result[f.digest] = []
-            result[f.digest].append(f.logical_path)
-        return result
+        return self._files.state()
 
 
 class VersionManager:
@@ -188,10 +570,25 @@ class VersionManager:
         # OCFL is 1-indexed.
         for idx, v in enumerate(self._versions):
             version_number = idx + 1
-            if version is not None and version == version_number + 1:
+            if version is not None and version_number > version:
                 break
             yield version_number, v
 
+    def enumerated_changes(self, version=None):
+        """Iterate the versions with the files not in the previous version.
+
+        Yields tuples of the version number, the version and its files, or
+        only its changed files if it is derived from the previous version.
+        """
+        previous = None
+        for version_number, v in self.enumerated(version=version):
+            files = v.files
+            if previous is not None and files.parent is previous:
+                yield version_number, v, files.changed()
+            else:
+                yield version_number, v, files
+            previous = files
+
 
 #
 # OCFL object
@@ -210,12 +607,12 @@ class OCFLObject:
         validate_path_elem(content_directory)
         validate_digest_algo(digest_algorithm)
         validate_spec(spec)
-        # TODO validate object_id
+        validate_object_id(object_id)
         self._object_id = object_id
         self._versions = VersionManager()
         self._content_directory = content_directory
         self._digest_algorithm = digest_algorithm
-        self._spec = "1.1"
+        self._spec = spec
 
     @property
     def id(self):
@@ -252,11 +649,21 @@ class OCFLObject:
         """Get OCFL specification for this object."""
         return self._spec
 
+    def deferred_files(self):
+        """Iterate over files for which the digest is not yet known."""
+        for _, _, files in self.versions.enumerated_changes():
+            for f in files:
+                if f.deferred:
+                    yield f
+
     def content_files(self, version=None):
-        """Iterate over deduplicated list of content files."""
+        """Iterate over deduplicated list of content files.
+
+        Deferred files must have been resolved first.
+        """
         _manifest = {}
-        for idx, v in self.versions.enumerated(version=version):
-            for f in v.files:
+        for idx, _, files in self.versions.enumerated_changes(version=version):
+            for f in files:
                 if f.digest not in _manifest:
                     _manifest[f.digest] = True
                     content_path = f.content_path(idx, self._content_directory)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Validation of logical paths, object identifiers and algorithms.
+
+Checks use string operations, set lookups and precompiled regular
+expressions, and raise a ``ConstraintException`` subclass, so validation is
+not disabled when running with ``python -O``.
+"""
+
+import re
+
+from ..errors import (
+    AlgorithmError,
+    ConstraintException,
+    LogicalPathError,
+    ObjectIdError,
+)
+
+DIGEST_ALGORITHMS = frozenset(["sha256", "sha512"])
+"""Accepted content digest algorithms."""
+
+FIXITY_ALGORITHMS = frozenset(["md5", "sha1", "sha256", "sha512", "blake2b-512"])
+"""Accepted fixity algorithms."""
+
+SPECS = frozenset(["1.0", "1.1"])
+"""Supported versions of the OCFL specification."""
+
+# An empty, "." or ".." path element - see 3.5.3.1.
+_INVALID_PATH = re.compile(r"(?:^|/)\.{0,2}(?:/|$)")
+
+_CONTROL_CHARACTERS = re.compile(r"[\x00-\x1f\x7f]")
+
+# Marks a logical path in the prefix trie of ``validate_paths()``.
+_FILE = object()
+
+
+def validate_fixity_algo(algo):
+    """Validate accepted fixity algorithms."""
+    if algo not in FIXITY_ALGORITHMS:
+        raise AlgorithmError(f"Fixity algorithm {algo!r} is not supported.")
+
+
+def validate_digest_algo(algo):
+    """Validate accepted digest algorithms."""
+    if algo not in DIGEST_ALGORITHMS:
+        raise AlgorithmError(f"Digest algorithm {algo!r} is not supported.")
+
+
+def validate_spec(spec):
+    """Validate a version for the OCFL spec."""
+    if spec not in SPECS:
+        raise ConstraintException(f"OCFL version {spec!r} is not supported.")
+
+
+def validate_object_id(object_id):
+    """Validate an object identifier.
+
+    Identifiers must be non-empty strings without control characters.
+    """
+    if not isinstance(object_id, str) or not object_id:
+        raise ObjectIdError("Object identifier must be a non-empty string.")
+    if _CONTROL_CHARACTERS.search(object_id):
+        raise ObjectIdError(
+            f"Object identifier {object_id!r} contains control characters."
+        )
+
+
+def validate_path(path):
+    """Validate a path according to OCFL."""
+    # See 3.5.3.1. The regular expression is only needed for paths which may
+    # have a "." or ".." element.
+    if (
+        not path
+        or path[0] == "/"
+        or path[-1] == "/"
+        or "//" in path
+        or (("/." in path or path[0] == ".") and _INVALID_PATH.search(path))
+    ):
+        raise LogicalPathError(f"Invalid logical path {path!r}.")
+
+
+def validate_path_elem(path_elem):
+    """Validate a path element according to OCFL."""
+    # See 3.5.3.1
+    if "/" in path_elem or path_elem in ("", ".", ".."):
+        raise LogicalPathError(f"Invalid path element {path_elem!r}.")
+
+
+def validate_paths(paths):
+    """Validate the logical paths of a version.
+
+    Besides validating each path, detects duplicate paths and paths which
+    are also a directory of another path (e.g. ``a`` and ``a/b``), which is
+    not allowed - see 3.5.3.1. Paths are inserted into a prefix trie, so
+    this is linear in the total length of the paths.
+    """
+    trie = {}
+    # Trie nodes of the directories already seen, so that the many files of
+    # a directory only need a single lookup.
+    directories = {"": trie}
+    for path in paths:
+        validate_path(path)
+        directory, _, name = path.rpartition("/")
+        node = directories.get(directory)
+        if node is None:
+            node = trie
+            elements = directory.split("/")
+            for idx, elem in enumerate(elements):
+                child = node.get(elem)
+                if child is _FILE:
+                    prefix = "/".join(elements[: idx + 1])
+                    raise LogicalPathError(
+                        f"Logical path {path!r} conflicts with the file {prefix!r}."
+                    )
+                if child is None:
+                    child = node[elem] = {}
+                node = child
+            directories[directory] = node
+        child = node.get(name)
+        if child is _FILE:
+            raise LogicalPathError(f"Duplicate logical path {path!r}.")
+        if child is not None:
+            raise LogicalPathError(
+                f"Logical path {path!r} is a directory of another path."
+            )
+        node[name] = _FILE
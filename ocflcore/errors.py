@@ -27,12 +27,36 @@ class LogicalPathError(ConstraintException):
     pass
 
 
+class ObjectIdError(ConstraintException):
+    """An error related to an object identifier."""
+
+    pass
+
+
+class AlgorithmError(ConstraintException):
+    """A digest or fixity algorithm which is not supported."""
+
+    pass
+
+
+class InvalidInventoryError(OCFLException):
+    """Inventory is not valid or does not match its sidecar digest."""
+
+    pass
+
+
 class ObjectNotFoundError(OCFLException):
     """Specified object does not exist."""
 
     pass
 
 
+class ObjectExistsError(OCFLException):
+    """Specified object already exists."""
+
+    pass
+
+
 class OCFLFileNotFoundError(OCFLException):
     """Specifed file does not exist."""
 
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Instrumentation of transaction, storage and digest operations.
+
+Instrumented operations emit a span with their duration and, where it
+applies, the number of bytes processed. Spans are sent to the tracer set with
+``set_tracer()``. Without a tracer, an instrumented call costs a single
+extra function call::
+
+    stats = StatsTracer()
+    set_tracer(stats)
+    repository.add(obj)
+    set_tracer(None)
+    print(stats.summary())
+
+Spans:
+
+- ``transaction.write``, ``transaction.write_many``, ``transaction.commit``,
+  ``transaction.rollback``
+- ``transaction.stage`` (reading, hashing and writing a deferred file)
+- ``storage.write``, ``storage.move``, ``storage.read_file``
+- ``stream.digest`` (reading the stream of a ``StreamDigest``)
+- ``inventory.bytes`` (serializing an inventory in memory)
+- ``inventory.serialize`` (serializing a chunk of an inventory while it is
+  written, excluding the write itself)
+"""
+
+import threading
+import time
+from functools import wraps
+
+_tracer = None
+
+
+def set_tracer(tracer):
+    """Set the tracer receiving spans (``None`` disables instrumentation)."""
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer():
+    """Get the current tracer."""
+    return _tracer
+
+
+def span(name):
+    """Create a span of the current tracer, used as a context manager.
+
+    Without a tracer, the span does nothing.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NO_SPAN
+    return tracer.span(name)
+
+
+def traced(name, nbytes=None):
+    """Decorator emitting a span for each call of a function.
+
+    :param name: Name of the span.
+    :param nbytes: Callable computing the number of bytes processed from the
+        return value of the function (optional).
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return func(*args, **kwargs)
+            with tracer.span(name) as span:
+                result = func(*args, **kwargs)
+                if nbytes is not None:
+                    span.set("bytes", nbytes(result))
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+class Span:
+    """A timed operation."""
+
+    __slots__ = ("name", "attributes", "start", "duration", "error", "_tracer")
+
+    def __init__(self, tracer, name):
+        """Constructor."""
+        self._tracer = tracer
+        self.name = name
+        self.attributes = {}
+        self.start = None
+        self.duration = None
+        self.error = None
+
+    def set(self, key, value):
+        """Set an attribute (e.g. ``bytes``)."""
+        self.attributes[key] = value
+
+    def __enter__(self):
+        """Start the span."""
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        """End the span."""
+        self.duration = time.perf_counter() - self.start
+        self.error = exc_value
+        self._tracer.finish(self)
+
+
+class _NoSpan:
+    """Span used without a tracer."""
+
+    def set(self, key, value):
+        """Ignore an attribute."""
+        pass
+
+    def __enter__(self):
+        """Do nothing."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        """Do nothing."""
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """Base class for tracers."""
+
+    def span(self, name):
+        """Create a span, used as a context manager."""
+        return Span(self, name)
+
+    def finish(self, span):
+        """Called with each ended span."""
+        pass
+
+
+class CallbackTracer(Tracer):
+    """Tracer calling a function with each ended span."""
+
+    def __init__(self, callback):
+        """Constructor."""
+        self.callback = callback
+
+    def finish(self, span):
+        """Call the callback."""
+        self.callback(span)
+
+
+class StatsTracer(Tracer):
+    """Tracer aggregating the count, duration and bytes of spans by name."""
+
+    def __init__(self):
+        """Constructor."""
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def finish(self, span):
+        """Add a span to the statistics."""
+        with self._lock:
+            stats = self.stats.setdefault(
+                span.name, {"count": 0, "duration": 0.0, "bytes": 0, "errors": 0}
+            )
+            stats["count"] += 1
+            stats["duration"] += span.duration
+            stats["bytes"] += span.attributes.get("bytes", 0)
+            stats["errors"] += span.error is not None
+
+    def summary(self):
+        """Table of the statistics, by decreasing total duration."""
+        lines = []
+        for name, s in sorted(self.stats.items(), key=lambda i: -i[1]["duration"]):
+            mb_per_s = s["bytes"] / 1024 / 1024 / max(s["duration"], 1e-9)
+            lines.append(
+                f"{name:<24} {s['count']:8d} calls {s['duration']:9.3f}s "
+                f"{s['bytes'] / 1024 / 1024:10.1f} MB {mb_per_s:9.1f} MB/s"
+            )
+        return "\n".join(lines)
+
+
+class OpenTelemetryTracer(Tracer):
+    """Tracer emitting OpenTelemetry spans.
+
+    Uses the OpenTelemetry API, which does nothing until an SDK (with any
+    exporter, e.g. ``ConsoleSpanExporter`` for use without a collector) is
+    configured. Requires the ``opentelemetry-api`` package.
+    """
+
+    def __init__(self, tracer=None):
+        """Constructor.
+
+        :param tracer: An OpenTelemetry tracer (optional). Defaults to a
+            tracer of the global tracer provider.
+        """
+        if tracer is None:
+            from opentelemetry import trace
+
+            tracer = trace.get_tracer("ocflcore")
+        self.tracer = tracer
+
+    def span(self, name):
+        """Create a span which is also an OpenTelemetry span."""
+        return _OpenTelemetrySpan(self, name)
+
+
+class _OpenTelemetrySpan(Span):
+    """Span forwarding to an OpenTelemetry span."""
+
+    __slots__ = ("_context", "_otel_span")
+
+    def __enter__(self):
+        """Start the OpenTelemetry span."""
+        self._context = self._tracer.tracer.start_as_current_span(
+            self.name, record_exception=True
+        )
+        self._otel_span = self._context.__enter__()
+        return super().__enter__()
+
+    def set(self, key, value):
+        """Set an attribute on both spans."""
+        super().set(key, value)
+        self._otel_span.set_attribute(f"ocflcore.{key}", value)
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        """End the OpenTelemetry span."""
+        super().__exit__(exc_type, exc_value, exc_traceback)
+        self._context.__exit__(exc_type, exc_value, exc_traceback)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+
+"""Asynchronous OCFL Repository.
+
+Counterpart of ``OCFLRepository`` for asyncio applications. Each operation
+runs the synchronous implementation in the bounded executor of the storage,
+so the event loop is not blocked and concurrent ingests of many objects
+share a fixed number of threads: those of the storage executor, plus
+``max_workers`` threads shared by the concurrent content writes of all
+ingests.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from .repository import OCFLRepository
+from .storage.base import AsyncStorage
+
+
+class AsyncOCFLRepository:
+    """Asynchronous repository for OCFL objects."""
+
+    def __init__(
+        self, root, storage, workspace_storage=None, max_workers=None, index=None
+    ):
+        """Constructor.
+
+        :param storage: An ``AsyncFileSystemStorage`` for the storage root.
+        :param workspace_storage: An ``AsyncFileSystemStorage`` or a
+            synchronous storage for the workspace (optional).
+        :param max_workers: Number of threads writing content files, shared
+            by all concurrent operations (optional). Defaults to sequential
+            writes in the thread of each operation.
+        """
+        self.root = root
+        self.storage = storage
+        self.workspace_storage = workspace_storage
+        if isinstance(workspace_storage, AsyncStorage):
+            workspace_storage = workspace_storage.storage
+        # Not the storage executor, whose threads wait for the writes.
+        write_executor = None
+        if max_workers and max_workers > 1:
+            write_executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="ocflcore-write"
+            )
+        self.repository = OCFLRepository(
+            root,
+            storage.storage,
+            workspace_storage=workspace_storage,
+            max_workers=max_workers,
+            index=index,
+            write_executor=write_executor,
+        )
+
+    async def initialize(self):
+        """Initialize OCFL repository."""
+        await self.storage.run(self.repository.initialize)
+
+    async def add(self, obj):
+        """Add an OCFL object to the storage root."""
+        await self.storage.run(self.repository.add, obj)
+
+    async def add_version(self, obj_id, version):
+        """Add new version to an OCFL object."""
+        await self.storage.run(self.repository.add_version, obj_id, version)
+
+    async def get(self, obj_id):
+        """Get an OCFL object from the storage root.
+
+        Note that content streams of the object are regular (blocking) file
+        objects. Use ``storage.run()`` to read them from a coroutine.
+        """
+        return await self.storage.run(self.repository.get, obj_id)
+
+    async def exists(self, obj_id):
+        """Check if an object exists in the storage root."""
+        return await self.storage.run(self.repository.exists, obj_id)
+
+    async def list_objects(self, prefix=None, pattern=None, limit=None, cursor=None):
+        """Asynchronously iterate over object identifiers.
+
+        See ``OCFLRepository.list_objects()``. Results are produced in
+        batches in the executor.
+        """
+        listing = self.repository.list_objects(
+            prefix=prefix, pattern=pattern, limit=limit, cursor=cursor
+        )
+        while True:
+            batch = await self.storage.run(lambda: list(islice(listing, 1000)))
+            if not batch:
+                break
+            for object_id in batch:
+                yield object_id
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Incremental fixity auditing.
+
+An audit is a validation (see ``Validator``) which only re-hashes content
+files that are due: files never verified, files verified longer ago than the
+audit interval, and files whose size or modification time changed since
+they were verified. The state of each verified file is kept in a SQLite
+cache, so checks of a large storage root are spread over many runs, and the
+interval of each file is shortened by a jitter so that files verified in one
+run are not all due again in the same run::
+
+    auditor = Auditor(storage, AuditCache.for_storage(storage),
+                      interval=90 * 86400, rate_limit=50)
+    for report in repository.validate_all(validator=auditor):
+        ...
+"""
+
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+from os import makedirs
+from os.path import dirname, join
+
+from ..errors import OCFLFileNotFoundError
+from .validator import Validator
+
+AuditEntry = namedtuple("AuditEntry", ["path", "size", "mtime", "verified"])
+"""State of a verified content file in the audit cache."""
+
+
+class AuditCache:
+    """SQLite cache of the last verification of each content file."""
+
+    extension = "ocflcore-fixity-audit"
+
+    def __init__(self, db_path):
+        """Constructor.
+
+        :param db_path: Path of the SQLite database file.
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        if dirname(db_path):
+            makedirs(dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime INTEGER, "
+                "verified REAL NOT NULL)"
+            )
+
+    @classmethod
+    def for_storage(cls, storage):
+        """Create a cache in the extensions directory of a storage root."""
+        return cls(storage.local_path(join("extensions", cls.extension, "audit.db")))
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+    def get(self, path):
+        """Get the entry of a file, or ``None`` if never verified."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM files WHERE path = ?", (path,)
+            ).fetchall()
+        return AuditEntry(*rows[0]) if rows else None
+
+    def update(self, path, size, mtime, verified):
+        """Record the verification of a file."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                (path, size, mtime, verified),
+            )
+
+    def delete(self, path):
+        """Forget a file (e.g. after a failed verification)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def __len__(self):
+        """Number of verified files."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+
+class RateLimiter:
+    """Limit the throughput of reads shared by several threads."""
+
+    def __init__(self, bytes_per_second):
+        """Constructor."""
+        self.bytes_per_second = bytes_per_second
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes):
+        """Account for ``nbytes`` read, waiting if reads are ahead."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + nbytes / self.bytes_per_second
+        if start > now:
+            time.sleep(start - now)
+
+
+class Auditor(Validator):
+    """Validator which only re-hashes content files that are due."""
+
+    def __init__(
+        self,
+        storage,
+        cache,
+        interval=30 * 86400,
+        rate_limit=None,
+        max_workers=None,
+        chunk_size=1024 * 1024,
+        jitter=0.25,
+    ):
+        """Constructor.
+
+        :param cache: An ``AuditCache``.
+        :param interval: Seconds after which a verified file is due again.
+        :param rate_limit: Maximum read throughput in MB/s (optional).
+        :param jitter: Fraction of the interval over which the files verified
+            at the same time become due again (defaults to 0.25).
+        """
+        super().__init__(storage, max_workers=max_workers, chunk_size=chunk_size)
+        self.cache = cache
+        self.interval = interval
+        self.jitter = jitter
+        self.limiter = None
+        if rate_limit:
+            self.limiter = RateLimiter(rate_limit * 1024 * 1024)
+        self._stats = {}
+
+    def due_interval(self, path):
+        """Seconds after which a verified file is due again.
+
+        The interval is shortened by up to ``jitter`` of it, depending on a
+        hash of the path, so that the files verified in one run do not all
+        become due at the same time.
+        """
+        fraction = zlib.crc32(path.encode("utf8")) / 2**32
+        return self.interval * (1 - self.jitter * fraction)
+
+    def _due(self, path):
+        """Whether a file was never verified, is due or changed."""
+        entry = self.cache.get(path)
+        if entry is None or entry.verified + self.due_interval(path) <= time.time():
+            return True
+        try:
+            return (entry.size, entry.mtime) != tuple(self.storage.stat(path))
+        except OCFLFileNotFoundError:
+            # Deleted since the object was listed, reported when hashed.
+            return True
+
+    def _verified(self, path):
+        """Record the state of the file before it was hashed."""
+        size, mtime = self._stats.pop(path)
+        self.cache.update(path, size, mtime, time.time())
+
+    def _check_digests(self, report, algo, path, content_path, digests, future):
+        """Compare the digests, forgetting the file if it does not match."""
+        errors = len(report.errors)
+        super()._check_digests(report, algo, path, content_path, digests, future)
+        if len(report.errors) > errors:
+            self._stats.pop(path, None)
+            self.cache.delete(path)
+
+    def _hash(self, path, algorithms):
+        """Hash a file within the rate limit."""
+        self._stats[path] = self.storage.stat(path)
+        if self.limiter is None:
+            return super()._hash(path, algorithms)
+        return super()._hash(path, algorithms, on_read=self.limiter.consume)
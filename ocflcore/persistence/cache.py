@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Cache of parsed inventories.
+
+Inventories are cached by object identifier together with the digest from
+their sidecar file. Each lookup reads the (small) sidecar file, and the cached
+inventory is only used if the digest is unchanged, so updates of an object
+are always seen.
+"""
+
+import json
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+from os.path import join
+from uuid import uuid4
+
+from ..errors import InvalidInventoryError, OCFLFileNotFoundError
+from ..stream import new_hash
+from .inventory import load_inventory
+
+CacheEntry = namedtuple("CacheEntry", ["digest", "algorithm", "inventory", "size"])
+"""A cached inventory with the digest of its sidecar file."""
+
+
+def parsed_size(value):
+    """Estimate the memory used by a parsed JSON value, in bytes.
+
+    Sums the sizes of all containers and strings, counting strings shared
+    by several containers more than once, so the estimate is on the high
+    side.
+    """
+    getsizeof = sys.getsizeof
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        size += getsizeof(item)
+        if type(item) is dict:
+            size += sum(map(getsizeof, item))
+            stack.extend(item.values())
+        elif type(item) is list:
+            stack.extend(item)
+    return size
+
+
+class InventoryCache:
+    """LRU cache of parsed inventories bounded in bytes.
+
+    The size of an entry is the estimated memory used by the parsed
+    inventory (see ``parsed_size()``), typically about twice the size of the
+    serialized inventory. Cached inventories are shared between callers and
+    must not be modified.
+
+    Optionally, parsed inventories are also stored in a directory shared by
+    several processes, as pickle files named by the inventory digest, with
+    their estimated size. Only use a directory which is not writable by
+    untrusted users.
+    """
+
+    algorithms = ("sha512", "sha256")
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, directory=None):
+        """Constructor.
+
+        :param max_bytes: Maximum total memory of the cached inventories.
+        :param directory: Directory of the on-disk cache (optional).
+        """
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        """Number of cached inventories."""
+        return len(self._entries)
+
+    def clear(self):
+        """Remove all inventories from the in-memory cache."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def load(self, storage, object_id, object_path):
+        """Load the root inventory of an object, verified by its sidecar.
+
+        Raises the same errors as ``load_inventory()``.
+        """
+        with self._lock:
+            entry = self._entries.get(object_id)
+        algorithms = [entry.algorithm] if entry is not None else self.algorithms
+        digest, algo = self._sidecar_digest(storage, object_path, algorithms)
+        if digest is None:
+            # Let the uncached loader raise the appropriate error.
+            return load_inventory(storage, object_path)
+
+        if entry is not None and entry.digest == digest:
+            with self._lock:
+                self.hits += 1
+                if object_id in self._entries:
+                    self._entries.move_to_end(object_id)
+            return entry.inventory
+
+        inventory, size = self._load_disk(digest)
+        if inventory is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            with self._lock:
+                self.misses += 1
+            inventory, size = self._load_storage(storage, object_path, digest, algo)
+            self._store_disk(digest, inventory, size)
+        self._put(object_id, CacheEntry(digest, algo, inventory, size))
+        return inventory
+
+    def _sidecar_digest(self, storage, object_path, algorithms):
+        """Read the digest from the sidecar file of the root inventory."""
+        for algo in algorithms:
+            path = join(object_path, f"inventory.json.{algo.upper()}")
+            try:
+                sidecar = storage.read_file(path).getvalue().decode("utf8")
+            except OCFLFileNotFoundError:
+                continue
+            return (sidecar.split() or [None])[0], algo
+        return None, None
+
+    def _load_storage(self, storage, object_path, digest, algo):
+        """Read, verify and parse an inventory from the storage."""
+        data = storage.read_file(join(object_path, "inventory.json")).getvalue()
+        h = new_hash(algo)
+        h.update(data)
+        if h.hexdigest() != digest:
+            raise InvalidInventoryError(
+                f"Inventory of {object_path} does not match its sidecar digest."
+            )
+        try:
+            inventory = json.loads(data)
+        except ValueError:
+            raise InvalidInventoryError(f"Inventory of {object_path} is not valid.")
+        return inventory, parsed_size(inventory)
+
+    def _disk_path(self, digest):
+        """Path of an inventory in the on-disk cache."""
+        return join(self.directory, f"{digest}.inventory.pickle")
+
+    def _load_disk(self, digest):
+        """Load a parsed inventory from the on-disk cache."""
+        if self.directory is None:
+            return None, 0
+        try:
+            with open(self._disk_path(digest), "rb") as fp:
+                return pickle.load(fp)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None, 0
+
+    def _store_disk(self, digest, inventory, size):
+        """Store a parsed inventory in the on-disk cache (atomically)."""
+        if self.directory is None:
+            return
+        tmp_path = join(self.directory, f".{uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, "wb") as fp:
+                pickle.dump((inventory, size), fp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._disk_path(digest))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _put(self, object_id, entry):
+        """Add an entry and evict the least recently used entries."""
+        with self._lock:
+            previous = self._entries.pop(object_id, None)
+            if previous is not None:
+                self.size -= previous.size
+            if entry.size > self.max_bytes:
+                return
+            self._entries[object_id] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
@@ -30,11 +30,50 @@ class Command:
 class WriteCommand(Command):
     """A write command."""
 
-    def __init__(self, path):
+    def __init__(self, storage, path):
         """Constructor."""
+        self.storage = storage
         self.path = path
 
     def undo(self):
-        """Undo the command."""
-        # TODO
-        pass
+        """Undo the command by deleting the written file."""
+        self.storage.delete(self.path)
+
+
+class RenameCommand(Command):
+    """A rename command."""
+
+    def __init__(self, storage, src_path, dst_path):
+        """Constructor."""
+        self.storage = storage
+        self.src_path = src_path
+        self.dst_path = dst_path
+
+    def undo(self):
+        """Undo the command by renaming the file back (if still there)."""
+        if self.storage.exists(self.dst_path):
+            self.storage.rename(self.dst_path, self.src_path)
+
+
+class MoveCommand(Command):
+    """A move from another storage (e.g. the workspace) into a storage."""
+
+    def __init__(self, storage, other_storage, path, backup_path=None):
+        """Constructor.
+
+        :param backup_path: Path in the other storage of a copy of the file
+            replaced by the move (optional).
+        """
+        self.storage = storage
+        self.other_storage = other_storage
+        self.path = path
+        self.backup_path = backup_path
+
+    def undo(self):
+        """Undo the command by restoring the replaced file or deleting."""
+        if self.backup_path is None:
+            self.storage.delete(self.path)
+            return
+        with self.other_storage.open(self.backup_path) as stream:
+            self.storage.write(self.path, stream)
+        self.storage.sync(self.path)
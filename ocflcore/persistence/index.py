@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+
+"""Persistent index of the objects in an OCFL storage root.
+
+The index is a SQLite database mapping object identifiers to their path in
+the storage root, head version, root inventory digest and total size. It is
+maintained by the repository when objects are added or updated, and can be
+rebuilt at any time from a full scan of the storage root.
+"""
+
+import re
+import sqlite3
+import threading
+from collections import namedtuple
+from os import makedirs
+from os.path import dirname, join
+
+from .inventory import load_inventory
+from .listing import match
+
+IndexEntry = namedtuple("IndexEntry", ["id", "path", "head", "digest", "size"])
+"""An entry in the object index."""
+
+# Characters starting a wildcard of a glob pattern.
+_GLOB_SPECIAL = re.compile(r"[*?[]")
+
+
+class ObjectIndex:
+    """SQLite index of the objects in a storage root."""
+
+    extension = "ocflcore-object-index"
+
+    def __init__(self, db_path):
+        """Constructor.
+
+        :param db_path: Path of the SQLite database file.
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        if dirname(db_path):
+            makedirs(dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS objects ("
+                "id TEXT PRIMARY KEY, path TEXT NOT NULL, head TEXT NOT NULL, "
+                "digest TEXT NOT NULL, size INTEGER NOT NULL)"
+            )
+
+    @classmethod
+    def for_storage(cls, storage):
+        """Create an index in the extensions directory of a storage root."""
+        return cls(storage.local_path(join("extensions", cls.extension, "index.db")))
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+    def _query(self, sql, params=()):
+        """Execute a query and return all rows."""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def update(self, object_id, path, head, digest, size):
+        """Insert or update the entry of an object."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?)",
+                (object_id, path, head, digest, size),
+            )
+
+    def delete(self, object_id):
+        """Remove the entry of an object."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM objects WHERE id = ?", (object_id,))
+
+    def get(self, object_id):
+        """Get the entry of an object, or ``None`` if not indexed."""
+        rows = self._query("SELECT * FROM objects WHERE id = ?", (object_id,))
+        return IndexEntry(*rows[0]) if rows else None
+
+    def exists(self, object_id):
+        """Check if an object is indexed."""
+        return bool(self._query("SELECT 1 FROM objects WHERE id = ?", (object_id,)))
+
+    def __len__(self):
+        """Number of indexed objects."""
+        return self._query("SELECT COUNT(*) FROM objects")[0][0]
+
+    def list(self, prefix=None, pattern=None, after=None, limit=None, batch=1000):
+        """Iterate over index entries ordered by object identifier.
+
+        Results are fetched in batches using the primary key, so listing is
+        a range scan of the index rather than a scan of the storage root.
+
+        :param prefix: Only objects with an identifier starting with prefix.
+        :param pattern: Only objects with an identifier matching a glob
+            pattern (e.g. ``image-*``), with the syntax of ``fnmatch``. The
+            literal start of the pattern restricts the range scan, the rest
+            is matched on the fetched entries.
+        :param after: Only objects with an identifier after this identifier.
+        :param limit: Maximum number of entries.
+        """
+        conditions = []
+        params = []
+        for start in (prefix, pattern and _GLOB_SPECIAL.split(pattern, 1)[0]):
+            if start:
+                # Range condition on the primary key instead of LIKE.
+                upper = start[:-1] + chr(ord(start[-1]) + 1)
+                conditions.append("id >= ? AND id < ?")
+                params.extend([start, upper])
+
+        count = 0
+        while limit is None or count < limit:
+            where = list(conditions)
+            page_params = list(params)
+            if after is not None:
+                where.append("id > ?")
+                page_params.append(after)
+            size = batch if limit is None or pattern else min(batch, limit - count)
+            sql = "SELECT * FROM objects"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            rows = self._query(f"{sql} ORDER BY id LIMIT {size}", page_params)
+            for row in rows:
+                if pattern and not match(row[0], pattern=pattern):
+                    continue
+                if limit is not None and count >= limit:
+                    return
+                yield IndexEntry(*row)
+                count += 1
+            if len(rows) < size:
+                break
+            after = rows[-1][0]
+
+    def rebuild(self, storage):
+        """Rebuild the index from a full scan of the storage root."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM objects")
+        for path in storage.walk_objects():
+            inventory = load_inventory(storage, path, verify=False)
+            algo = inventory["digestAlgorithm"].upper()
+            sidecar = storage.read_file(join(path, f"inventory.json.{algo}"))
+            self.update(
+                inventory["id"],
+                path,
+                inventory["head"],
+                sidecar.read().decode("utf8").split()[0],
+                storage.size(path),
+            )
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Bulk ingest of many objects into an OCFL storage root."""
+
+import json
+from collections import namedtuple
+from os.path import exists
+
+IngestResult = namedtuple("IngestResult", ["id", "error"])
+"""Result of adding one object in a bulk ingest (``error`` is ``None`` on
+success)."""
+
+
+class Checkpoint:
+    """Append-only file of the identifiers of ingested objects.
+
+    Each identifier is written as a JSON string on its own line and flushed
+    immediately. A line truncated by an interruption is ignored.
+    """
+
+    def __init__(self, path):
+        """Constructor.
+
+        :param path: Path of the checkpoint file, created if missing.
+        """
+        self.path = path
+        self._ids = set()
+        partial = False
+        if exists(path):
+            with open(path, "r", encoding="utf-8") as fp:
+                for line in fp:
+                    partial = not line.endswith("\n")
+                    try:
+                        self._ids.add(json.loads(line))
+                    except ValueError:
+                        pass
+        self._fp = open(path, "a", encoding="utf-8")
+        if partial:
+            self._fp.write("\n")
+
+    def __contains__(self, obj_id):
+        """Check if an object was ingested."""
+        return obj_id in self._ids
+
+    def __len__(self):
+        """Number of ingested objects."""
+        return len(self._ids)
+
+    def add(self, obj_id):
+        """Record an ingested object."""
+        self._fp.write(json.dumps(obj_id) + "\n")
+        self._fp.flush()
+        self._ids.add(obj_id)
+
+    def close(self):
+        """Close the checkpoint file."""
+        self._fp.close()
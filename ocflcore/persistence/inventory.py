@@ -10,20 +10,300 @@
 
 import hashlib
 import json
+from datetime import datetime
+from functools import partial
+from os.path import join
 
+from ..domain.ocflobj import FilesManager, OCFLObject, OCFLVersion, VersionFile
+from ..errors import (
+    ConstraintException,
+    InvalidInventoryError,
+    ObjectNotFoundError,
+    OCFLFileNotFoundError,
+)
+from ..instrumentation import span, traced
+from ..stream import DigestReader, IterStream, new_hash
 
-class Inventory:
+
+def load_inventory(storage, object_path, verify=True):
+    """Load the root inventory of an object as a dictionary.
+
+    :param verify: Verify the inventory against the digest in its sidecar
+        file (defaults to true).
+    """
+    try:
+        data = storage.read_file(join(object_path, "inventory.json")).getvalue()
+    except OCFLFileNotFoundError:
+        raise ObjectNotFoundError(f"No object found at {object_path}.")
+    try:
+        inventory = json.loads(data)
+        algo = inventory["digestAlgorithm"]
+    except (ValueError, KeyError):
+        raise InvalidInventoryError(f"Inventory of {object_path} is not valid.")
+
+    if verify:
+        sidecar_path = join(object_path, f"inventory.json.{algo.upper()}")
+        try:
+            sidecar = storage.read_file(sidecar_path).getvalue().decode("utf8")
+        except OCFLFileNotFoundError:
+            raise InvalidInventoryError(f"Sidecar {sidecar_path} is missing.")
+        h = new_hash(algo)
+        h.update(data)
+        if sidecar.split()[:1] != [h.hexdigest()]:
+            raise InvalidInventoryError(
+                f"Inventory of {object_path} does not match its sidecar digest."
+            )
+    return inventory
+
+
+def parse_created(value):
+    """Parse the creation time of a version."""
+    # datetime.fromisoformat() only supports the "Z" suffix from Python 3.11.
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+def object_from_inventory(inventory, storage, object_path):
+    """Create an OCFL object from a parsed inventory.
+
+    Versions are created directly, but their files are only created when the
+    files of a version are first accessed. Versions are derived from the
+    previous version (except every ``FilesManager.max_depth`` versions), so
+    only their changed files are created. Content streams are opened from
+    the storage with ``VersionFile.open()``.
+    """
+    manifest = inventory["manifest"]
+    fixity_index = {}
+
+    def content_fixity(content_path):
+        # Built on first use, only if the inventory has a fixity section.
+        if not fixity_index and inventory.get("fixity"):
+            for algo, digests in inventory["fixity"].items():
+                for digest, content_paths in digests.items():
+                    for path in content_paths:
+                        fixity_index.setdefault(path, {})[algo] = digest
+        return fixity_index.get(content_path)
+
+    # One opener per content file, shared by the versions.
+    openers = {}
+
+    def opener(digest):
+        func = openers.get(digest)
+        if func is None:
+            func = partial(storage.open, join(object_path, manifest[digest][0]))
+            openers[digest] = func
+        return func
+
+    def files_loader(state):
+        def load():
+            for digest, logical_paths in state.items():
+                fixity = content_fixity(manifest[digest][0])
+                stream = opener(digest)
+                for logical_path in logical_paths:
+                    yield VersionFile(logical_path, stream, digest, fixity=fixity)
+
+        return load
+
+    def changes_loader(previous_state, state):
+        def load():
+            previous = {}
+            for digest, logical_paths in previous_state.items():
+                for logical_path in logical_paths:
+                    previous[logical_path] = digest
+            files = []
+            for digest, logical_paths in state.items():
+                for logical_path in logical_paths:
+                    if previous.pop(logical_path, None) != digest:
+                        fixity = content_fixity(manifest[digest][0])
+                        files.append(
+                            VersionFile(
+                                logical_path, opener(digest), digest, fixity=fixity
+                            )
+                        )
+            # Paths left are not in the version anymore.
+            return files, list(previous)
+
+        return load
+
+    obj = OCFLObject(
+        inventory["id"],
+        content_directory=inventory.get("contentDirectory", "content"),
+        digest_algorithm=inventory["digestAlgorithm"],
+        spec=inventory["type"].split("/")[3],
+    )
+    versions = inventory["versions"]
+    # Version names may be zero-padded (e.g. "v002"), see 4.2.
+    names = sorted(versions, key=lambda name: int(name[1:]))
+    previous = None
+    for idx, name in enumerate(names):
+        v = versions[name]
+        # Start a new chain of derived versions every ``max_depth`` versions,
+        # so that lookups stay short without loading all earlier versions.
+        if idx % FilesManager.max_depth == 0:
+            previous = None
+        if previous is None:
+            loader = files_loader(v["state"])
+        else:
+            loader = changes_loader(versions[names[idx - 1]]["state"], v["state"])
+        previous = OCFLVersion(
+            parse_created(v["created"]),
+            message=v.get("message"),
+            user=v.get("user"),
+            files_loader=loader,
+            parent=previous,
+        )
+        obj.versions.append(previous)
+    return obj
+
+
+def version_section(v, state=None):
+    """Get the inventory section of a single version.
+
+    :param state: The state of the version, if already computed (optional).
+    """
+    result = {
+        "created": v.created.isoformat(),
+        "state": v.state if state is None else state,
+    }
+    if v.message:
+        result["message"] = v.message
+    if v.user:
+        result["user"] = v.user
+    return result
+
+
+def build_sections(obj, version=None):
+    """Build the manifest, fixity and versions sections in a single pass.
+
+    The files of each version are visited once. After each version, a tuple
+    ``(version_number, manifest, fixity, versions)`` is yielded with the
+    sections of the inventory up to and including that version. The
+    dictionaries are extended in place when the generator is advanced, so a
+    yielded tuple is only valid until the next iteration.
+
+    :param obj: An OCFL object.
+    :param version: The last version number to include (optional).
+    """
+    manifest = {}
+    fixity = {}
+    versions = {}
+    state = None
+    for idx, v, files in obj.versions.enumerated_changes(version=version):
+        derived = files is not v.files
+        if derived:
+            # Derived from the previous version: only the changed files can
+            # add content, and the state shares the unchanged digests.
+            state = v.files.state(parent_state=state)
+        else:
+            state = {}
+        for f in files:
+            if not derived:
+                if f.digest in state:
+                    state[f.digest].append(f.logical_path)
+                else:
+                    state[f.digest] = [f.logical_path]
+            if f.digest in manifest:
+                continue
+            content_path = f.content_path(idx, obj.content_directory)
+            manifest[f.digest] = [content_path]
+            if f.fixity:
+                for algo, digest in f.fixity.items():
+                    algo_fixity = fixity.setdefault(algo, {})
+                    algo_fixity.setdefault(digest, []).append(content_path)
+        versions[f"v{idx}"] = version_section(v, state=state)
+        yield idx, manifest, fixity, versions
+
+
+class BaseInventory:
+    """Base class for inventories providing the serialization."""
+
+    #
+    # Serialization
+    #
+    def to_dict(self):
+        """Full representation of the inventory."""
+        return {
+            "id": self.id,
+            "type": self.type,
+            "digestAlgorithm": self.digestAlgorithm,
+            "head": self.head,
+            "contentDirectory": self.contentDirectory,
+            "manifest": self.manifest,
+            "versions": self.versions,
+            "fixity": self.fixity,
+        }
+
+    @property
+    def json(self):
+        """JSON serialization of the inventory."""
+        return json.dumps(self.to_dict(), indent=2, sort_keys=True).encode("utf8")
+
+    def iter_json(self, chunksize=1024 * 1024):
+        """Iterate over the JSON serialization of the inventory in chunks.
+
+        The output is identical to ``json``, but only about ``chunksize``
+        bytes of serialized output are held in memory at a time. Building
+        each chunk emits an ``inventory.serialize`` span, so the time spent
+        by the consumer between chunks (e.g. writing them) is not included.
+        """
+        encoder = json.JSONEncoder(indent=2, sort_keys=True)
+        parts = None
+        done = False
+        while not done:
+            with span("inventory.serialize") as s:
+                if parts is None:
+                    parts = encoder.iterencode(self.to_dict())
+                chunk = []
+                size = 0
+                for part in parts:
+                    chunk.append(part)
+                    size += len(part)
+                    if size >= chunksize:
+                        break
+                else:
+                    done = True
+                data = "".join(chunk).encode("utf8")
+                s.set("bytes", len(data))
+            if data:
+                yield data
+
+
+class Inventory(BaseInventory):
     """Inventory for an OCFL object."""
 
-    def __init__(self, obj, version=None):
+    def __init__(self, obj, version=None, sections=None):
         """Constructor.
 
         :param obj: An OCFL object.
         :param version: The version number of the object to generate the
             inventory for (optional). Defaults to most recent version.
+        :param sections: Tuple of already built manifest, fixity and versions
+            sections (optional). See ``build_sections()``.
         """
         self._obj = obj
         self._version = version
+        self._sections = sections
+
+    @classmethod
+    def for_versions(cls, obj):
+        """Iterate over the inventories of all versions of an object.
+
+        All inventories are built from a single pass over the versions, and
+        each inventory must be serialized before advancing the iterator.
+        """
+        for version_number, *sections in build_sections(obj):
+            yield cls(obj, version=version_number, sections=sections)
+
+    def _build(self):
+        """Get the manifest, fixity and versions sections."""
+        if self._sections is None:
+            self._sections = ({}, {}, {})
+            for version_number, *sections in build_sections(
+                self._obj, version=self._version
+            ):
+                self._sections = sections
+        return self._sections
 
     #
     # Inventory properties
@@ -65,63 +345,120 @@ class Inventory:
     @property
     def manifest(self):
         """Get the manifest section."""
-        _manifest = {}
-        for content_path, f in self._obj.content_files(version=self._version):
+        return self._build()[0]
+
+    @property
+    def fixity(self):
+        """Get the fixity section."""
+        return self._build()[1]
+
+    @property
+    def versions(self):
+        """Get the versions section."""
+        return self._build()[2]
+
+
+class UpdatedInventory(BaseInventory):
+    """Inventory for a new version of an existing OCFL object.
+
+    The inventory is derived from the previous inventory, so only the files
+    of the new version are examined. The manifest is extended with the
+    content of the new version which was not already part of the object.
+    """
+
+    def __init__(self, previous, version):
+        """Constructor.
+
+        :param previous: The previous inventory as a dictionary.
+        :param version: The new OCFL version.
+        """
+        self._previous = previous
+        self._version = version
+        head = previous["head"]
+        self._version_number = int(head[1:]) + 1
+        # Zero-padded version names keep their width, see 4.2.
+        self._width = 0 if "v1" in previous["versions"] else len(head) - 1
+        if self._width and len(str(self._version_number)) > self._width:
+            raise ConstraintException(
+                f"Version {self._version_number} exceeds the zero-padded "
+                f"version names of the object (head {head})."
+            )
+        self._content_files = None
+
+    @property
+    def version_number(self):
+        """Get the number of the new version."""
+        return self._version_number
+
+    @property
+    def id(self):
+        """Get the object identifier."""
+        return self._previous["id"]
+
+    @property
+    def type(self):
+        """Get the inventory type."""
+        return self._previous["type"]
+
+    @property
+    def digestAlgorithm(self):
+        """Get the digest algorithm."""
+        return self._previous["digestAlgorithm"]
+
+    @property
+    def head(self):
+        """Get version directory name of the new version."""
+        return f"v{self._version_number:0{self._width}d}"
+
+    @property
+    def contentDirectory(self):
+        """Get the content directory."""
+        return self._previous.get("contentDirectory", "content")
+
+    def content_files(self):
+        """List of content files not already present in the object."""
+        if self._content_files is None:
+            self._content_files = []
+            known = set(self._previous["manifest"])
+            for f in self._version.files:
+                if f.digest not in known:
+                    known.add(f.digest)
+                    content_path = f.content_path(
+                        self._version_number, self.contentDirectory, self._width
+                    )
+                    self._content_files.append((content_path, f))
+        return self._content_files
+
+    @property
+    def manifest(self):
+        """Get the manifest section."""
+        _manifest = dict(self._previous["manifest"])
+        for content_path, f in self.content_files():
             _manifest[f.digest] = [content_path]
         return _manifest
 
     @property
     def fixity(self):
         """Get the fixity section."""
-        _fixity = {}
-        for content_path, f in self._obj.content_files(version=self._version):
+        _fixity = {
+            algo: dict(digests)
+            for algo, digests in self._previous.get("fixity", {}).items()
+        }
+        for content_path, f in self.content_files():
             if not f.fixity:
                 continue
-            for algo, digest in f.fixity:
-                if algo not in _fixity:
-                    _fixity[algo] = {}
-                if digest not in _fixity[algo]:
-                    _fixity[algo][digest] = []
-                _fixity[algo][digest].append(content_path)
+            for algo, digest in f.fixity.items():
+                algo_fixity = _fixity.setdefault(algo, {})
+                algo_fixity[digest] = algo_fixity.get(digest, []) + [content_path]
         return _fixity
 
     @property
     def versions(self):
         """Get the versions section."""
-        _versions = {}
-        for idx, v in self._obj.versions.enumerated(version=self._version):
-            version_string = f"v{idx}"
-            _versions[version_string] = {
-                "created": v.created.isoformat(),
-                "state": v.state,
-            }
-            if v.message:
-                _versions[version_string]["message"] = v.message
-            if v.user:
-                _versions[version_string]["user"] = v.user
+        _versions = dict(self._previous["versions"])
+        _versions[self.head] = version_section(self._version)
         return _versions
 
-    #
-    # Serialization
-    #
-    def to_dict(self):
-        """Full representation of the inventory."""
-        return {
-            "id": self.id,
-            "type": self.type,
-            "digestAlgorithm": self.digestAlgorithm,
-            "head": self.head,
-            "contentDirectory": self.contentDirectory,
-            "manifest": self.manifest,
-            "versions": self.versions,
-            "fixity": self.fixity,
-        }
-
-    @property
-    def json(self):
-        """JSON serialization of the inventory."""
-        return json.dumps(self.to_dict(), indent=2, sort_keys=True).encode("utf8")
-
 
 class InventoryContent:
     """Serialized content of an inventory with sidecar file."""
@@ -130,14 +467,30 @@ class InventoryContent:
         """Constructor."""
         self._inventory = inventory
         self._bytes = None
+        self._reader = None
 
     @property
     def digest(self):
         """Digest of the inventory."""
-        h = hashlib.new(self._inventory.digestAlgorithm)
+        algo = self._inventory.digestAlgorithm
+        if self._reader is not None and self._reader.eof:
+            return self._reader.digests[algo]
+        h = hashlib.new(algo)
         h.update(self.bytes)
         return h.hexdigest()
 
+    def stream(self):
+        """Stream of the serialized inventory.
+
+        The inventory is serialized while the stream is read, and the digest
+        is computed at the same time. Once the stream has been read to the
+        end, ``digest`` and ``sidecar_bytes`` are available without
+        serializing the inventory again.
+        """
+        algo = self._inventory.digestAlgorithm
+        self._reader = DigestReader(IterStream(self._inventory.iter_json()), [algo])
+        return self._reader
+
     @property
     def name(self):
         """File name."""
@@ -152,9 +505,14 @@ class InventoryContent:
     def bytes(self):
         """Inventory content as bytes."""
         if self._bytes is None:
-            self._bytes = self._inventory.json
+            self._bytes = self._serialize()
         return self._bytes
 
+    @traced("inventory.bytes", nbytes=len)
+    def _serialize(self):
+        """Serialize the inventory in memory."""
+        return self._inventory.json
+
     @property
     def sidecar_bytes(self):
         """Sidecar file content."""
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+
+"""Listing of the objects in an OCFL storage root."""
+
+import re
+from fnmatch import fnmatchcase
+
+
+def match(object_id, prefix=None, pattern=None):
+    """Check if an object identifier matches a prefix and a pattern.
+
+    :param pattern: A glob pattern (e.g. ``image-*``) or a compiled regular
+        expression which must match the full identifier.
+    """
+    if prefix and not object_id.startswith(prefix):
+        return False
+    if pattern is None:
+        return True
+    if isinstance(pattern, re.Pattern):
+        return pattern.fullmatch(object_id) is not None
+    return fnmatchcase(object_id, pattern)
+
+
+class ObjectListing:
+    """Iterator over object identifiers with a resumable cursor.
+
+    After iterating (part of) the listing, ``cursor`` can be passed to a new
+    listing to continue after the last returned object.
+    """
+
+    def __init__(self, results, limit=None, cursor=None):
+        """Constructor.
+
+        :param results: Iterable of ``(cursor, object_id)`` tuples.
+        :param limit: Maximum number of objects to return (optional).
+        :param cursor: The initial cursor (optional).
+        """
+        self._results = iter(results)
+        self._limit = limit
+        self._count = 0
+        self.cursor = cursor
+
+    def __iter__(self):
+        """Iterator over object identifiers."""
+        return self
+
+    def __next__(self):
+        """Next object identifier."""
+        if self._limit is not None and self._count >= self._limit:
+            raise StopIteration
+        self.cursor, object_id = next(self._results)
+        self._count += 1
+        return object_id
@@ -14,10 +14,28 @@ storage root by first writing objects to a workspace and later transfer them
 to the root as described in the OCFL Implementation Notes.
 """
 
+import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from io import BytesIO
+from os.path import join
 
-from .inventory import Inventory, InventoryContent
+from ..errors import ObjectExistsError
+from .ingest import Checkpoint, IngestResult
+from .inventory import (
+    Inventory,
+    InventoryContent,
+    UpdatedInventory,
+    load_inventory,
+    object_from_inventory,
+)
+from .listing import ObjectListing, match
 from .transaction import Transaction
+from .validator import Validator
+
+
+def namaste_bytes(filename):
+    """Content of a conformance declaration file (e.g. ``0=ocfl_1.1``)."""
+    return f"{filename.split('=', 1)[1]}\n".encode("utf8")
 
 
 class OCFLRepository:
@@ -30,16 +48,42 @@ class OCFLRepository:
     "Fowler (2002). Patterns of Enterprise Application Architecture".
     """
 
-    def __init__(self, root, storage, workspace_storage=None):
-        """Constrcutor."""
+    def __init__(
+        self,
+        root,
+        storage,
+        workspace_storage=None,
+        max_workers=None,
+        index=None,
+        inventory_cache=None,
+        write_executor=None,
+    ):
+        """Constrcutor.
+
+        :param max_workers: Number of threads used to write content files
+            into the workspace (optional). Defaults to sequential writes.
+        :param write_executor: Executor running the concurrent writes of
+            ``max_workers`` (optional), shared by all transactions to bound
+            the threads of concurrent ingests. Defaults to a new thread pool
+            for each ``Transaction.write_many()``.
+        :param index: An ``ObjectIndex`` maintained when objects are added
+            and used for listing and existence checks (optional).
+        :param inventory_cache: An ``InventoryCache`` used when reading the
+            inventories of objects (optional).
+        """
         self.root = root
         self.storage = storage
         self.workspace_storage = workspace_storage
+        self.max_workers = max_workers
+        self.index = index
+        self.inventory_cache = inventory_cache
+        self.write_executor = write_executor
 
     def initialize(self):
         """Initialize OCFL repository."""
         # Write root conformace declaration - See 4.2
-        self.storage.write(self.root.namaste, BytesIO(b""))
+        namaste = self.root.namaste
+        self.storage.write(namaste, BytesIO(namaste_bytes(namaste)))
         # Write optional human readable text - See 4.1
         if self.root.human_text is not None:
             self.storage.write(
@@ -49,41 +93,273 @@ class OCFLRepository:
         layout_json = self.root.layout.json_bytes
         if layout_json is not None:
             self.storage.write("ocfl_layout.json", BytesIO(layout_json))
+        # Write layout extension configuration - See 4.4
+        layout_config = self.root.layout.config
+        if layout_config is not None:
+            self.storage.write(
+                f"extensions/{self.root.layout.extension}/config.json",
+                BytesIO(json.dumps(layout_config, indent=2).encode("utf8")),
+            )
 
     def add(self, obj):
-        """Add an OCFL object to the storage root."""
+        """Add an OCFL object to the storage root.
+
+        Raises ``ObjectExistsError`` if the object already exists.
+        """
+        if self.storage.exists(self.root.layout.path_for_id(obj.id)):
+            raise ObjectExistsError(f"Object {obj.id} already exists.")
         with Transaction(self, obj) as t:
             inventory = Inventory(obj)
             # Write object conformace declaration - see 3.2
-            t.write(inventory.nameste, BytesIO(b""))
+            t.write(inventory.nameste, BytesIO(namaste_bytes(inventory.nameste)))
             # Write content files - see 3.3
-            for content_path, f in obj.content_files():
-                t.write(content_path, f.stream)
-            # Write main inventory - see 3.5 and 3.6
-            content = InventoryContent(inventory)
-            t.write(content.name, BytesIO(content.bytes))
-            t.write(content.sidecar_name, BytesIO(content.sidecar_bytes))
-            # Write version inventories (optional - see 3.7)
-            for version_number in obj.version_numbers:
-                content = InventoryContent(Inventory(obj, version=version_number))
-                t.write(f"v{version_number}/{content.name}", BytesIO(content.bytes))
-                t.write(
-                    f"v{version_number}/{content.sidecar_name}",
-                    BytesIO(content.sidecar_bytes),
-                )
+            staged = self._stage_deferred(t, obj.deferred_files(), obj.digest_algorithm)
+            self._write_content(t, obj.content_files(), staged)
+            # Write version inventories (optional - see 3.7). All inventories
+            # are built in a single pass over the versions.
+            version_inventory = inventory
+            for version_inventory in Inventory.for_versions(obj):
+                self._write_inventory(t, version_inventory, version_inventory.head)
+            # Write main inventory, identical to the head version inventory -
+            # see 3.5 and 3.6
+            content = self._write_inventory(t, version_inventory)
             # Move/copy to storage root
             t.commit()
+            if self.index is not None:
+                self.index.update(
+                    obj.id,
+                    t.object_path,
+                    version_inventory.head,
+                    content.digest,
+                    t.bytes_written,
+                )
+
+    def add_many(self, objects, workers=4, max_pending=None, checkpoint=None):
+        """Add many OCFL objects to the storage root, several at a time.
+
+        Each object is added in its own transaction, so hashing, staging and
+        committing of different objects overlap. A failing object does not
+        abort the ingest, its error is reported in the results instead.
+
+        :param objects: Iterable of OCFL objects. It is consumed lazily, so a
+            generator keeps at most ``max_pending`` objects in memory.
+        :param workers: Number of objects added concurrently.
+        :param max_pending: Maximum number of objects in flight (defaults to
+            twice the number of workers).
+        :param checkpoint: Path of a checkpoint file (optional). Added objects
+            are recorded in it, and an interrupted ingest is resumed by
+            running it again with the same objects: recorded objects are
+            skipped, and objects already in the storage root are reported as
+            added.
+        :returns: List of ``IngestResult`` in order of completion.
+        """
+        if max_pending is None:
+            max_pending = 2 * workers
+        if checkpoint is not None:
+            checkpoint = Checkpoint(checkpoint)
+        results = []
+        pending = {}
+
+        def collect(futures):
+            for future in futures:
+                obj_id = pending.pop(future)
+                error = future.exception()
+                if error is None and checkpoint is not None:
+                    checkpoint.add(obj_id)
+                results.append(IngestResult(obj_id, error))
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for obj in objects:
+                    if checkpoint is not None and obj.id in checkpoint:
+                        continue
+                    if len(pending) >= max_pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    resume = checkpoint is not None
+                    pending[executor.submit(self._ingest, obj, resume)] = obj.id
+                collect(wait(pending).done)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        return results
+
+    def _ingest(self, obj, resume=False):
+        """Add an object, unless resuming and the object already exists."""
+        if resume and self.exists(obj.id):
+            return
+        self.add(obj)
+
+    def _stage_deferred(self, t, files, digest_algorithm):
+        """Stage files without a digest while computing their digests.
+
+        :returns: Dictionary of file to staging path.
+        """
+        staged = {}
+        for f in files:
+            algorithms = [digest_algorithm] + f.fixity_algorithms
+            staging_path, digests = t.stage(f.stream, algorithms)
+            fixity = {algo: digests[algo] for algo in f.fixity_algorithms}
+            f.resolve(digests[digest_algorithm], fixity=fixity or None)
+            staged[f] = staging_path
+        return staged
+
+    def _write_content(self, t, content_files, staged):
+        """Write the deduplicated content files.
+
+        Staged files are moved to their content path, or discarded if the
+        content is already present. Files created with a path or a callable
+        are only opened while they are written.
+        """
+        writes = []
+        for content_path, f in content_files:
+            staging_path = staged.pop(f, None)
+            if staging_path is not None:
+                t.place(staging_path, content_path)
+            else:
+                writes.append((content_path, f.stream))
+        t.write_many(writes)
+
+        # Remaining staged files have duplicate content.
+        for staging_path in staged.values():
+            t.discard(staging_path)
+
+    def _write_inventory(self, t, inventory, path=""):
+        """Write an inventory and its sidecar file.
+
+        The inventory is serialized while it is written and hashed, so the
+        serialized inventory is never held in memory as a whole.
+        """
+        content = InventoryContent(inventory)
+        t.write(join(path, content.name), content.stream())
+        t.write(join(path, content.sidecar_name), BytesIO(content.sidecar_bytes))
+        return content
 
     def add_version(self, obj_id, version):
-        """Add new version to an OCFL object."""
-        # TODO
-        pass
+        """Add new version to an OCFL object.
+
+        Only content not already present in the object is written, and only
+        the new root and version inventories. Existing versions are left
+        untouched.
+        """
+        object_path = self.root.layout.path_for_id(obj_id)
+        previous = self._load_inventory(obj_id, object_path)
+        with Transaction(self, object_path=object_path) as t:
+            deferred = [f for f in version.files if f.deferred]
+            staged = self._stage_deferred(t, deferred, previous["digestAlgorithm"])
+            inventory = UpdatedInventory(previous, version)
+            # Write new content files - see 3.3
+            self._write_content(t, inventory.content_files(), staged)
+            # Write version inventory and new root inventory - see 3.5 and 3.7
+            version_dir = inventory.head
+            self._write_inventory(t, inventory, version_dir)
+            content = self._write_inventory(t, inventory)
+            if self.index is not None:
+                size = self._updated_size(obj_id, object_path, previous, t)
+            # Move the new version into the object, then replace the root
+            # inventory (the sidecar last).
+            t.commit(paths=[version_dir, content.name, content.sidecar_name])
+            if self.index is not None:
+                if size is None:
+                    size = self.storage.size(object_path)
+                self.index.update(
+                    obj_id, object_path, version_dir, content.digest, size
+                )
+
+    def _updated_size(self, obj_id, object_path, previous, t):
+        """Compute the size of an updated object from its index entry."""
+        entry = self.index.get(obj_id)
+        if entry is None:
+            return None
+        sidecar = f"inventory.json.{previous['digestAlgorithm'].upper()}"
+        replaced = self.storage.size(join(object_path, "inventory.json"))
+        replaced += self.storage.size(join(object_path, sidecar))
+        return entry.size - replaced + t.bytes_written
 
     def get(self, obj_id):
-        """Get an OCFL object from the storage root."""
-        # TODO
-        pass
+        """Get an OCFL object from the storage root.
+
+        The inventory is verified against its sidecar. Files of a version are
+        only loaded when accessed, and content streams opened on demand.
+        """
+        object_path = self.root.layout.path_for_id(obj_id)
+        inventory = self._load_inventory(obj_id, object_path)
+        return object_from_inventory(inventory, self.storage, object_path)
+
+    def _load_inventory(self, obj_id, object_path):
+        """Load the verified root inventory of an object, possibly cached."""
+        if self.inventory_cache is None:
+            return load_inventory(self.storage, object_path)
+        return self.inventory_cache.load(self.storage, obj_id, object_path)
+
+    def exists(self, obj_id):
+        """Check if an object exists in the storage root."""
+        if self.index is not None:
+            return self.index.exists(obj_id)
+        object_path = self.root.layout.path_for_id(obj_id)
+        return self.storage.exists(join(object_path, "inventory.json"))
+
+    def list_objects(self, prefix=None, pattern=None, limit=None, cursor=None):
+        """List objects in an OCFL root.
+
+        Objects are found in any storage layout by their conformance
+        declaration, or looked up in the object index if configured. Results
+        are produced while the storage root is walked.
+
+        :param prefix: Only objects with an identifier starting with prefix.
+        :param pattern: Only objects with an identifier matching a glob
+            pattern or a compiled regular expression.
+        :param limit: Maximum number of objects to list.
+        :param cursor: Continue a previous listing after its ``cursor``.
+        :returns: An ``ObjectListing`` iterating over object identifiers.
+        """
+        if self.index is not None:
+            glob = pattern if isinstance(pattern, str) else None
+            entries = self.index.list(prefix=prefix, pattern=glob, after=cursor)
+            if glob is None:
+                entries = (e for e in entries if match(e.id, pattern=pattern))
+            results = ((e.id, e.id) for e in entries)
+        else:
+            results = self._walk_objects(prefix, pattern, cursor)
+        return ObjectListing(results, limit=limit, cursor=cursor)
+
+    def _walk_objects(self, prefix, pattern, cursor):
+        """Walk the storage root for objects, yielding path and identifier."""
+        for path in self.storage.list_objects(after=cursor):
+            object_id = self.root.layout.id_for_path(path)
+            if object_id is None:
+                object_id = load_inventory(self.storage, path, verify=False)["id"]
+            if match(object_id, prefix=prefix, pattern=pattern):
+                yield path, object_id
+
+    def validate(self, obj_id):
+        """Validate an object in the storage root.
+
+        Checks the structure, the inventories and their sidecars, and the
+        digests of all content files.
+
+        :returns: A ``ValidationReport``.
+        """
+        object_path = self.root.layout.path_for_id(obj_id)
+        return Validator(self.storage, max_workers=self.max_workers).validate(
+            object_path
+        )
+
+    def validate_all(self, validator=None):
+        """Validate all objects in the storage root.
+
+        Objects are validated while the storage root is walked, several at a
+        time. The ``metrics`` of the validator give the throughput.
+
+        :param validator: A ``Validator`` for the storage (optional).
+        :returns: Iterator of ``ValidationReport`` in order of completion.
+        """
+        if validator is None:
+            validator = Validator(self.storage, max_workers=self.max_workers)
+        return validator.validate_all(self.storage.list_objects())
 
-    def list_objects(self):
-        """List objects in an OCFL root."""
-        return self.storage.list_objects()
+    def rebuild_index(self):
+        """Rebuild the object index from a full scan of the storage root."""
+        if self.index is None:
+            raise ValueError("The repository has no object index to rebuild.")
+        self.index.rebuild(self.storage)
@@ -8,10 +8,15 @@
 
 """Storage abstraction layer for the OCFL repository."""
 
-from .base import Storage
+from .async_filesystem import AsyncFileSystemStorage
+from .base import AsyncStorage, Storage
 from .filesystem import FileSystemStorage
+from .s3 import S3Storage
 
 __all__ = (
+    "AsyncFileSystemStorage",
+    "AsyncStorage",
     "Storage",
     "FileSystemStorage",
+    "S3Storage",
 )
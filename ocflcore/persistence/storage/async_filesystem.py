@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+
+"""Asynchronous file system storage for OCFL."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from .base import AsyncStorage
+from .filesystem import FileSystemStorage
+
+
+class AsyncFileSystemStorage(AsyncStorage):
+    """Asynchronous file system storage.
+
+    Blocking file system calls are run in a bounded thread pool, so the event
+    loop is never blocked and many concurrent operations share a fixed
+    number of threads. Storages (and repositories) can share an executor.
+    The wrapped synchronous storage is available as ``storage``.
+    """
+
+    def __init__(
+        self,
+        root_path,
+        transfer_mode="copy",
+        executor=None,
+        max_workers=8,
+        durability="batch",
+    ):
+        """Constructor.
+
+        :param root_path: Path to the storage root.
+        :param transfer_mode: See ``FileSystemStorage``.
+        :param durability: See ``FileSystemStorage``.
+        :param executor: Executor for blocking calls (optional). Defaults to
+            a new thread pool with ``max_workers`` threads.
+        """
+        self.storage = FileSystemStorage(
+            root_path, transfer_mode=transfer_mode, durability=durability
+        )
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="ocflcore"
+            )
+        self.executor = executor
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking callable in the executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def write(self, file_path, stream):
+        """Write stream to the given file path in the storage root."""
+        return await self.run(self.storage.write, file_path, stream)
+
+    async def move(self, other_storage, path):
+        """Move a directory from another (sync or async) storage."""
+        if isinstance(other_storage, AsyncStorage):
+            other_storage = other_storage.storage
+        return await self.run(self.storage.move, other_storage, path)
+
+    async def read_file(self, path):
+        """Read file and return BytesIO object."""
+        return await self.run(self.storage.read_file, path)
+
+    async def list_objects(self, after=None, batch_size=1000):
+        """Asynchronously iterate over the paths of the objects.
+
+        The storage root is walked in the executor in batches.
+        """
+        paths = self.storage.list_objects(after=after)
+        while True:
+            batch = await self.run(lambda: list(islice(paths, batch_size)))
+            if not batch:
+                break
+            for path in batch:
+                yield path
@@ -16,9 +16,109 @@ class Storage:
         """Write stream to the given file path.
 
         File path is relative to the OCFL storage root.
+
+        :returns: The number of bytes written.
         """
         raise NotImplementedError
 
     def move(self, other_storage, path):
-        """Move an director from one storage to another."""
+        """Move an director from one storage to another.
+
+        The generic implementation copies each file through the storage APIs
+        and then deletes it from the other storage. Storages override it to
+        use a faster method for storages of the same type (e.g. a rename or
+        a server-side copy).
+        """
+        for file_path in other_storage.iter_files(path):
+            with other_storage.open(file_path) as stream:
+                self.write(file_path, stream)
+        other_storage.delete(path)
+
+    def sync(self, path):
+        """Flush a file or a directory (recursively) to durable storage.
+
+        Called before a transaction moves an assembled object into the
+        storage root. Storages without a write cache do nothing.
+        """
+        pass
+
+    def iter_files(self, path):
+        """Iterate over the paths of all files below a path.
+
+        If the path is a file, only the path itself is returned.
+        """
+        raise NotImplementedError
+
+    def rename(self, src_path, dst_path):
+        """Rename a file within the storage."""
+        raise NotImplementedError
+
+    def delete(self, path):
+        """Delete a file or a directory (recursively) from the storage.
+
+        Deleting a path which does not exist is not an error.
+        """
+        raise NotImplementedError
+
+    def exists(self, path):
+        """Check if a file or directory exists."""
+        raise NotImplementedError
+
+    def size(self, path):
+        """Total size in bytes of a file or all files in a directory."""
+        raise NotImplementedError
+
+    def stat(self, path):
+        """Size and modification time of a file.
+
+        :returns: A tuple of the size in bytes and the modification time in
+            nanoseconds (``None`` if not supported by the storage).
+        """
+        return self.size(path), None
+
+    def walk_objects(self, path="", after=None):
+        """Iterate over the paths of all object roots below a path.
+
+        :param after: Only object roots with a path sorting after this path.
+        """
+        raise NotImplementedError
+
+    def list_objects(self, after=None):
+        """Iterate over the paths of the objects in the storage root."""
+        raise NotImplementedError
+
+    def open(self, path):
+        """Open a file for reading, returning a file-like object."""
+        raise NotImplementedError
+
+    def read_range(self, path, offset, length=None):
+        """Open a byte range of a file for reading."""
+        raise NotImplementedError
+
+    def read_file(self, path):
+        """Read a file into memory and return a BytesIO object."""
+        raise NotImplementedError
+
+
+class AsyncStorage:
+    """Base class for the asynchronous storage APIs.
+
+    Mirrors ``Storage`` with coroutines, for use from asyncio applications.
+    """
+
+    async def write(self, file_path, stream):
+        """Write stream to the given file path."""
+        raise NotImplementedError
+
+    async def move(self, other_storage, path):
+        """Move a directory from another storage."""
+        raise NotImplementedError
+
+    async def read_file(self, path):
+        """Read a file into memory and return a BytesIO object."""
+        raise NotImplementedError
+
+    async def list_objects(self, after=None):
+        """Asynchronously iterate over the paths of the objects."""
         raise NotImplementedError
+        yield
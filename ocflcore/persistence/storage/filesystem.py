@@ -7,43 +7,97 @@
 # terms of the MIT License; see LICENSE file for more details.
 
 """File system storage implementations for OCFL."""
+
+import ctypes
+import errno
+import heapq
+import mmap
+import os
 import shutil
+from functools import lru_cache
 from io import BytesIO
-from os import makedirs
-from os.path import basename, dirname, join
-from pathlib import Path
+from operator import attrgetter
+from os import makedirs, remove, scandir, stat
+from os.path import dirname, exists, isdir, join, relpath
+from stat import S_ISREG
+from uuid import uuid4
 
 import ocflcore.errors
 
+from ...instrumentation import traced
+from ...stream import LazyFile, RangeReader
 from .base import Storage
 
 
 class FileSystemStorage(Storage):
     """File system storage."""
 
-    def __init__(self, root_path):
+    transfer_modes = ("copy", "link")
+    durability_levels = ("none", "batch", "strict")
+    temp_prefix = ".ocflcore-tmp-"
+    walk_batch = 10000
+
+    def __init__(self, root_path, transfer_mode="copy", durability="batch"):
         """Construct the file system.
 
         :param root_path: Path to the storage root.
+        :param transfer_mode: How local files are written (defaults to
+            ``copy``). With ``copy``, files are cloned (reflink) or copied in
+            the kernel when possible. With ``link``, files are hard linked if
+            possible, so the written file shares its data with the source and
+            changes to the source also change the written file.
+        :param durability: When data is flushed to disk (defaults to
+            ``batch``). With ``none``, flushing is left to the operating
+            system. With ``batch``, ``sync()`` flushes a whole tree at once
+            (one ``syncfs()`` call if available) and moves flush the
+            directory they change. With ``strict``, additionally every file
+            and directory is flushed as soon as it is written or renamed.
         """
+        if transfer_mode not in self.transfer_modes:
+            raise ValueError(f"Invalid transfer mode {transfer_mode}.")
+        if durability not in self.durability_levels:
+            raise ValueError(f"Invalid durability {durability}.")
         self._root = root_path
+        self.transfer_mode = transfer_mode
+        self.durability = durability
 
     def _p(self, path):
         """Absolute path."""
         return join(self._root, path)
 
+    def local_path(self, path):
+        """Get the path of a file in the storage on the local file system."""
+        return self._p(path)
+
+    @traced("storage.write", nbytes=lambda size: size)
     def write(self, file_path, stream):
         """Write stream to the given file path in the storage root.
 
-        Automatically creates missing directories, and uses a 1MB chunk size.
+        Automatically creates missing directories, and uses a 10MB chunk size.
+        If the stream is a regular file on the local file system, the data is
+        transferred without copying it through Python, depending on the
+        transfer mode (see ``transfer_file()``).
         """
         file_path = self._p(file_path)
         dir_path = dirname(file_path)
         if dir_path:
             makedirs(dir_path, exist_ok=True)
 
+        src_fd = _regular_file_fd(stream)
+        if src_fd is not None:
+            size = transfer_file(stream, src_fd, file_path, self.transfer_mode)
+        else:
+            size = self._write_stream(file_path, stream)
+        if self.durability == "strict":
+            fsync_path(file_path)
+            fsync_path(dir_path or self._root)
+        return size
+
+    def _write_stream(self, file_path, stream):
+        """Write a stream in chunks of 10MB."""
         chunk_size = 10 * 1024 * 1024  # 10mb
 
+        size = 0
         with open(file_path, "wb") as fp:
             # Write in chunks
             while 1:
@@ -51,27 +105,260 @@ class FileSystemStorage(Storage):
                 if not chunk:
                     break
                 fp.write(chunk)
+                size += len(chunk)
+        return size
 
+    @traced("storage.move")
     def move(self, other_storage, path):
-        """Move between storage systems."""
-        other_path = join(other_storage._root, path)
-        our_path = self._p(path)
-        shutil.move(other_path, our_path)
-        # TODO: support other storage types
-
-    def list_objects(self):
-        """Return list of objects in the storage root."""
-        file_path = Path(self._p("."))
-        for path in file_path.glob("*/"):
-            if path.is_dir():
-                yield basename(path)
-        # TODO: exclude extensions/ (and others?)
-        # TODO: size/pagination
-        # TODO: allow wildcard for wanted objects (eg image*)
-        # TODO: allow regex for wanted objects (eg r"page-\d+.jpg")
+        """Move a file or directory from another storage.
+
+        Between file system storages on the same device, the path is moved
+        with a single atomic rename. Otherwise, it is first copied to a
+        temporary sibling of the destination, flushed and then renamed into
+        place, so the destination never holds a partial copy. An existing
+        destination file is replaced, while moving a directory onto a
+        non-empty directory fails. Unless the durability is ``none``, the
+        parent directory is flushed afterwards to persist the rename.
+        """
+        dst = self._p(path)
+        parent = dirname(dst) or self._root
+        makedirs(parent, exist_ok=True)
+
+        if isinstance(other_storage, FileSystemStorage):
+            src = other_storage.local_path(path)
+            try:
+                os.replace(src, dst)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                self._copy_replace(lambda tmp: _copy_tree(src, tmp), dst)
+                other_storage.delete(path)
+        else:
+            self._copy_replace(
+                lambda tmp: self._copy_from(other_storage, path, tmp), dst
+            )
+            other_storage.delete(path)
+
+        if self.durability != "none":
+            fsync_path(parent)
+
+    def _copy_replace(self, copy, dst):
+        """Copy to a temporary sibling of ``dst`` and rename it into place."""
+        tmp = join(dirname(dst) or self._root, f"{self.temp_prefix}{uuid4().hex}")
+        try:
+            copy(tmp)
+            self.sync(relpath(tmp, self._root))
+            os.replace(tmp, dst)
+        except BaseException:
+            self.delete(relpath(tmp, self._root))
+            raise
+
+    def _copy_from(self, other_storage, path, tmp):
+        """Copy all files below a path of another storage to ``tmp``."""
+        for file_path in other_storage.iter_files(path):
+            rel_path = relpath(file_path, path)
+            target = tmp if rel_path == "." else join(tmp, rel_path)
+            makedirs(dirname(target), exist_ok=True)
+            with other_storage.open(file_path) as stream:
+                self._write_stream(target, stream)
+
+    def sync(self, path):
+        """Flush a file or a directory (recursively) to disk.
+
+        With ``batch`` durability the file system is flushed with a single
+        ``syncfs()`` call when available (Linux), otherwise, like with
+        ``strict`` durability, each file and directory is flushed once.
+        """
+        if self.durability == "none":
+            return
+        path = self._p(path)
+        if self.durability == "batch" and syncfs(path):
+            return
+        fsync_tree(path)
+
+    def iter_files(self, path):
+        """Iterate over the paths of all files below a path."""
+        if not isdir(self._p(path)):
+            yield path
+            return
+        for dir_path, dir_names, file_names in os.walk(self._p(path)):
+            dir_names.sort()
+            rel_path = relpath(dir_path, self._root)
+            if rel_path == ".":
+                rel_path = ""
+            for name in sorted(file_names):
+                yield join(rel_path, name)
+
+    def rename(self, src_path, dst_path):
+        """Rename a file, creating missing directories of the destination."""
+        dst_path = self._p(dst_path)
+        dir_path = dirname(dst_path)
+        if dir_path:
+            makedirs(dir_path, exist_ok=True)
+        os.replace(self._p(src_path), dst_path)
+        if self.durability == "strict":
+            fsync_path(dir_path or self._root)
+
+    def delete(self, path):
+        """Delete a file or directory."""
+        path = self._p(path)
+        try:
+            if isdir(path):
+                shutil.rmtree(path)
+            else:
+                remove(path)
+        except FileNotFoundError:
+            pass
+
+    def exists(self, path):
+        """Check if a file or directory exists."""
+        return exists(self._p(path))
+
+    def size(self, path):
+        """Total size in bytes of a file or all files in a directory."""
+        path = self._p(path)
+        if not isdir(path):
+            try:
+                return stat(path).st_size
+            except FileNotFoundError:
+                raise ocflcore.errors.OCFLFileNotFoundError()
+        total = 0
+        dirs = [path]
+        while dirs:
+            with scandir(dirs.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                    else:
+                        total += entry.stat(follow_symlinks=False).st_size
+        return total
+
+    def stat(self, path):
+        """Size and modification time (in nanoseconds) of a file."""
+        try:
+            st = stat(self._p(path))
+        except FileNotFoundError:
+            raise ocflcore.errors.OCFLFileNotFoundError()
+        return st.st_size, st.st_mtime_ns
+
+    def walk_objects(self, path="", after=None):
+        """Iterate over the paths of all object roots below a path.
+
+        Object roots are identified by their conformance declaration file
+        (``0=ocfl_object_*``) and are not descended into. Directories are
+        visited in sorted order, and the ``extensions`` directory of the
+        storage root as well as temporary directories of interrupted moves
+        are skipped. At most ``walk_batch`` entries of each directory on the
+        current path are held in memory: a larger directory (e.g. the
+        storage root with ``TopLevelLayout``) is read once per batch, so an
+        ``ObjectIndex`` is preferable to list very large flat roots.
+
+        :param after: Only object roots with a path sorting after this path
+            (optional). Used to resume a walk.
+        """
+        after_name, after_rest = None, None
+        if after is not None:
+            after_name, _, after_rest = after.partition("/")
+        lower, inclusive = after_name, True
+        while True:
+            try:
+                entries, is_object = self._scan(self._p(path), lower, inclusive)
+            except FileNotFoundError:
+                return
+            if is_object:
+                if after is None:
+                    yield path
+                return
+            for entry in entries:
+                if not path and entry.name == "extensions":
+                    continue
+                if entry.name.startswith(self.temp_prefix):
+                    continue
+                rest = None
+                if entry.name == after_name:
+                    if not after_rest:
+                        # The cursor is this object root itself.
+                        continue
+                    rest = after_rest
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self.walk_objects(join(path, entry.name), after=rest)
+            if len(entries) < self.walk_batch:
+                return
+            lower, inclusive = entries[-1].name, False
+
+    def _scan(self, dir_path, lower=None, inclusive=True):
+        """Read the first ``walk_batch`` entries of a directory, sorted.
+
+        :param lower: Only entries with a name after this name (optional).
+        :param inclusive: Whether an entry named ``lower`` is included.
+        :returns: A tuple of the entries, and whether the directory is an
+            object root.
+        """
+        is_object = False
+
+        def candidates(entries):
+            nonlocal is_object
+            for entry in entries:
+                name = entry.name
+                if name.startswith("0=ocfl_object_"):
+                    is_object = True
+                if lower is None or name > lower or (inclusive and name == lower):
+                    yield entry
+
+        with scandir(dir_path) as it:
+            entries = heapq.nsmallest(
+                self.walk_batch, candidates(it), key=attrgetter("name")
+            )
+        return entries, is_object
+
+    def list_objects(self, after=None):
+        """Iterate over the paths of the objects in the storage root."""
+        return self.walk_objects(after=after)
+
+    def open(self, path):
+        """Open a file for reading.
+
+        The file is only opened when first read, so missing files raise
+        ``OCFLFileNotFoundError`` on first use.
+        """
+        file_path = self._p(path)
+
+        def opener():
+            try:
+                return open(file_path, "rb")
+            except FileNotFoundError:
+                raise ocflcore.errors.OCFLFileNotFoundError()
+
+        return LazyFile(opener)
+
+    def read_range(self, path, offset, length=None):
+        """Open a byte range of a file for reading.
+
+        :param offset: Start of the range.
+        :param length: Length of the range (defaults to the end of file).
+        """
+        return RangeReader(self.open(path), offset, length=length)
+
+    def mmap(self, path):
+        """Memory-map a file and return a read-only ``memoryview``.
+
+        The mapping stays valid as long as the memoryview is referenced.
+        """
+        try:
+            with open(self._p(path), "rb") as fp:
+                if os.fstat(fp.fileno()).st_size == 0:
+                    return memoryview(b"")
+                return memoryview(mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ))
+        except FileNotFoundError:
+            raise ocflcore.errors.OCFLFileNotFoundError()
 
+    @traced("storage.read_file", nbytes=lambda data: data.getbuffer().nbytes)
     def read_file(self, path):
-        """Read file and return BytesIO object."""
+        """Read file and return BytesIO object.
+
+        Convenience wrapper which holds the full file in memory. Use
+        ``open()``, ``read_range()`` or ``mmap()`` for large files.
+        """
         file_path = self._p(path)
         file_bytes = BytesIO()
         try:
@@ -82,3 +369,188 @@ class FileSystemStorage(Storage):
             raise ocflcore.errors.OCFLFileNotFoundError()
         file_bytes.seek(0)
         return file_bytes
+
+
+#
+# Durability
+#
+def fsync_path(path):
+    """Flush a file or a directory to disk."""
+    if os.name == "nt" and isdir(path):
+        # Directories cannot be opened (nor flushed) on Windows.
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_tree(path):
+    """Flush each file and directory below a path to disk, bottom-up."""
+    if not isdir(path):
+        fsync_path(path)
+        return
+    for dir_path, dir_names, file_names in os.walk(path, topdown=False):
+        for name in file_names:
+            fsync_path(join(dir_path, name))
+        fsync_path(dir_path)
+
+
+@lru_cache(maxsize=None)
+def _libc_syncfs():
+    """Get the ``syncfs()`` function of the C library if available."""
+    try:
+        return ctypes.CDLL(None, use_errno=True).syncfs
+    except (OSError, AttributeError, TypeError):
+        return None
+
+
+def syncfs(path):
+    """Flush the entire file system containing a path to disk.
+
+    :returns: ``False`` if ``syncfs()`` is not supported by the platform.
+    """
+    func = _libc_syncfs()
+    if func is None:
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if func(fd) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+    finally:
+        os.close(fd)
+    return True
+
+
+def _copy_tree(src, dst):
+    """Copy a file or a directory."""
+    if isdir(src):
+        shutil.copytree(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+
+#
+# Zero-copy transfer of local files
+#
+FICLONE = 0x40049409  # From linux/fs.h
+
+
+def _regular_file_fd(stream):
+    """Get the file descriptor of a stream if it is a regular file."""
+    try:
+        fd = stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        # E.g. BytesIO raises io.UnsupportedOperation (an OSError).
+        return None
+    try:
+        return fd if S_ISREG(os.fstat(fd).st_mode) else None
+    except OSError:
+        return None
+
+
+def transfer_file(stream, src_fd, dst_path, mode="copy"):
+    """Write the rest of a regular file to a path, avoiding user-space copies.
+
+    Tries in order, falling back to the next method if one is not supported
+    (e.g. by the file system or the platform):
+
+    1. ``os.link()`` (only in ``link`` mode and from the start of the file).
+    2. ``FICLONE`` reflink (only from the start of the file).
+    3. ``os.copy_file_range()``.
+    4. ``os.sendfile()``.
+    5. Read/write loop.
+
+    The stream position is moved to the end of the file. ``OSError`` is
+    raised if the file ends before it was fully written.
+
+    :returns: The number of bytes written.
+    """
+    offset = stream.tell()
+    size = os.fstat(src_fd).st_size - offset
+    name = getattr(stream, "name", None)
+
+    if mode == "link" and offset == 0 and isinstance(name, str):
+        try:
+            if exists(dst_path):
+                remove(dst_path)
+            os.link(name, dst_path)
+            stream.seek(offset + size)
+            return size
+        except OSError:
+            pass
+
+    dst_fd = os.open(dst_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        if offset == 0 and _reflink(src_fd, dst_fd):
+            copied = size
+        else:
+            copied = _copy_range(src_fd, dst_fd, offset, size)
+    finally:
+        os.close(dst_fd)
+    stream.seek(offset + copied)
+    return copied
+
+
+def _reflink(src_fd, dst_fd):
+    """Clone a file (copy-on-write) if supported by the file system."""
+    try:
+        import fcntl
+
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except (ImportError, OSError):
+        return False
+
+
+def _copy_range(src_fd, dst_fd, offset, size):
+    """Copy a range of a file in the kernel if possible.
+
+    A method which copies nothing on its first call is treated as not
+    supported (as ``shutil`` does). If the source ends before ``size`` bytes
+    were copied (e.g. it was truncated meanwhile), ``OSError`` is raised so
+    that a partial file is never kept.
+    """
+    copied = 0
+    for method in (_copy_file_range, _sendfile):
+        start = copied
+        try:
+            while copied < size:
+                n = method(src_fd, dst_fd, offset + copied, size - copied)
+                if n == 0:
+                    break
+                copied += n
+        except (AttributeError, OSError):
+            # Not supported by platform or file system, continue at the
+            # position where the previous method stopped.
+            os.lseek(dst_fd, copied, os.SEEK_SET)
+            continue
+        if copied == size:
+            return copied
+        if copied > start:
+            raise _short_copy(copied, size)
+    # Fall back to a read/write loop.
+    chunk_size = 10 * 1024 * 1024
+    while copied < size:
+        chunk = os.pread(src_fd, min(chunk_size, size - copied), offset + copied)
+        if not chunk:
+            raise _short_copy(copied, size)
+        copied += os.write(dst_fd, chunk)
+    return copied
+
+
+def _short_copy(copied, size):
+    """Error for a source file which ended before it was fully copied."""
+    return OSError(errno.ENODATA, f"Source file ended after {copied} of {size} bytes.")
+
+
+def _copy_file_range(src_fd, dst_fd, offset, count):
+    """Copy using copy_file_range (Linux)."""
+    return os.copy_file_range(src_fd, dst_fd, count, offset_src=offset)
+
+
+def _sendfile(src_fd, dst_fd, offset, count):
+    """Copy using sendfile (Linux supports files as destination)."""
+    return os.sendfile(dst_fd, src_fd, offset, count)
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+
+"""S3-compatible object storage for OCFL.
+
+Requires ``boto3`` (install with ``pip install ocflcore[s3]``).
+"""
+
+from io import BytesIO
+from os.path import basename
+
+import ocflcore.errors
+
+from ...instrumentation import traced
+from ...stream import DigestReader, LazyFile
+from .base import Storage
+
+
+class S3Storage(Storage):
+    """Storage in a bucket of an S3-compatible object store.
+
+    Paths are mapped to keys below an optional prefix. Large files are
+    uploaded with parallel multipart uploads, and moving between two S3
+    storages uses server-side copies, so data is never downloaded.
+    """
+
+    def __init__(
+        self,
+        bucket,
+        prefix="",
+        client=None,
+        transfer_config=None,
+        max_pool_connections=50,
+        **client_kwargs,
+    ):
+        """Constructor.
+
+        :param bucket: Name of the bucket.
+        :param prefix: Key prefix of the storage root (optional).
+        :param client: A boto3 S3 client (optional). Share a client between
+            storages to share its connection pool across transactions.
+        :param transfer_config: A ``boto3.s3.transfer.TransferConfig`` for
+            multipart thresholds, part sizes and concurrency (optional).
+        :param max_pool_connections: Connection pool size of a new client.
+        :param client_kwargs: Arguments for creating a new client (e.g.
+            ``endpoint_url`` for MinIO).
+        """
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        if client is None:
+            client = boto3.client(
+                "s3",
+                config=Config(max_pool_connections=max_pool_connections),
+                **client_kwargs,
+            )
+        if transfer_config is None:
+            transfer_config = TransferConfig(
+                max_concurrency=min(10, max_pool_connections)
+            )
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.transfer_config = transfer_config
+
+    def _key(self, path):
+        """Key of a path."""
+        path = path.strip("/")
+        if not self.prefix:
+            return path
+        return f"{self.prefix}/{path}" if path else self.prefix
+
+    def _path(self, key):
+        """Path of a key."""
+        if not self.prefix:
+            return key
+        start = len(self.prefix) + 1
+        return key[start:]
+
+    def _iter_keys(self, prefix, start_after=None):
+        """Iterate over all objects (as dicts) with a key prefix."""
+        kwargs = {"Bucket": self.bucket, "Prefix": prefix}
+        if start_after is not None:
+            kwargs["StartAfter"] = start_after
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(**kwargs):
+            yield from page.get("Contents", [])
+
+    def _dir_prefix(self, path):
+        """Key prefix of the contents of a directory path."""
+        key = self._key(path)
+        return f"{key}/" if key else ""
+
+    def _is_file(self, path):
+        """Check if an object exists with exactly this key."""
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(path))
+            return True
+        except ClientError:
+            return False
+
+    #
+    # Storage API
+    #
+    @traced("storage.write", nbytes=lambda size: size)
+    def write(self, file_path, stream):
+        """Write a stream, using a parallel multipart upload if large."""
+        reader = DigestReader(stream, [])
+        self.client.upload_fileobj(
+            reader, self.bucket, self._key(file_path), Config=self.transfer_config
+        )
+        return reader.bytes_read
+
+    @traced("storage.move")
+    def move(self, other_storage, path):
+        """Move a directory or file from another storage.
+
+        Uses server-side copies from another S3 storage, and the generic
+        upload of each file otherwise.
+        """
+        if not isinstance(other_storage, S3Storage):
+            return super().move(other_storage, path)
+        for file_path in other_storage.iter_files(path):
+            self.client.copy(
+                {"Bucket": other_storage.bucket, "Key": other_storage._key(file_path)},
+                self.bucket,
+                self._key(file_path),
+                Config=self.transfer_config,
+            )
+        other_storage.delete(path)
+
+    def rename(self, src_path, dst_path):
+        """Rename a file with a server-side copy."""
+        self.client.copy(
+            {"Bucket": self.bucket, "Key": self._key(src_path)},
+            self.bucket,
+            self._key(dst_path),
+            Config=self.transfer_config,
+        )
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(src_path))
+
+    def delete(self, path):
+        """Delete a file or all files below a path."""
+        keys = [{"Key": self._key(path)}]
+        keys.extend({"Key": o["Key"]} for o in self._iter_keys(self._dir_prefix(path)))
+        # At most 1000 keys per request.
+        for start in range(0, len(keys), 1000):
+            end = start + 1000
+            batch = keys[start:end]
+            self.client.delete_objects(
+                Bucket=self.bucket, Delete={"Objects": batch, "Quiet": True}
+            )
+
+    def iter_files(self, path):
+        """Iterate over the paths of all files below a path."""
+        found = False
+        for obj in self._iter_keys(self._dir_prefix(path)):
+            found = True
+            yield self._path(obj["Key"])
+        if not found and self._is_file(path):
+            yield path
+
+    def exists(self, path):
+        """Check if a file or directory exists."""
+        for _ in self._iter_keys(self._dir_prefix(path)):
+            return True
+        return self._is_file(path)
+
+    def size(self, path):
+        """Total size in bytes of a file or all files below a path."""
+        sizes = [o["Size"] for o in self._iter_keys(self._dir_prefix(path))]
+        if sizes:
+            return sum(sizes)
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._key(path))
+        except ClientError:
+            raise ocflcore.errors.OCFLFileNotFoundError()
+        return response["ContentLength"]
+
+    def stat(self, path):
+        """Size and modification time (in nanoseconds) of a file."""
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._key(path))
+        except ClientError:
+            raise ocflcore.errors.OCFLFileNotFoundError()
+        modified = response["LastModified"].timestamp()
+        return response["ContentLength"], int(modified * 1_000_000_000)
+
+    def _list_dir(self, path):
+        """List the names of the files and subdirectories of a directory."""
+        names = []
+        directories = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(
+            Bucket=self.bucket, Prefix=self._dir_prefix(path), Delimiter="/"
+        )
+        for page in pages:
+            names.extend(basename(o["Key"]) for o in page.get("Contents", []))
+            for prefix in page.get("CommonPrefixes", []):
+                directories.append(basename(prefix["Prefix"].rstrip("/")))
+        return names, directories
+
+    def walk_objects(self, path="", after=None):
+        """Iterate over the paths of all object roots below a path.
+
+        Like ``FileSystemStorage.walk_objects()``, directories are listed
+        one level at a time (with a delimiter) and object roots, identified
+        by their conformance declaration, are not descended into, so the
+        content of objects is never listed.
+
+        :param after: Only object roots with a path sorting after this path
+            (optional). Used to resume a walk.
+        """
+        names, directories = self._list_dir(path)
+        if any(name.startswith("0=ocfl_object_") for name in names):
+            if after is None:
+                yield path
+            return
+        after_name, after_rest = None, None
+        if after is not None:
+            after_name, _, after_rest = after.partition("/")
+        for name in sorted(directories):
+            if not path and name == "extensions":
+                continue
+            rest = None
+            if after_name is not None:
+                if name < after_name:
+                    continue
+                if name == after_name:
+                    if not after_rest:
+                        # The cursor is this object root itself.
+                        continue
+                    rest = after_rest
+            yield from self.walk_objects(f"{path}/{name}" if path else name, after=rest)
+
+    def list_objects(self, after=None):
+        """Iterate over the paths of the objects in the storage root."""
+        return self.walk_objects(after=after)
+
+    def _get(self, path, **kwargs):
+        """Get the body of an object."""
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket, Key=self._key(path), **kwargs
+            )
+        except self.client.exceptions.NoSuchKey:
+            raise ocflcore.errors.OCFLFileNotFoundError()
+        return response["Body"]
+
+    def open(self, path):
+        """Open a file for streaming reads (not seekable)."""
+        return LazyFile(lambda: self._get(path))
+
+    def read_range(self, path, offset, length=None):
+        """Open a byte range of a file using a ranged GET request."""
+        end = "" if length is None else offset + length - 1
+        if length == 0:
+            return BytesIO(b"")
+        return LazyFile(lambda: self._get(path, Range=f"bytes={offset}-{end}"))
+
+    @traced("storage.read_file", nbytes=lambda data: data.getbuffer().nbytes)
+    def read_file(self, path):
+        """Read file and return BytesIO object."""
+        file_bytes = BytesIO(self._get(path).read())
+        return file_bytes
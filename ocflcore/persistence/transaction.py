@@ -20,7 +20,13 @@ ACID properties like in a database.
 See https://ocfl.io/1.0/implementation-notes/#segregating-objects-in-flight
 """
 
-from .commands import WriteCommand
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from os.path import join
+
+from ..errors import ObjectExistsError
+from ..instrumentation import span, traced
+from ..stream import DigestReader
+from .commands import MoveCommand, RenameCommand, WriteCommand
 from .workspace import Workspace
 
 
@@ -30,13 +36,23 @@ class Transaction:
     A transaction is a context mananger.
     """
 
-    def __init__(self, repository, obj):
-        """Initialize the transaction."""
+    def __init__(self, repository, obj=None, object_path=None):
+        """Initialize the transaction.
+
+        :param obj: The OCFL object to write.
+        :param object_path: Path of the object in the storage root (optional).
+            Defaults to the path computed by the storage layout for ``obj``.
+        """
         self._log = []
         self.repository = repository
         self.obj = obj
-        self.object_path = self.repository.root.layout.path_for(self.obj)
+        if object_path is None:
+            object_path = self.repository.root.layout.path_for(self.obj)
+        self.object_path = object_path
         self.workspace = None
+        self.bytes_written = 0
+        self._staged_sizes = {}
+        self.rollback_errors = []
 
     #
     # Content manager
@@ -73,15 +89,163 @@ class Transaction:
         workspace.setup()
         return workspace
 
+    @traced("transaction.write", nbytes=lambda size: size)
     def write(self, content_path, stream):
-        """Write a content path in the workspace."""
-        self._register(WriteCommand(content_path))
-        self.workspace.write(content_path, stream)
-
-    def commit(self):
-        """Commit the transaction (i.e. move assembled object into root."""
-        self.repository.storage.move(self.workspace.storage, self.object_path)
-
+        """Write a content path in the workspace.
+
+        :param stream: A stream, or a callable opening a stream. The stream
+            of a callable is only opened while it is written.
+        :returns: The number of bytes written.
+        """
+        self._register(self._write_command(content_path))
+        size = self._write(content_path, stream)
+        self.bytes_written += size
+        return size
+
+    def _write(self, content_path, stream):
+        """Write a stream, or open, write and close a stream of a callable."""
+        if callable(stream):
+            with stream() as fp:
+                return self.workspace.write(content_path, fp)
+        return self.workspace.write(content_path, stream)
+
+    @traced("transaction.write_many", nbytes=lambda size: size)
+    def write_many(self, items):
+        """Write several content paths in the workspace.
+
+        Writes are executed concurrently when the repository is configured
+        with ``max_workers`` larger than one, in the ``write_executor`` of
+        the repository if it has one. Commands are registered on the
+        transaction log in the order of ``items`` before any write starts.
+        The first failure is raised once all running writes have finished,
+        and writes not yet started are cancelled.
+
+        Streams given as callables are opened by the thread writing them and
+        closed afterwards, so at most ``max_workers`` of them are open at the
+        same time.
+
+        :param items: Iterable of ``(content_path, stream)`` tuples.
+        :returns: The number of bytes written.
+        """
+        items = list(items)
+        for content_path, stream in items:
+            self._register(self._write_command(content_path))
+        size = sum(self._run(self._write, items))
+        self.bytes_written += size
+        return size
+
+    def _write_command(self, content_path):
+        """Command for writing a content path in the workspace."""
+        path = join(self.object_path, content_path)
+        return WriteCommand(self.workspace.storage, path)
+
+    def _run(self, func, items):
+        """Call ``func`` for each tuple of arguments, possibly in parallel."""
+        max_workers = self.repository.max_workers
+        if not max_workers or max_workers < 2 or len(items) < 2:
+            return [func(*args) for args in items]
+
+        executor = self.repository.write_executor
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = [executor.submit(func, *args) for args in items]
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in not_done:
+                future.cancel()
+            # Wait for the running writes.
+            wait(futures)
+        finally:
+            if executor is not self.repository.write_executor:
+                executor.shutdown(wait=True)
+        for future in futures:
+            if not future.cancelled() and future.exception() is not None:
+                raise future.exception()
+        return [future.result() for future in futures]
+
+    def stage(self, stream, algorithms):
+        """Stage a stream in the workspace while computing its digests.
+
+        The stream is read exactly once and does not need to be seekable.
+
+        :param stream: A stream, or a callable opening a stream. The stream
+            of a callable is only opened while it is staged.
+        :param algorithms: Digest algorithms to compute.
+        :returns: A tuple of the staging path and a dictionary of digests.
+        """
+        if callable(stream):
+            with stream() as fp:
+                return self.stage(fp, algorithms)
+        reader = DigestReader(stream, algorithms)
+        with span("transaction.stage") as s:
+            staging_path = self.workspace.stage(reader)
+            s.set("bytes", reader.bytes_read)
+        self._register(WriteCommand(self.workspace.storage, staging_path))
+        self._staged_sizes[staging_path] = reader.bytes_read
+        return staging_path, reader.digests
+
+    def place(self, staging_path, content_path):
+        """Move a staged file to its content path."""
+        self.workspace.place(staging_path, content_path)
+        self._register(
+            RenameCommand(
+                self.workspace.storage,
+                staging_path,
+                join(self.object_path, content_path),
+            )
+        )
+        self.bytes_written += self._staged_sizes.pop(staging_path)
+
+    def discard(self, staging_path):
+        """Discard a staged file (e.g. because its content is a duplicate)."""
+        self.workspace.discard(staging_path)
+        self._staged_sizes.pop(staging_path, None)
+
+    @traced("transaction.commit")
+    def commit(self, paths=None):
+        """Commit the transaction (i.e. move assembled object into root).
+
+        The assembled files are first flushed to disk in one batch, then
+        moved into the root one path at a time (see ``Storage.move()``), so
+        a crash leaves either the old or the new version of each path. Files
+        replaced in the root (e.g. the inventory) are copied to the workspace
+        first, so the transaction can still be rolled back.
+
+        :param paths: Paths relative to the object to move into an existing
+            object in the root, in the given order (optional). Defaults to
+            moving the entire object, which must not exist in the root yet.
+        """
+        storage = self.repository.storage
+        workspace_storage = self.workspace.storage
+        workspace_storage.sync(self.object_path)
+        replace = paths is not None
+        if paths is None:
+            paths = [self.object_path]
+        else:
+            paths = [join(self.object_path, p) for p in paths]
+        if not replace and storage.exists(self.object_path):
+            raise ObjectExistsError(f"Object {self.object_path} already exists.")
+        for path in paths:
+            backup_path = None
+            if replace and storage.exists(path):
+                backup_path = self.workspace.backup(storage, path)
+            storage.move(workspace_storage, path)
+            self._register(
+                MoveCommand(storage, workspace_storage, path, backup_path=backup_path)
+            )
+
+    @traced("transaction.rollback")
     def rollback(self):
-        """Rollback the transaction."""
-        pass
+        """Rollback the transaction by undoing the commands in reverse order.
+
+        Rolling back is best effort: a failing undo does not stop the undo of
+        the remaining commands. Its error is collected in
+        ``rollback_errors``, since rollback happens while another exception
+        is being raised.
+        """
+        while self._log:
+            cmd = self._log.pop()
+            try:
+                cmd.undo()
+            except Exception as e:
+                self.rollback_errors.append(e)
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 CERN.
+# Copyright (C) 2021 Data Futures.
+#
+# OCFL Core is free software; you can redistribute it and/or modify it under the
+# terms of the MIT License; see LICENSE file for more details.
+
+"""Validation of the objects stored in an OCFL storage root.
+
+The validator checks the structure of an object, its inventories and their
+sidecars, and re-hashes every content file against the manifest and fixity
+digests. Errors are reported with the codes of the OCFL validation codes,
+see https://ocfl.io/1.1/spec/validation-codes.html
+
+Content files are hashed in a thread pool with large sequential reads (the
+hash functions release the GIL), and several objects are validated
+concurrently. Results are produced one object at a time, so a storage root
+of any size can be audited.
+"""
+
+import json
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from os.path import join
+
+from ..errors import OCFLFileNotFoundError
+from ..stream import new_hash
+
+ValidationIssue = namedtuple("ValidationIssue", ["code", "message"])
+"""An error found while validating an object (e.g. ``E092``)."""
+
+
+class ValidationMetrics:
+    """Throughput of a validation (thread-safe)."""
+
+    def __init__(self):
+        """Constructor."""
+        self.files = 0
+        self.bytes = 0
+        self.skipped = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, files, nbytes):
+        """Count hashed files and bytes."""
+        with self._lock:
+            self.files += files
+            self.bytes += nbytes
+
+    def skip(self):
+        """Count a content file which was not hashed."""
+        with self._lock:
+            self.skipped += 1
+
+    @property
+    def elapsed(self):
+        """Seconds since the validation started."""
+        return time.monotonic() - self.started
+
+    @property
+    def bytes_per_second(self):
+        """Hashed bytes per second."""
+        return self.bytes / max(self.elapsed, 1e-9)
+
+    @property
+    def files_per_second(self):
+        """Hashed files per second."""
+        return self.files / max(self.elapsed, 1e-9)
+
+
+class ValidationReport:
+    """Result of validating an object."""
+
+    def __init__(self, object_path):
+        """Constructor."""
+        self.object_path = object_path
+        self.object_id = None
+        self.errors = []
+        self.metrics = ValidationMetrics()
+
+    @property
+    def valid(self):
+        """Whether the object is valid."""
+        return not self.errors
+
+    def error(self, code, message):
+        """Record an error."""
+        self.errors.append(ValidationIssue(code, message))
+
+
+class Validator:
+    """Validator of the objects in a storage."""
+
+    required_keys = ("id", "type", "digestAlgorithm", "head", "manifest", "versions")
+    fixity_algorithms = ("md5", "sha1", "sha256", "sha512", "blake2b-512")
+
+    def __init__(self, storage, max_workers=None, chunk_size=8 * 1024 * 1024):
+        """Constructor.
+
+        :param max_workers: Number of threads hashing content files, and of
+            objects validated concurrently by ``validate_all()`` (defaults
+            to 4).
+        :param chunk_size: Size of the reads when hashing content files.
+        """
+        self.storage = storage
+        self.max_workers = max_workers or 4
+        self.chunk_size = chunk_size
+        self.metrics = ValidationMetrics()
+
+    def validate(self, object_path):
+        """Validate an object.
+
+        :returns: A ``ValidationReport``.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return self._validate(executor, object_path)
+
+    def validate_all(self, object_paths):
+        """Validate many objects, several at a time.
+
+        :param object_paths: Iterable of object paths, consumed lazily.
+        :returns: Iterator of ``ValidationReport`` in order of completion.
+        """
+        self.metrics = ValidationMetrics()
+        hashing = ThreadPoolExecutor(max_workers=self.max_workers)
+        objects = ThreadPoolExecutor(max_workers=self.max_workers)
+        validate = partial(self._validate_or_report, hashing)
+        pending = set()
+        try:
+            for object_path in object_paths:
+                if len(pending) >= 2 * self.max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(objects.submit(validate, object_path))
+            for future in wait(pending).done:
+                yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            objects.shutdown(wait=True)
+            hashing.shutdown(wait=True)
+
+    def _validate_or_report(self, executor, object_path):
+        """Validate an object, reporting unexpected errors as an error.
+
+        An object which cannot be validated (e.g. unreadable storage) does
+        not stop the validation of the other objects.
+        """
+        try:
+            return self._validate(executor, object_path)
+        except Exception as e:
+            report = ValidationReport(object_path)
+            # Not an OCFL validation code.
+            report.error("E000", f"Object could not be validated ({e!r}).")
+            return report
+
+    def _validate(self, executor, object_path):
+        """Validate an object, hashing content files with an executor."""
+        report = ValidationReport(object_path)
+        start = len(object_path)
+        files = {
+            path[start:].lstrip("/") for path in self.storage.iter_files(object_path)
+        }
+        self._validate_declaration(report, object_path, files)
+        inventory = self._validate_inventory(report, object_path, "", files)
+        if inventory is None:
+            return report
+        report.object_id = inventory["id"]
+        for version in inventory["versions"]:
+            if f"{version}/inventory.json" in files:
+                self._validate_inventory(report, object_path, version, files)
+        self._validate_content(executor, report, object_path, inventory, files)
+        return report
+
+    def _validate_declaration(self, report, object_path, files):
+        """Validate the object conformance declaration."""
+        declarations = [f for f in files if f.startswith("0=ocfl_object_")]
+        if len(declarations) != 1:
+            report.error("E003", "Object must have exactly one declaration file.")
+            return
+        expected = declarations[0][2:] + "\n"
+        data = self.storage.read_file(join(object_path, declarations[0])).getvalue()
+        if data != expected.encode("utf8"):
+            report.error("E007", f"Declaration file must contain {expected!r}.")
+
+    def _validate_inventory(self, report, object_path, version, files):
+        """Validate an inventory and its sidecar.
+
+        :returns: The parsed inventory, or ``None`` if it cannot be used.
+        """
+        path = join(version, "inventory.json")
+        if path not in files:
+            report.error("E034", f"Inventory {path} is missing.")
+            return None
+        data = self.storage.read_file(join(object_path, path)).getvalue()
+        try:
+            inventory = json.loads(data)
+        except ValueError as e:
+            report.error("E033", f"Inventory {path} is not valid JSON ({e}).")
+            return None
+        if not isinstance(inventory, dict):
+            report.error("E033", f"Inventory {path} is not a JSON object.")
+            return None
+        missing = [k for k in self.required_keys if k not in inventory]
+        if missing:
+            report.error("E036", f"Inventory {path} misses {', '.join(missing)}.")
+            return None
+        invalid = self._invalid_structure(inventory)
+        if invalid is not None:
+            report.error(invalid[0], f"Inventory {path} {invalid[1]}.")
+            return None
+
+        algo = inventory["digestAlgorithm"]
+        if algo not in ("sha256", "sha512"):
+            report.error("E025", f"Inventory {path} uses digest algorithm {algo}.")
+            return None
+        # The algorithm is lowercase in the spec, but accept uppercase too.
+        sidecar_path = f"{path}.{algo}"
+        if sidecar_path not in files:
+            sidecar_path = f"{path}.{algo.upper()}"
+        if sidecar_path not in files:
+            report.error("E058", f"Sidecar {path}.{algo} is missing.")
+            return inventory
+        sidecar = self.storage.read_file(join(object_path, sidecar_path)).getvalue()
+        h = new_hash(algo)
+        h.update(data)
+        if sidecar.decode("utf8", "replace").split()[:1] != [h.hexdigest()]:
+            report.error("E060", f"Inventory {path} does not match its sidecar.")
+        return inventory
+
+    @staticmethod
+    def _is_digest_map(value):
+        """Whether a value maps digests to lists of paths."""
+        return isinstance(value, dict) and all(
+            isinstance(paths, list) and all(isinstance(p, str) for p in paths)
+            for paths in value.values()
+        )
+
+    def _invalid_structure(self, inventory):
+        """Check the types of the blocks of an inventory.
+
+        :returns: A tuple of an error code and message, or ``None``.
+        """
+        if not self._is_digest_map(inventory["manifest"]):
+            return "E041", "has an invalid manifest"
+        if not isinstance(inventory["versions"], dict):
+            return "E044", "has an invalid versions block"
+        for version, block in inventory["versions"].items():
+            if not isinstance(block, dict) or "state" not in block:
+                return "E048", f"has an invalid version {version}"
+            if not self._is_digest_map(block["state"]):
+                return "E050", f"has an invalid state in version {version}"
+        fixity = inventory.get("fixity")
+        if fixity is not None and not (
+            isinstance(fixity, dict)
+            and all(self._is_digest_map(d) for d in fixity.values())
+        ):
+            return "E057", "has an invalid fixity block"
+        return None
+
+    def _validate_content(self, executor, report, object_path, inventory, files):
+        """Validate content files against the manifest and fixity digests.
+
+        At most a few files per thread are queued for hashing at a time.
+        """
+        algo = inventory["digestAlgorithm"]
+        expected = {}
+        for digest, content_paths in inventory["manifest"].items():
+            for content_path in content_paths:
+                expected[content_path] = {algo: digest}
+        for fixity_algo, digests in (inventory.get("fixity") or {}).items():
+            if fixity_algo not in self.fixity_algorithms:
+                continue
+            for digest, content_paths in digests.items():
+                for content_path in content_paths:
+                    if content_path in expected:
+                        expected[content_path][fixity_algo] = digest
+
+        content_dir = inventory.get("contentDirectory", "content")
+        for path in sorted(files):
+            parts = path.split("/")
+            if (
+                len(parts) > 2
+                and parts[0] in inventory["versions"]
+                and parts[1] == content_dir
+                and path not in expected
+            ):
+                report.error("E023", f"Content file {path} is not in the manifest.")
+
+        queue = deque()
+        for content_path, digests in expected.items():
+            if content_path not in files:
+                report.error("E092", f"Content file {content_path} is missing.")
+                continue
+            path = join(object_path, content_path)
+            if not self._due(path):
+                report.metrics.skip()
+                self.metrics.skip()
+                continue
+            future = executor.submit(self._hash, path, list(digests))
+            queue.append((path, content_path, digests, future))
+            if len(queue) >= 4 * self.max_workers:
+                self._check_digests(report, algo, *queue.popleft())
+        while queue:
+            self._check_digests(report, algo, *queue.popleft())
+
+    def _due(self, path):
+        """Whether a content file must be hashed."""
+        return True
+
+    def _verified(self, path):
+        """Called when a content file matched all its digests."""
+        pass
+
+    def _check_digests(self, report, algo, path, content_path, digests, future):
+        """Compare the digests of a hashed content file."""
+        try:
+            actual, size = future.result()
+        except OCFLFileNotFoundError:
+            report.error("E092", f"Content file {content_path} is missing.")
+            return
+        report.metrics.add(1, size)
+        self.metrics.add(1, size)
+        matched = True
+        for digest_algo, digest in digests.items():
+            if actual[digest_algo] == digest.lower():
+                continue
+            matched = False
+            if digest_algo == algo:
+                report.error("E092", f"Content file {content_path} does not match.")
+            else:
+                report.error(
+                    "E093",
+                    f"Content file {content_path} does not match its "
+                    f"{digest_algo} fixity digest.",
+                )
+        if matched:
+            self._verified(path)
+
+    def _hash(self, path, algorithms, on_read=None):
+        """Hash a file with sequential reads in a single pass.
+
+        :param on_read: Callable called with the size of each chunk read
+            (optional), e.g. to limit the throughput.
+        :returns: A tuple of a dictionary of digests and the size of the file.
+        """
+        hashes = {a: new_hash(a) for a in algorithms}
+        size = 0
+        with self.storage.open(path) as fp:
+            while chunk := fp.read(self.chunk_size):
+                if on_read is not None:
+                    on_read(len(chunk))
+                size += len(chunk)
+                for h in hashes.values():
+                    h.update(chunk)
+        return {a: h.hexdigest() for a, h in hashes.items()}, size
@@ -9,6 +9,7 @@
 """Workspace for a transaction."""
 
 from os.path import join
+from uuid import uuid4
 
 
 class Workspace:
@@ -17,10 +18,13 @@ class Workspace:
     Used to assemble an OCFL object or an OCFL version.
     """
 
+    staging_directory = ".staging"
+
     def __init__(self, storage, object_path):
         """Constructor for the workspace."""
         self.storage = storage
         self.object_path = object_path
+        self._staged = set()
 
     def write(self, content_path, stream):
         """Write a file in the workspace."""
@@ -29,12 +33,45 @@ class Workspace:
             stream,
         )
 
+    def stage(self, stream):
+        """Write a stream to a staging file outside the object.
+
+        :returns: The staging path of the file.
+        """
+        staging_path = join(self.staging_directory, uuid4().hex)
+        self._staged.add(staging_path)
+        self.storage.write(staging_path, stream)
+        return staging_path
+
+    def backup(self, storage, path):
+        """Copy a file of another storage to a staging file.
+
+        :returns: The staging path of the copy.
+        """
+        with storage.open(path) as stream:
+            return self.stage(stream)
+
+    def place(self, staging_path, content_path):
+        """Move a staged file to a content path in the object."""
+        self.storage.rename(staging_path, join(self.object_path, content_path))
+        self._staged.discard(staging_path)
+
+    def discard(self, staging_path):
+        """Remove a staged file."""
+        self.storage.delete(staging_path)
+        self._staged.discard(staging_path)
+
     def setup(self):
         """Setup the workspace."""
         # TODO
         pass
 
     def teardown(self):
-        """Teardown the workspace."""
-        # TODO
-        pass
+        """Teardown the workspace.
+
+        Removes leftover staged files and whatever remains of the object in
+        the workspace (e.g. empty directories after moving a new version).
+        """
+        for staging_path in list(self._staged):
+            self.discard(staging_path)
+        self.storage.delete(self.object_path)
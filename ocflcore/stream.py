@@ -10,33 +10,275 @@
 
 import hashlib
 
+from .domain.validation import validate_digest_algo, validate_fixity_algo
+from .instrumentation import traced
+
+# OCFL digest algorithm names which differ from the hashlib names.
+HASHLIB_NAMES = {
+    "blake2b-512": "blake2b",
+}
+
+
+def new_hash(algo):
+    """Create a hashlib object for an OCFL digest algorithm name."""
+    return hashlib.new(HASHLIB_NAMES.get(algo, algo))
+
+
+class LazyFile:
+    """File handle which opens the underlying file on first use.
+
+    Handing out streams for many files (e.g. all files of an object) does
+    not consume a file descriptor until a stream is actually read.
+    """
+
+    def __init__(self, opener):
+        """Constructor.
+
+        :param opener: Callable returning an open binary file.
+        """
+        self._opener = opener
+        self._fp = None
+        self.closed = False
+
+    @property
+    def fp(self):
+        """The underlying file, opened on first access."""
+        if self._fp is None:
+            if self.closed:
+                raise ValueError("I/O operation on closed file.")
+            self._fp = self._opener()
+        return self._fp
+
+    def read(self, size=-1):
+        """Read from the file."""
+        return self.fp.read(size)
+
+    def readinto(self, buffer):
+        """Read into a buffer."""
+        return self.fp.readinto(buffer)
+
+    def seek(self, offset, whence=0):
+        """Change the stream position."""
+        return self.fp.seek(offset, whence)
+
+    def tell(self):
+        """Get the stream position."""
+        return self.fp.tell()
+
+    def fileno(self):
+        """Get the file descriptor (opens the file)."""
+        return self.fp.fileno()
+
+    @property
+    def name(self):
+        """Name of the underlying file."""
+        return self.fp.name
+
+    def close(self):
+        """Close the file if it was opened."""
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+        self.closed = True
+
+    def __enter__(self):
+        """Enter the context manager."""
+        return self
+
+    def __exit__(self, *args):
+        """Close the file."""
+        self.close()
+
+
+class RangeReader:
+    """Read-only stream over a byte range of another seekable stream."""
+
+    def __init__(self, stream, offset, length=None):
+        """Constructor.
+
+        :param stream: A seekable stream.
+        :param offset: Start of the range.
+        :param length: Length of the range (defaults to the end of stream).
+        """
+        self.stream = stream
+        self.offset = offset
+        if length is None:
+            length = max(stream.seek(0, 2) - offset, 0)
+        self.length = length
+        self._pos = 0
+
+    def read(self, size=-1):
+        """Read from the range."""
+        remaining = self.length - self._pos
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        if size == 0:
+            return b""
+        self.stream.seek(self.offset + self._pos)
+        chunk = self.stream.read(size)
+        self._pos += len(chunk)
+        return chunk
+
+    def seek(self, offset, whence=0):
+        """Change the position within the range."""
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self.length
+        self._pos = min(max(offset, 0), self.length)
+        return self._pos
+
+    def tell(self):
+        """Get the position within the range."""
+        return self._pos
+
+    def close(self):
+        """Close the underlying stream."""
+        self.stream.close()
+
+    def __enter__(self):
+        """Enter the context manager."""
+        return self
+
+    def __exit__(self, *args):
+        """Close the stream."""
+        self.close()
+
+
+class IterStream:
+    """Read-only stream over an iterable of bytes chunks.
+
+    Allows passing generated content (e.g. a serializer) to APIs expecting a
+    stream, without assembling the full content in memory.
+    """
+
+    def __init__(self, iterable):
+        """Constructor."""
+        self._iterator = iter(iterable)
+        self._buffer = bytearray()
+
+    def read(self, size=-1):
+        """Read up to ``size`` bytes (all remaining bytes if negative)."""
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._iterator, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        result = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return result
+
+
+class DigestReader:
+    """Read-only stream wrapper which computes digests of the bytes read.
+
+    Every chunk read from the underlying stream is fed to one hash object per
+    algorithm, so the stream can be hashed while it is being copied (e.g.
+    written to storage) without reading it a second time.
+    """
+
+    def __init__(self, stream, algorithms):
+        """Constructor.
+
+        :param stream: The stream to read from.
+        :param algorithms: Iterable of OCFL digest algorithm names.
+        """
+        self.stream = stream
+        self.bytes_read = 0
+        self.started = False
+        self.eof = False
+        self._hashes = {}
+        for algo in algorithms:
+            if algo not in self._hashes:
+                self._hashes[algo] = new_hash(algo)
+
+    def read(self, size=-1):
+        """Read from the underlying stream and update the digests."""
+        self.started = True
+        chunk = self.stream.read(size)
+        if chunk:
+            for h in self._hashes.values():
+                h.update(chunk)
+            self.bytes_read += len(chunk)
+        elif size != 0:
+            self.eof = True
+        return chunk
+
+    def consume(self, chunksize=1024 * 1024):
+        """Read the remaining stream, only for computing the digests."""
+        while self.read(chunksize):
+            pass
+
+    @property
+    def digests(self):
+        """Dictionary of algorithm name to hex digest of the bytes read."""
+        return {algo: h.hexdigest() for algo, h in self._hashes.items()}
+
 
 class StreamDigest:
     """Utility class for read a stream and computing a digest.
 
-    The stream must support random seek.
+    All digests (the content digest and any fixity digests) are computed in a
+    single pass over the stream. Accessing ``digest`` or ``fixity`` before the
+    stream has been read will read the stream and seek it back to the
+    beginning, in which case the stream must support random seek. If the
+    stream was already (partially) read, the rest of it is read and it is
+    left at its end.
+
+    Alternatively, the object can be used as a tee: pass it as the stream to
+    e.g. ``Storage.write()`` and the digests are computed while the bytes are
+    being written, in which case the stream does not need to be seekable.
     """
 
-    def __init__(self, stream, algo="sha512"):
-        """Constructor."""
+    def __init__(self, stream, algo="sha512", fixity=None):
+        """Constructor.
+
+        :param stream: The stream to compute digests for.
+        :param algo: The content digest algorithm.
+        :param fixity: Iterable of additional fixity algorithms (optional).
+        """
         self.stream = stream
-        self._digest = None
-        assert algo in ["sha512", "sha256"]
+        validate_digest_algo(algo)
         self._algo = algo
+        self._fixity_algos = list(fixity or [])
+        for fixity_algo in self._fixity_algos:
+            validate_fixity_algo(fixity_algo)
+        self._reader = DigestReader(stream, [algo] + self._fixity_algos)
+        self._digests = None
+
+    def read(self, size=-1):
+        """Read from the stream while computing the digests."""
+        return self._reader.read(size)
+
+    def _compute(self):
+        """Compute all digests in one pass."""
+        if self._digests is None:
+            self._consume()
+            self._digests = self._reader.digests
+        return self._digests
+
+    @traced("stream.digest", nbytes=lambda size: size)
+    def _consume(self):
+        """Read the rest of the stream, rewinding it if it was not read yet."""
+        rewind = not self._reader.started
+        self._reader.consume()
+        if rewind:
+            self.stream.seek(0)
+        return self._reader.bytes_read
 
     @property
     def digest(self):
-        """Compute the digest and set seek stream back to beginning."""
-        if self._digest is None:
-            chunksize = 1024 * 1024
-            h = hashlib.new(self._algo)
-
-            while 1:
-                chunk = self.stream.read(chunksize)
-                if not chunk:
-                    break
-                h.update(chunk)
-            self.stream.seek(0)
-            self._digest = h.hexdigest()
+        """The content digest, see the class for the stream position."""
+        return self._compute()[self._algo]
+
+    @property
+    def fixity(self):
+        """Fixity digests as a dictionary of algorithm to digest.
 
-        return self._digest
+        The dictionary can be passed directly as the ``fixity`` argument of
+        ``FilesManager.add()``.
+        """
+        digests = self._compute()
+        return {algo: digests[algo] for algo in self._fixity_algos}
@@ -19,6 +19,8 @@ tests_require = [
     "black>=21.12b0",
     "check-manifest>=0.42",
     "coverage>=5.3,<6",
+    "moto[s3]>=5.0",
+    "opentelemetry-sdk>=1.0",
     "pydocstyle<=6.1.1",
     "pytest-cov>=2.10.1",
     "pytest-isort>=1.2.0",
@@ -31,6 +33,12 @@ extras_require = {
     "docs": [
         "Sphinx>=5.0.0",
     ],
+    "opentelemetry": [
+        "opentelemetry-api>=1.0",
+    ],
+    "s3": [
+        "boto3>=1.17",
+    ],
     "tests": tests_require,
 }
 
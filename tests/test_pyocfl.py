@@ -8,11 +8,29 @@
 
 """Test of an OCFL Object."""
 
+import asyncio
+import errno
+import gc
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from os.path import exists, join
 
+import pytest
+
 from ocflcore import (
+    AsyncFileSystemStorage,
+    AsyncOCFLRepository,
     FileSystemStorage,
+    HashAndIdNTupleLayout,
+    HashedNTupleLayout,
+    ObjectIndex,
     OCFLObject,
     OCFLRepository,
     OCFLVersion,
@@ -20,6 +38,34 @@ from ocflcore import (
     StreamDigest,
     TopLevelLayout,
 )
+from ocflcore.domain import ocflobj
+from ocflcore.domain.validation import validate_path, validate_paths
+from ocflcore.errors import (
+    AlgorithmError,
+    ConstraintException,
+    InvalidInventoryError,
+    LogicalPathError,
+    ObjectExistsError,
+    ObjectIdError,
+    ObjectNotFoundError,
+    OCFLFileNotFoundError,
+)
+from ocflcore.instrumentation import (
+    CallbackTracer,
+    OpenTelemetryTracer,
+    StatsTracer,
+    set_tracer,
+)
+from ocflcore.persistence.audit import AuditCache, Auditor, RateLimiter
+from ocflcore.persistence.cache import InventoryCache, parsed_size
+from ocflcore.persistence.inventory import (
+    Inventory,
+    InventoryContent,
+    UpdatedInventory,
+    object_from_inventory,
+)
+from ocflcore.persistence.storage import S3Storage
+from ocflcore.persistence.validator import Validator
 
 
 #
@@ -40,6 +86,177 @@ def test_ocflobject(now):
     assert o.head == o.versions[0]
 
 
+@pytest.mark.parametrize(
+    "path",
+    ["", "/a", "a/", "a//b", ".", "..", "a/./b", "a/..", "../a"],
+)
+def test_validate_path_invalid(path):
+    with pytest.raises(LogicalPathError):
+        validate_path(path)
+
+
+@pytest.mark.parametrize(
+    "paths",
+    [["a", "a"], ["a/b", "a"], ["a", "a/b/c"], ["x", "a/b/c", "a/b"], ["a//b"]],
+)
+def test_validate_paths_conflicts(paths):
+    with pytest.raises(LogicalPathError):
+        validate_paths(paths)
+
+
+def test_validation(now):
+    for path in ["a", ".a", "a/...", "a/b.c/d", "a..b"]:
+        validate_path(path)
+    validate_paths(["a/b", "a/c/d", "ab", "b/a"])
+
+    o = OCFLObject("info:ark/12345")
+    assert o.id == "info:ark/12345"
+    for object_id in ["", None, "a\nb"]:
+        with pytest.raises(ObjectIdError):
+            OCFLObject(object_id)
+    with pytest.raises(AlgorithmError):
+        OCFLObject("12345-abcde", digest_algorithm="md5")
+    with pytest.raises(ConstraintException):
+        OCFLObject("12345-abcde", spec="0.9")
+    with pytest.raises(AlgorithmError):
+        StreamDigest(BytesIO(b""), fixity=["crc32"])
+
+
+def test_files_add_many(now, monkeypatch):
+    v = OCFLVersion(now)
+    v.files.add("a/b.txt", BytesIO(b"b"), "digest-b")
+    # Paths are only validated once, with the whole listing.
+    validated = []
+    monkeypatch.setattr(ocflobj, "validate_path", validated.append)
+    v.files.add_many(
+        [
+            ("a/c.txt", BytesIO(b"c"), "digest-c"),
+            ("d.txt", BytesIO(b"d"), "digest-d", {"md5": "abc"}),
+        ]
+    )
+    assert validated == []
+    monkeypatch.undo()
+    assert len(v.files) == 3
+    assert v.files["d.txt"].fixity == {"md5": "abc"}
+    # Invalid listings are rejected as a whole.
+    for listing in [
+        [("e.txt", None, "digest-e"), ("a", None, "digest-a")],
+        [("e.txt", None, "digest-e"), ("d.txt/f", None, "digest-f")],
+        [("e.txt", None, "digest-e"), ("e.txt", None, "digest-e")],
+        [("e.txt", None, "digest-e"), ("f/../g", None, "digest-g")],
+    ]:
+        with pytest.raises(LogicalPathError):
+            v.files.add_many(listing)
+    with pytest.raises(AlgorithmError):
+        v.files.add_many([("e.txt", None, "digest-e", {"crc32": "abc"})])
+    assert "e.txt" not in v.files
+    assert len(v.files) == 3
+
+
+def test_files_path_conflicts(now):
+    v1 = OCFLVersion(now)
+    v1.files.add("a/b/c.txt", BytesIO(b"c"), "digest-c")
+    v1.files.add("d", BytesIO(b"d"), "digest-d")
+    with pytest.raises(LogicalPathError):
+        v1.files.add("a/b", BytesIO(b"b"), "digest-b")
+    with pytest.raises(LogicalPathError):
+        v1.files.add_stream("d/e", BytesIO(b"e"))
+    with pytest.raises(LogicalPathError):
+        v1.files.rename("d", "a")
+
+    v2 = OCFLVersion.from_previous(v1, now)
+    with pytest.raises(LogicalPathError):
+        v2.files.add("a", BytesIO(b"a"), "digest-a")
+    with pytest.raises(LogicalPathError):
+        v2.files.add("d/e", BytesIO(b"e"), "digest-e")
+    # Paths are free again once the conflicting files are gone.
+    v2.files.remove("a/b/c.txt")
+    v2.files.add("a/b", BytesIO(b"b"), "digest-b")
+    v2.files.rename("d", "d/e")
+    assert sorted(f.logical_path for f in v2.files) == ["a/b", "d/e"]
+    with pytest.raises(LogicalPathError):
+        v2.files.add("a/b/c.txt", BytesIO(b"c"), "digest-c")
+    v2.files.rename("a/b", "a")
+    v2.files.add("b/c", BytesIO(b"c"), "digest-c")
+
+    v3 = OCFLVersion.from_previous(v2, now)
+    with pytest.raises(LogicalPathError):
+        v3.files.add("b", BytesIO(b"b"), "digest-b")
+    v3.files.rename("b/c", "b")
+    assert sorted(f.logical_path for f in v3.files) == ["a", "b", "d/e"]
+
+
+def test_version_from_previous(now):
+    v1 = OCFLVersion(now)
+    for name in ["a", "b", "c", "d"]:
+        v1.files.add(f"{name}.txt", BytesIO(name.encode()), f"digest-{name}")
+    v1.files.add("copy.txt", BytesIO(b"a"), "digest-a")
+
+    v2 = OCFLVersion.from_previous(v1, now, message="Changes")
+    v2.files.add("e.txt", BytesIO(b"e"), "digest-e")
+    v2.files.replace("b.txt", BytesIO(b"new b"), "digest-b2")
+    v2.files.remove("c.txt")
+    v2.files.rename("a.txt", "dir/a.txt")
+    with pytest.raises(LogicalPathError):
+        v2.files.add("d.txt", BytesIO(b"d"), "digest-d")
+    with pytest.raises(LogicalPathError):
+        v2.files.rename("d.txt", "e.txt")
+    with pytest.raises(OCFLFileNotFoundError):
+        v2.files.remove("c.txt")
+    with pytest.raises(OCFLFileNotFoundError):
+        v2.files.replace("missing.txt", BytesIO(b""), "digest")
+
+    assert v2.message == "Changes"
+    assert len(v2.files) == 5
+    assert "c.txt" not in v2.files and "a.txt" not in v2.files
+    assert v2.files["d.txt"] is v1.files["d.txt"]
+    assert v2.files["dir/a.txt"].digest == "digest-a"
+    assert sorted(f.logical_path for f in v2.files.changed()) == [
+        "b.txt",
+        "dir/a.txt",
+        "e.txt",
+    ]
+    assert v2.state == {
+        "digest-a": ["copy.txt", "dir/a.txt"],
+        "digest-b2": ["b.txt"],
+        "digest-d": ["d.txt"],
+        "digest-e": ["e.txt"],
+    }
+    # The previous version is unchanged.
+    assert len(v1.files) == 5
+    assert v1.files["b.txt"].digest == "digest-b"
+    # Derived states are identical to fully built states.
+    v3 = OCFLVersion.from_previous(v2, now)
+    v3.files.remove("d.txt")
+    v3.files.add("c.txt", BytesIO(b"c"), "digest-c")
+    full = OCFLVersion(now)
+    for f in v3.files:
+        full.files.add(f.logical_path, f.stream, f.digest)
+    assert v3.state == full.state
+
+    o = OCFLObject("12345-abcde")
+    for v in [v1, v2, v3]:
+        o.versions.append(v)
+    inventory = Inventory(o).to_dict()
+    assert inventory["versions"]["v3"]["state"] == full.state
+    assert inventory["manifest"] == {
+        "digest-a": ["v1/content/a.txt"],
+        "digest-b": ["v1/content/b.txt"],
+        "digest-c": ["v1/content/c.txt"],
+        "digest-d": ["v1/content/d.txt"],
+        "digest-b2": ["v2/content/b.txt"],
+        "digest-e": ["v2/content/e.txt"],
+    }
+    assert [path for path, _ in o.content_files()] == [
+        "v1/content/a.txt",
+        "v1/content/b.txt",
+        "v1/content/c.txt",
+        "v1/content/d.txt",
+        "v2/content/e.txt",
+        "v2/content/b.txt",
+    ]
+
+
 def test_repository_init(tmpdir):
     storage = FileSystemStorage(tmpdir.mkdir("root"))
     workspace_storage = FileSystemStorage(tmpdir.mkdir("workspace"))
@@ -58,7 +275,1258 @@ def test_repository_add(tmpdir, repository, minimal_obj):
     assert exists(join(tmpdir, "root/12345-abcde/v1/content/file.txt"))
 
 
+def test_repository_add_existing(tmpdir, repository, minimal_obj, monkeypatch):
+    repository.add(minimal_obj)
+    inventory = tmpdir.join("root/12345-abcde/inventory.json").read()
+    with pytest.raises(ObjectExistsError):
+        repository.add(minimal_obj)
+    # Also when the object is created while the transaction is assembled.
+    exists = repository.storage.exists
+    calls = []
+
+    def racing_exists(path):
+        calls.append(path)
+        return len(calls) > 1 and exists(path)
+
+    monkeypatch.setattr(repository.storage, "exists", racing_exists)
+    with pytest.raises(ObjectExistsError):
+        repository.add(minimal_obj)
+    assert exists("12345-abcde")
+    assert tmpdir.join("root/12345-abcde/inventory.json").read() == inventory
+
+
 def test_repository_list_objects(repository, minimal_obj):
     repository.add(minimal_obj)
     objects = repository.list_objects()
     assert next(objects) == "12345-abcde"
+
+
+class NonSeekableStream:
+    """Stream which can only be read forward (e.g. a pipe or HTTP body)."""
+
+    def __init__(self, data):
+        self._stream = BytesIO(data)
+
+    def read(self, size=-1):
+        return self._stream.read(size)
+
+    def seek(self, *args):
+        raise OSError("Stream is not seekable.")
+
+
+def test_stream_digest_fixity():
+    sd = StreamDigest(BytesIO(b"minimal example"), fixity=["md5", "blake2b-512"])
+
+    assert sd.digest == hashlib.sha512(b"minimal example").hexdigest()
+    assert sd.fixity == {
+        "md5": hashlib.md5(b"minimal example").hexdigest(),
+        "blake2b-512": hashlib.blake2b(b"minimal example").hexdigest(),
+    }
+    # Stream is rewound after computing the digests.
+    assert sd.stream.read() == b"minimal example"
+
+
+@pytest.mark.parametrize("data", [b"minimal example", b""])
+def test_stream_digest_tee(tmpdir, data):
+    storage = FileSystemStorage(tmpdir)
+    sd = StreamDigest(NonSeekableStream(data), fixity=["md5"])
+    storage.write("file.txt", sd)
+
+    assert tmpdir.join("file.txt").read_binary() == data
+    assert sd.digest == hashlib.sha512(data).hexdigest()
+    assert sd.fixity == {"md5": hashlib.md5(data).hexdigest()}
+
+
+def test_repository_add_fixity(tmpdir, repository, now):
+    sd = StreamDigest(BytesIO(b"minimal example"), fixity=["md5"])
+    v = OCFLVersion(now)
+    v.files.add("file.txt", sd.stream, sd.digest, fixity=sd.fixity)
+    o = OCFLObject("12345-abcde")
+    o.versions.append(v)
+    repository.add(o)
+
+    inventory = json.loads(tmpdir.join("root/12345-abcde/inventory.json").read())
+    assert inventory["fixity"] == {
+        "md5": {sd.fixity["md5"]: ["v1/content/file.txt"]},
+    }
+
+
+def test_repository_add_stream(tmpdir, repository, now):
+    v = OCFLVersion(now)
+    v.files.add_stream("a.txt", NonSeekableStream(b"example"), fixity=["md5"])
+    v.files.add_stream("b.txt", NonSeekableStream(b"example"))
+    v.files.add_stream("c.txt", NonSeekableStream(b"other"))
+    o = OCFLObject("12345-abcde")
+    o.versions.append(v)
+    repository.add(o)
+
+    digest = hashlib.sha512(b"example").hexdigest()
+    inventory = json.loads(tmpdir.join("root/12345-abcde/inventory.json").read())
+    assert inventory["manifest"][digest] == ["v1/content/a.txt"]
+    assert inventory["versions"]["v1"]["state"][digest] == ["a.txt", "b.txt"]
+    assert inventory["fixity"]["md5"] == {
+        hashlib.md5(b"example").hexdigest(): ["v1/content/a.txt"]
+    }
+    assert tmpdir.join("root/12345-abcde/v1/content/a.txt").read() == "example"
+    assert not exists(join(tmpdir, "root/12345-abcde/v1/content/b.txt"))
+    assert exists(join(tmpdir, "root/12345-abcde/v1/content/c.txt"))
+    # No staged files are left behind.
+    assert tmpdir.join("workspace/.staging").listdir() == []
+
+
+class FailingStream:
+    """Stream which fails when read."""
+
+    def read(self, size=-1):
+        raise OSError("Read failed.")
+
+
+@pytest.fixture()
+def parallel_repository(tmpdir):
+    storage = FileSystemStorage(tmpdir.mkdir("root"))
+    workspace_storage = FileSystemStorage(tmpdir.mkdir("workspace"))
+    root = StorageRoot(TopLevelLayout())
+    repository = OCFLRepository(
+        root, storage, workspace_storage=workspace_storage, max_workers=4
+    )
+    repository.initialize()
+    return repository
+
+
+def test_repository_add_parallel(tmpdir, parallel_repository, now):
+    v = OCFLVersion(now)
+    for i in range(50):
+        sd = StreamDigest(BytesIO(f"file {i}".encode()))
+        v.files.add(f"dir/file-{i}.txt", sd.stream, sd.digest)
+    o = OCFLObject("12345-abcde")
+    o.versions.append(v)
+    parallel_repository.add(o)
+
+    for i in range(50):
+        content = tmpdir.join(f"root/12345-abcde/v1/content/dir/file-{i}.txt")
+        assert content.read() == f"file {i}"
+
+
+def test_repository_add_parallel_failure(tmpdir, parallel_repository, now):
+    v = OCFLVersion(now)
+    for i in range(10):
+        sd = StreamDigest(BytesIO(f"file {i}".encode()))
+        v.files.add(f"file-{i}.txt", sd.stream, sd.digest)
+    v.files.add("broken.txt", FailingStream(), "0" * 128)
+    o = OCFLObject("12345-abcde")
+    o.versions.append(v)
+
+    with pytest.raises(OSError):
+        parallel_repository.add(o)
+    assert not exists(join(tmpdir, "root/12345-abcde"))
+
+
+def test_repository_add_lazy_streams(tmpdir, parallel_repository, now):
+    opened = []
+    open_now = set()
+    max_open = [0]
+
+    class CountingStream(BytesIO):
+        def __init__(self, name, data):
+            super().__init__(data)
+            self.name = name
+            open_now.add(name)
+            max_open[0] = max(max_open[0], len(open_now))
+
+        def close(self):
+            open_now.discard(self.name)
+            super().close()
+
+    def opener(name, data):
+        def open_stream():
+            opened.append(name)
+            return CountingStream(name, data)
+
+        return open_stream
+
+    v = OCFLVersion(now)
+    for i in range(40):
+        data = f"file {i % 20}".encode()
+        digest = hashlib.sha512(data).hexdigest()
+        v.files.add(f"file-{i}.txt", opener(f"file-{i}.txt", data), digest)
+    v.files.add_stream("deferred.txt", opener("deferred.txt", b"deferred"))
+    path_file = tmpdir.join("local.txt")
+    path_file.write("local")
+    v.files.add("local.txt", str(path_file), hashlib.sha512(b"local").hexdigest())
+    o = OCFLObject("12345-abcde")
+    o.versions.append(v)
+    parallel_repository.add(o)
+
+    # Duplicates are never opened, and all opened streams are closed.
+    assert sorted(opened) == sorted(
+        [f"file-{i}.txt" for i in range(20)] + ["deferred.txt"]
+    )
+    assert open_now == set()
+    assert max_open[0] <= parallel_repository.max_workers
+    obj_root = tmpdir.join("root/12345-abcde")
+    assert obj_root.join("v1/content/file-19.txt").read() == "file 19"
+    assert obj_root.join("v1/content/local.txt").read() == "local"
+
+
+def test_repository_add_version(tmpdir, repository, minimal_obj, now):
+    repository.add(minimal_obj)
+    v1_inventory = tmpdir.join("root/12345-abcde/v1/inventory.json").read()
+
+    unchanged = StreamDigest(BytesIO(b"minimal example"))
+    changed = StreamDigest(BytesIO(b"new file"))
+    v = OCFLVersion(now)
+    v.files.add("file.txt", unchanged.stream, unchanged.digest)
+    v.files.add("new.txt", changed.stream, changed.digest)
+    v.files.add_stream("streamed.txt", NonSeekableStream(b"streamed"))
+    repository.add_version("12345-abcde", v)
+
+    obj_root = tmpdir.join("root/12345-abcde")
+    inventory = json.loads(obj_root.join("inventory.json").read())
+    assert inventory["head"] == "v2"
+    assert set(inventory["versions"]) == {"v1", "v2"}
+    assert inventory["manifest"][unchanged.digest] == ["v1/content/file.txt"]
+    assert inventory["manifest"][changed.digest] == ["v2/content/new.txt"]
+    assert inventory["versions"]["v2"]["state"] == {
+        unchanged.digest: ["file.txt"],
+        changed.digest: ["new.txt"],
+        hashlib.sha512(b"streamed").hexdigest(): ["streamed.txt"],
+    }
+    assert (
+        obj_root.join("v2/inventory.json").read()
+        == obj_root.join("inventory.json").read()
+    )
+    assert obj_root.join("v1/inventory.json").read() == v1_inventory
+    # Only new content is written.
+    assert sorted(obj_root.join("v2/content").listdir()) == [
+        obj_root.join("v2/content/new.txt"),
+        obj_root.join("v2/content/streamed.txt"),
+    ]
+    sidecar = obj_root.join("inventory.json.SHA512").read()
+    assert (
+        sidecar.split()[0]
+        == hashlib.sha512(obj_root.join("inventory.json").read_binary()).hexdigest()
+    )
+
+
+def test_repository_add_version_not_found(repository, now):
+    with pytest.raises(ObjectNotFoundError):
+        repository.add_version("missing", OCFLVersion(now))
+
+
+def test_repository_add_version_rollback(
+    tmpdir, repository, minimal_obj, now, monkeypatch
+):
+    repository.add(minimal_obj)
+    obj_root = tmpdir.join("root/12345-abcde")
+    inventory = obj_root.join("inventory.json").read()
+    move = repository.storage.move
+
+    def failing_move(other_storage, path):
+        if path.endswith(".SHA512"):
+            raise OSError("Move failed.")
+        return move(other_storage, path)
+
+    monkeypatch.setattr(repository.storage, "move", failing_move)
+    sd = StreamDigest(BytesIO(b"new file"))
+    v = OCFLVersion(now)
+    v.files.add("new.txt", sd.stream, sd.digest)
+    with pytest.raises(OSError):
+        repository.add_version("12345-abcde", v)
+
+    # The new version directory is removed and the inventory restored.
+    assert not obj_root.join("v2").exists()
+    assert obj_root.join("inventory.json").read() == inventory
+    assert tmpdir.join("workspace").listdir() == [tmpdir.join("workspace/.staging")]
+    assert tmpdir.join("workspace/.staging").listdir() == []
+
+
+def make_objects(now, count, broken=()):
+    for i in range(count):
+        sd = StreamDigest(BytesIO(f"object {i}".encode()))
+        v = OCFLVersion(now)
+        v.files.add("file.txt", sd.stream, sd.digest)
+        if i in broken:
+            v.files.add("broken.txt", FailingStream(), "0" * 128)
+        o = OCFLObject(f"object-{i}")
+        o.versions.append(v)
+        yield o
+
+
+def test_repository_add_many(tmpdir, repository, now):
+    results = repository.add_many(make_objects(now, 10, broken={3}), workers=3)
+
+    assert sorted(r.id for r in results) == [f"object-{i}" for i in range(10)]
+    errors = {r.id: r.error for r in results if r.error is not None}
+    assert list(errors) == ["object-3"]
+    assert isinstance(errors["object-3"], OSError)
+    assert sorted(repository.list_objects()) == sorted(
+        f"object-{i}" for i in range(10) if i != 3
+    )
+
+
+def test_repository_add_many_checkpoint(tmpdir, repository, now):
+    checkpoint = str(tmpdir.join("checkpoint"))
+    results = repository.add_many(
+        make_objects(now, 6, broken={5}), workers=2, checkpoint=checkpoint
+    )
+    assert len(results) == 6
+    # Simulate an interruption after adding object-4 but before recording it.
+    lines = tmpdir.join("checkpoint").readlines()
+    tmpdir.join("checkpoint").write(
+        "".join(line for line in lines if "object-4" not in line) + '"obj'
+    )
+
+    results = repository.add_many(
+        make_objects(now, 6), workers=2, checkpoint=checkpoint
+    )
+    assert sorted(results) == [("object-4", None), ("object-5", None)]
+    assert sorted(repository.list_objects()) == [f"object-{i}" for i in range(6)]
+    assert repository.add_many(make_objects(now, 6), checkpoint=checkpoint) == []
+
+
+def test_repository_get(repository, minimal_obj, now):
+    repository.add(minimal_obj)
+    changed = StreamDigest(BytesIO(b"new file"))
+    v = OCFLVersion(now, message="Second version")
+    v.files.add("new.txt", changed.stream, changed.digest, fixity={"md5": "abc"})
+    repository.add_version("12345-abcde", v)
+
+    o = repository.get("12345-abcde")
+    assert o.id == "12345-abcde"
+    assert o.digest_algorithm == "sha512"
+    assert len(o.versions) == 2
+    assert o.versions[0].created == minimal_obj.head.created
+    assert o.head.message == "Second version"
+    with o.versions[0].files["file.txt"].open() as fp:
+        assert fp.read() == b"minimal example"
+    with o.head.files["new.txt"].open() as fp:
+        assert fp.read() == b"new file"
+    assert o.head.files["new.txt"].fixity == {"md5": "abc"}
+    assert "file.txt" not in o.head.files
+    assert o.head.state == {changed.digest: ["new.txt"]}
+
+
+def test_version_memory(now):
+    def held(func):
+        """Memory held by the result of a function, in bytes."""
+        gc.collect()
+        tracemalloc.start()
+        result = func()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return result, size
+
+    def create():
+        v = OCFLVersion(now)
+        for i in range(5000):
+            v.files.add(f"data/file-{i:05d}.txt", None, f"digest-{i}")
+        return v
+
+    def derive():
+        v = OCFLVersion.from_previous(v1, now)
+        v.files.replace("data/file-00001.txt", None, "digest-changed")
+        assert len(v.files) == 5000
+        return v
+
+    # Derived and loaded versions do not hold the unchanged files.
+    v1, full = held(create)
+    v2, derived = held(derive)
+    assert derived < full / 20
+    o = OCFLObject("12345-abcde")
+    o.versions.append(v1)
+    o.versions.append(v2)
+    loaded = object_from_inventory(
+        Inventory(o).to_dict(), FileSystemStorage("root"), "12345-abcde"
+    )
+    assert len(loaded.versions[0].files) == 5000
+    _, size = held(lambda: len(loaded.versions[1].files))
+    assert size < full / 20
+
+
+def test_version_from_previous_many_versions(now):
+    o = OCFLObject("12345-abcde")
+    v = OCFLVersion(now)
+    for i in range(10):
+        v.files.add(f"file-{i}.txt", None, f"digest-{i}")
+    o.versions.append(v)
+    for n in range(1, 1200):
+        v = OCFLVersion.from_previous(v, now)
+        v.files.replace(f"file-{n % 10}.txt", None, f"digest-{n + 10}")
+        o.versions.append(v)
+    expected = {f"digest-{n + 10}": [f"file-{n % 10}.txt"] for n in range(1190, 1200)}
+    assert "file-3.txt" in o.head.files
+    assert o.head.files["file-3.txt"].digest == "digest-1203"
+    assert len(o.head.files) == 10
+    assert o.head.state == expected
+    inventory = Inventory(o).to_dict()
+    assert inventory["versions"]["v1200"]["state"] == expected
+
+    loaded = object_from_inventory(inventory, FileSystemStorage("root"), "obj")
+    assert "file-3.txt" in loaded.head.files
+    assert loaded.head.files["file-3.txt"].digest == "digest-1203"
+    assert len(loaded.head.files) == 10
+    assert loaded.head.state == expected
+
+
+def test_rename_deferred_file(repository, now):
+    v1 = OCFLVersion(now)
+    v1.files.add_stream("x.txt", NonSeekableStream(b"hello"))
+    v2 = OCFLVersion.from_previous(v1, now)
+    v2.files.rename("x.txt", "y.txt")
+    o = OCFLObject("12345-abcde")
+    o.versions.append(v1)
+    o.versions.append(v2)
+    repository.add(o)
+
+    digest = hashlib.sha512(b"hello").hexdigest()
+    assert v2.files["y.txt"].digest == digest
+    o = repository.get("12345-abcde")
+    assert o.head.state == {digest: ["y.txt"]}
+    assert repository.validate("12345-abcde").valid
+
+
+def rewrite_inventory(directory, update):
+    """Rewrite an inventory, keeping its sidecar valid."""
+    inventory = json.loads(directory.join("inventory.json").read())
+    update(inventory)
+    data = json.dumps(inventory).encode("utf8")
+    directory.join("inventory.json").write_binary(data)
+    digest = hashlib.sha512(data).hexdigest()
+    directory.join("inventory.json.SHA512").write(f"{digest} inventory.json\n")
+
+
+def pad_versions(object_root, width):
+    """Rename the versions of an object to zero-padded names."""
+
+    def pad(path):
+        version, sep, rest = path.partition("/")
+        return f"v{int(version[1:]):0{width}d}{sep}{rest}"
+
+    def update(inventory):
+        inventory["head"] = pad(inventory["head"])
+        inventory["versions"] = {pad(k): v for k, v in inventory["versions"].items()}
+        for digests in [inventory["manifest"]] + list(inventory["fixity"].values()):
+            for digest, paths in digests.items():
+                digests[digest] = [pad(p) for p in paths]
+
+    for directory in object_root.listdir("v*"):
+        rewrite_inventory(directory, update)
+        directory.move(object_root.join(pad(directory.basename)))
+    rewrite_inventory(object_root, update)
+
+
+def test_repository_padded_versions(tmpdir, repository, minimal_obj, now):
+    repository.add(minimal_obj)
+    o = repository.get("12345-abcde")
+    v = OCFLVersion.from_previous(o.head, now)
+    v.files.add(
+        "new.txt", BytesIO(b"new file"), StreamDigest(BytesIO(b"new file")).digest
+    )
+    repository.add_version("12345-abcde", v)
+    object_root = tmpdir.join("root/12345-abcde")
+    pad_versions(object_root, 3)
+    assert repository.validate("12345-abcde").valid
+
+    o = repository.get("12345-abcde")
+    assert len(o.versions) == 2
+    assert sorted(f.logical_path for f in o.head.files) == ["file.txt", "new.txt"]
+    with o.head.files["new.txt"].open() as fp:
+        assert fp.read() == b"new file"
+
+    # New versions keep the zero-padding.
+    v = OCFLVersion.from_previous(o.head, now)
+    v.files.add("v3.txt", BytesIO(b"v3"), StreamDigest(BytesIO(b"v3")).digest)
+    repository.add_version("12345-abcde", v)
+    inventory = json.loads(object_root.join("inventory.json").read())
+    assert inventory["head"] == "v003"
+    assert sorted(inventory["versions"]) == ["v001", "v002", "v003"]
+    assert object_root.join("v003/content/v3.txt").read() == "v3"
+    assert repository.validate("12345-abcde").valid
+
+    inventory["head"] = "v999"
+    with pytest.raises(ConstraintException):
+        UpdatedInventory(inventory, v)
+
+
+def test_repository_add_version_from_previous(tmpdir, repository, minimal_obj, now):
+    repository.add(minimal_obj)
+    o = repository.get("12345-abcde")
+    changed = StreamDigest(BytesIO(b"new file"))
+    v = OCFLVersion.from_previous(o.head, now)
+    v.files.add("new.txt", changed.stream, changed.digest)
+    v.files.rename("file.txt", "data/file.txt")
+    repository.add_version("12345-abcde", v)
+
+    o = repository.get("12345-abcde")
+    # Loaded versions only hold their changes to the previous version.
+    assert o.head.files.parent is o.versions[0].files
+    assert sorted(f.logical_path for f in o.head.files.changed()) == [
+        "data/file.txt",
+        "new.txt",
+    ]
+    with o.head.files["data/file.txt"].open() as fp:
+        assert fp.read() == b"minimal example"
+    assert "file.txt" not in o.head.files
+    inventory = json.loads(tmpdir.join("root/12345-abcde/inventory.json").read())
+    assert o.head.state == inventory["versions"]["v2"]["state"]
+    assert repository.validate("12345-abcde").valid
+
+
+def test_repository_inventory_cache(tmpdir, repository, minimal_obj, now):
+    cache = InventoryCache(directory=str(tmpdir.join("cache")))
+    repository.inventory_cache = cache
+    repository.add(minimal_obj)
+
+    assert repository.get("12345-abcde").versions[0].files["file.txt"]
+    repository.get("12345-abcde")
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Updates are seen through the sidecar digest.
+    v = OCFLVersion(now)
+    sd = StreamDigest(BytesIO(b"new"))
+    v.files.add("new.txt", sd.stream, sd.digest)
+    repository.add_version("12345-abcde", v)
+    assert len(repository.get("12345-abcde").versions) == 2
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    # The on-disk cache is shared with other caches.
+    other = InventoryCache(directory=str(tmpdir.join("cache")))
+    repository.inventory_cache = other
+    assert len(repository.get("12345-abcde").versions) == 2
+    assert (other.disk_hits, other.misses) == (1, 0)
+
+    # Tampered inventories are not served from the cache.
+    tmpdir.join("root/12345-abcde/inventory.json.SHA512").write("0" * 128)
+    with pytest.raises(InvalidInventoryError):
+        repository.get("12345-abcde")
+
+
+def test_inventory_cache_eviction(tmpdir, repository, now):
+    repository.add_many(make_objects(now, 3))
+    inventory = json.loads(tmpdir.join("root/object-0/inventory.json").read())
+    size = parsed_size(inventory)
+    assert size > tmpdir.join("root/object-0/inventory.json").size()
+    cache = InventoryCache(max_bytes=2 * size + size // 2)
+    for i in [0, 1, 0, 2]:
+        cache.load(repository.storage, f"object-{i}", f"object-{i}")
+    # object-1 was the least recently used.
+    assert len(cache) == 2
+    assert cache.size <= cache.max_bytes
+    cache.load(repository.storage, "object-0", "object-0")
+    cache.load(repository.storage, "object-1", "object-1")
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_repository_get_invalid_sidecar(tmpdir, repository, minimal_obj):
+    repository.add(minimal_obj)
+    tmpdir.join("root/12345-abcde/inventory.json.SHA512").write("abc inventory.json")
+
+    with pytest.raises(InvalidInventoryError):
+        repository.get("12345-abcde")
+    with pytest.raises(ObjectNotFoundError):
+        repository.get("missing")
+
+
+def test_repository_add_versions(tmpdir, repository, minimal_obj, now):
+    changed = StreamDigest(BytesIO(b"new file"))
+    v = OCFLVersion(now)
+    v.files.add("new.txt", changed.stream, changed.digest)
+    minimal_obj.versions.append(v)
+    repository.add(minimal_obj)
+
+    obj_root = tmpdir.join("root/12345-abcde")
+    v1 = json.loads(obj_root.join("v1/inventory.json").read())
+    v2 = json.loads(obj_root.join("v2/inventory.json").read())
+    assert v1["head"] == "v1"
+    assert list(v1["versions"]) == ["v1"]
+    assert len(v1["manifest"]) == 1
+    assert v2["head"] == "v2"
+    assert list(v2["versions"]) == ["v1", "v2"]
+    assert len(v2["manifest"]) == 2
+    assert (
+        obj_root.join("inventory.json").read()
+        == obj_root.join("v2/inventory.json").read()
+    )
+    # Single pass inventories are identical to separately built inventories.
+    for inventory in Inventory.for_versions(minimal_obj):
+        expected = Inventory(minimal_obj, version=int(inventory.head[1:]))
+        assert inventory.json == expected.json
+
+
+def test_repository_validate(tmpdir, repository, minimal_obj, now):
+    repository.add(minimal_obj)
+    report = repository.validate("12345-abcde")
+    assert report.valid
+    assert report.object_id == "12345-abcde"
+    assert report.metrics.files == 1
+    assert report.metrics.bytes == len(b"minimal example")
+    assert tmpdir.join("root/0=ocfl_1.1").read() == "ocfl_1.1\n"
+
+
+@pytest.mark.parametrize(
+    "corrupt,codes",
+    [
+        (lambda o: o.join("v1/content/file.txt").write("corrupted"), ["E092"]),
+        (lambda o: o.join("v1/content/file.txt").remove(), ["E092"]),
+        (lambda o: o.join("v1/content/extra.txt").write("extra"), ["E023"]),
+        (lambda o: o.join("inventory.json.SHA512").write("0" * 128), ["E060"]),
+        (lambda o: o.join("v1/inventory.json.SHA512").remove(), ["E058"]),
+        (lambda o: o.join("0=ocfl_object_1.1").remove(), ["E003"]),
+        (lambda o: o.join("0=ocfl_object_1.1").write(""), ["E007"]),
+        (lambda o: o.join("inventory.json").remove(), ["E034"]),
+        (lambda o: o.join("inventory.json").write("{"), ["E033"]),
+    ],
+)
+def test_repository_validate_errors(tmpdir, repository, minimal_obj, corrupt, codes):
+    repository.add(minimal_obj)
+    corrupt(tmpdir.join("root/12345-abcde"))
+    report = repository.validate("12345-abcde")
+    assert [e.code for e in report.errors] == codes
+
+
+@pytest.mark.parametrize(
+    "update,code",
+    [
+        (lambda i: i.update(manifest=[]), "E041"),
+        (lambda i: i["manifest"].update(abc="file.txt"), "E041"),
+        (lambda i: i.update(versions=["v1"]), "E044"),
+        (lambda i: i["versions"].update(v1=[]), "E048"),
+        (lambda i: i["versions"]["v1"].update(state=[]), "E050"),
+        (lambda i: i.update(fixity=[]), "E057"),
+        (lambda i: i.update(fixity={"md5": []}), "E057"),
+    ],
+)
+def test_repository_validate_malformed(tmpdir, repository, minimal_obj, update, code):
+    repository.add(minimal_obj)
+    rewrite_inventory(tmpdir.join("root/12345-abcde"), update)
+    report = repository.validate("12345-abcde")
+    assert [e.code for e in report.errors] == [code]
+
+
+def test_repository_validate_fixity(tmpdir, repository, now):
+    v = OCFLVersion(now)
+    sd = StreamDigest(BytesIO(b"data"), fixity=["md5"])
+    v.files.add("file.txt", sd.stream, sd.digest, fixity={"md5": "0" * 32})
+    o = OCFLObject("12345-abcde")
+    o.versions.append(v)
+    repository.add(o)
+    assert [e.code for e in repository.validate("12345-abcde").errors] == ["E093"]
+
+
+def test_repository_validate_all(tmpdir, repository, now):
+    repository.add_many(make_objects(now, 5))
+    tmpdir.join("root/object-2/v1/content/file.txt").write("corrupted")
+    reports = {r.object_id: r for r in repository.validate_all()}
+    assert sorted(reports) == [f"object-{i}" for i in range(5)]
+    assert [i for i in range(5) if not reports[f"object-{i}"].valid] == [2]
+
+    # Unexpected errors are reported for the object only.
+    rewrite_inventory(tmpdir.join("root/object-3"), lambda i: i.update(manifest=[]))
+    validator = Validator(repository.storage)
+    validate = validator._validate
+
+    def failing(executor, object_path):
+        if object_path.endswith("object-4"):
+            raise OSError("unreadable")
+        return validate(executor, object_path)
+
+    validator._validate = failing
+    reports = {r.object_path: r for r in repository.validate_all(validator)}
+    assert len(reports) == 5
+    codes = {
+        p.rpartition("/")[2]: [e.code for e in r.errors] for p, r in reports.items()
+    }
+    assert codes == {
+        "object-0": [],
+        "object-1": [],
+        "object-2": ["E092"],
+        "object-3": ["E041"],
+        "object-4": ["E000"],
+    }
+
+
+def test_repository_audit(tmpdir, repository, minimal_obj):
+    repository.add(minimal_obj)
+    cache = AuditCache(str(tmpdir.join("audit.db")))
+    auditor = Auditor(repository.storage, cache, interval=3600)
+
+    reports = list(repository.validate_all(validator=auditor))
+    assert [r.valid for r in reports] == [True]
+    assert (auditor.metrics.files, auditor.metrics.skipped) == (1, 0)
+    assert len(cache) == 1
+
+    # Verified files are skipped until due or changed.
+    reports = list(repository.validate_all(validator=auditor))
+    assert [r.valid for r in reports] == [True]
+    assert (auditor.metrics.files, auditor.metrics.skipped) == (0, 1)
+
+    tmpdir.join("root/12345-abcde/v1/content/file.txt").write("changed")
+    reports = list(repository.validate_all(validator=auditor))
+    assert [e.code for e in reports[0].errors] == ["E092"]
+    assert len(cache) == 0
+    cache.close()
+
+
+def test_repository_audit_deleted(tmpdir, repository, minimal_obj):
+    repository.add(minimal_obj)
+    cache = AuditCache(str(tmpdir.join("audit.db")))
+    auditor = Auditor(repository.storage, cache, interval=3600)
+    assert [r.valid for r in repository.validate_all(validator=auditor)] == [True]
+
+    # A file deleted after the object was listed is reported as missing.
+    validate_content = auditor._validate_content
+
+    def deleting(*args):
+        tmpdir.join("root/12345-abcde/v1/content/file.txt").remove()
+        return validate_content(*args)
+
+    auditor._validate_content = deleting
+    reports = list(repository.validate_all(validator=auditor))
+    assert [e.code for e in reports[0].errors] == ["E092"]
+    assert len(cache) == 0
+    cache.close()
+
+
+def test_audit_jitter(tmpdir):
+    cache = AuditCache(str(tmpdir.join("audit.db")))
+    auditor = Auditor(FileSystemStorage(tmpdir), cache, interval=1000, jitter=0.5)
+    intervals = [auditor.due_interval(f"obj/v1/content/{i}") for i in range(100)]
+    assert all(500 <= i <= 1000 for i in intervals)
+    # Files verified at the same time are due over the last half.
+    assert sum(i < 750 for i in intervals) > 25
+    assert sum(i >= 750 for i in intervals) > 25
+    assert Auditor(auditor.storage, cache, jitter=0).due_interval("a") == 30 * 86400
+    cache.close()
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(10000)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.consume(1000)
+    assert time.monotonic() - start >= 0.2
+
+
+@pytest.fixture()
+def tracer():
+    stats = StatsTracer()
+    set_tracer(stats)
+    yield stats
+    set_tracer(None)
+
+
+def test_instrumentation(tracer, repository, minimal_obj):
+    repository.add(minimal_obj)
+    sd = StreamDigest(BytesIO(b"data"))
+    sd.digest
+    sd.digest
+    InventoryContent(Inventory(minimal_obj)).bytes
+
+    stats = tracer.stats
+    assert stats["transaction.commit"]["count"] == 1
+    assert stats["transaction.write_many"]["bytes"] == len(b"minimal example")
+    assert stats["storage.move"]["count"] == 1
+    assert stats["storage.write"]["bytes"] > len(b"minimal example")
+    # Including the digest of minimal_obj, each computed once.
+    assert stats["stream.digest"]["count"] == 2
+    assert stats["stream.digest"]["bytes"] == len(b"minimal example") + 4
+    assert stats["inventory.bytes"]["count"] == 1
+    assert "transaction.commit" in tracer.summary()
+
+
+def test_instrumentation_ingest(tracer, repository, minimal_obj, now):
+    repository.add(minimal_obj)
+    stats = tracer.stats
+    # The version and root inventories, serialized while they are written.
+    assert stats["inventory.serialize"]["count"] == 2
+    size = len(Inventory(minimal_obj).json)
+    assert stats["inventory.serialize"]["bytes"] == 2 * size
+    assert "inventory.bytes" not in stats
+    assert "transaction.stage" not in stats
+
+    o = repository.get("12345-abcde")
+    v = OCFLVersion.from_previous(o.head, now)
+    v.files.add_stream("deferred.txt", NonSeekableStream(b"deferred"))
+    repository.add_version("12345-abcde", v)
+    assert stats["transaction.stage"]["count"] == 1
+    assert stats["transaction.stage"]["bytes"] == len(b"deferred")
+    assert stats["inventory.serialize"]["count"] == 4
+
+
+def test_instrumentation_rollback(tracer, repository, now):
+    spans = []
+    set_tracer(CallbackTracer(spans.append))
+    v = OCFLVersion(now)
+    v.files.add("broken.txt", FailingStream(), "0" * 128)
+    o = OCFLObject("12345-abcde")
+    o.versions.append(v)
+    with pytest.raises(OSError):
+        repository.add(o)
+    errors = {s.name: s.error for s in spans if s.error is not None}
+    assert isinstance(errors["transaction.write_many"], OSError)
+    assert "transaction.rollback" in [s.name for s in spans]
+
+
+def test_instrumentation_opentelemetry(repository, minimal_obj):
+    sdk_trace = pytest.importorskip("opentelemetry.sdk.trace")
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+
+    exporter = InMemorySpanExporter()
+    provider = sdk_trace.TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    set_tracer(OpenTelemetryTracer(provider.get_tracer("test")))
+    try:
+        repository.add(minimal_obj)
+    finally:
+        set_tracer(None)
+    spans = {s.name: s for s in exporter.get_finished_spans()}
+    assert spans["storage.move"].parent.span_id == (
+        spans["transaction.commit"].context.span_id
+    )
+    assert spans["transaction.write_many"].attributes["ocflcore.bytes"] == 15
+
+
+def test_inventory_iter_json(minimal_obj):
+    inventory = Inventory(minimal_obj)
+    assert b"".join(inventory.iter_json(chunksize=16)) == inventory.json
+
+    content = InventoryContent(inventory)
+    stream = content.stream()
+    assert stream.read(10) + stream.read() == inventory.json
+    assert stream.read() == b""
+    assert content.digest == hashlib.sha512(inventory.json).hexdigest()
+
+
+@pytest.mark.parametrize(
+    "layout,object_id,path",
+    [
+        (
+            HashedNTupleLayout(),
+            "object-01",
+            "3c0/ff4/240/"
+            "3c0ff4240c1e116dba14c7627f2319b58aa3d77606d0d90dfc6161608ac987d4",
+        ),
+        (
+            HashedNTupleLayout(
+                digest_algorithm="md5",
+                tuple_size=2,
+                number_of_tuples=15,
+                short_object_root=True,
+            ),
+            "object-01",
+            "ff/75/53/44/92/48/5e/ab/b3/9f/86/35/67/28/88/4e",
+        ),
+        (HashAndIdNTupleLayout(), "object-01", "3c0/ff4/240/object-01"),
+        (
+            HashAndIdNTupleLayout(),
+            "..hor/rib:le-$id",
+            "487/326/d8c/%2e%2ehor%2frib%3ale-%24id",
+        ),
+    ],
+)
+def test_hashed_layouts(layout, object_id, path):
+    assert layout.path_for_id(object_id) == path
+
+
+def test_repository_hashed_layout(tmpdir, minimal_obj):
+    storage = FileSystemStorage(tmpdir.mkdir("root"))
+    workspace_storage = FileSystemStorage(tmpdir.mkdir("workspace"))
+    root = StorageRoot(HashedNTupleLayout())
+    repository = OCFLRepository(root, storage, workspace_storage)
+    repository.initialize()
+    repository.add(minimal_obj)
+
+    layout = json.loads(tmpdir.join("root/ocfl_layout.json").read())
+    assert layout["extension"] == "0004-hashed-n-tuple-storage-layout"
+    config_path = "root/extensions/0004-hashed-n-tuple-storage-layout/config.json"
+    assert json.loads(tmpdir.join(config_path).read())["tupleSize"] == 3
+    object_path = HashedNTupleLayout().path_for_id("12345-abcde")
+    assert exists(join(tmpdir, "root", object_path, "inventory.json"))
+    with repository.get("12345-abcde").head.files["file.txt"].open() as fp:
+        assert fp.read() == (b"minimal example")
+
+
+def test_repository_index(tmpdir, minimal_obj, now):
+    storage = FileSystemStorage(tmpdir.mkdir("root"))
+    workspace_storage = FileSystemStorage(tmpdir.mkdir("workspace"))
+    index = ObjectIndex.for_storage(storage)
+    root = StorageRoot(HashedNTupleLayout())
+    repository = OCFLRepository(root, storage, workspace_storage, index=index)
+    repository.initialize()
+    repository.add(minimal_obj)
+    v = OCFLVersion(now)
+    v.files.add_stream("new.txt", BytesIO(b"new file"))
+    repository.add_version("12345-abcde", v)
+    other = OCFLObject("image-001")
+    other.versions.append(minimal_obj.versions[0])
+    repository.add(other)
+
+    entry = index.get("12345-abcde")
+    assert entry.path == HashedNTupleLayout().path_for_id("12345-abcde")
+    assert entry.head == "v2"
+    assert entry.size == storage.size(entry.path)
+    sidecar = tmpdir.join("root", entry.path, "inventory.json.SHA512").read()
+    assert entry.digest == sidecar.split()[0]
+    assert repository.exists("12345-abcde")
+    assert not repository.exists("missing")
+    assert list(repository.list_objects()) == ["12345-abcde", "image-001"]
+    assert [e.id for e in index.list(prefix="image")] == ["image-001"]
+    assert [e.id for e in index.list(pattern="*-abcde")] == ["12345-abcde"]
+    assert [e.id for e in index.list(after="12345-abcde")] == ["image-001"]
+    assert [e.id for e in index.list(limit=1, batch=1)] == ["12345-abcde"]
+
+    assert [e.id for e in index.list(pattern="*-*", limit=1, batch=1)] == [
+        "12345-abcde"
+    ]
+
+    # Patterns match the same objects with and without the index.
+    unindexed = OCFLRepository(root, storage, workspace_storage)
+    for pattern in ["*-abcde", "image-[!1]*", "[!1]*", "image-00?", "[^i]*", "*"]:
+        expected = sorted(unindexed.list_objects(pattern=pattern))
+        assert list(repository.list_objects(pattern=pattern)) == expected
+    assert list(repository.list_objects(pattern="[!1]*")) == ["image-001"]
+    with pytest.raises(ValueError):
+        unindexed.rebuild_index()
+
+    index.delete("12345-abcde")
+    repository.rebuild_index()
+    assert index.get("12345-abcde") == entry
+    assert len(index) == 2
+
+
+def test_storage_walk_objects_batches(tmpdir):
+    root = tmpdir.mkdir("root")
+    names = [f"obj-{i:02d}" for i in range(11)]
+    for name in names:
+        root.mkdir(name).join("0=ocfl_object_1.1").write("ocfl_object_1.1\n")
+    root.mkdir("extensions").mkdir("obj")
+    root.mkdir("nested").mkdir("obj").join("0=ocfl_object_1.1").write("")
+    storage = FileSystemStorage(root)
+    expected = list(storage.walk_objects())
+    assert expected == ["nested/obj"] + names
+
+    # Directories larger than a batch are read in several sorted batches.
+    storage.walk_batch = 3
+    assert list(storage.walk_objects()) == expected
+    assert list(storage.walk_objects(after="obj-05")) == names[6:]
+    assert list(storage.walk_objects(after="nested/obj")) == names
+
+
+@pytest.mark.parametrize("layout", [HashedNTupleLayout(), HashAndIdNTupleLayout()])
+def test_repository_list_objects_paginated(tmpdir, minimal_obj, layout):
+    storage = FileSystemStorage(tmpdir.mkdir("root"))
+    workspace_storage = FileSystemStorage(tmpdir.mkdir("workspace"))
+    repository = OCFLRepository(StorageRoot(layout), storage, workspace_storage)
+    repository.initialize()
+    ids = [f"page-{i}" for i in range(7)] + ["image-1", "image-2"]
+    for object_id in ids:
+        o = OCFLObject(object_id)
+        o.versions.append(minimal_obj.versions[0])
+        repository.add(o)
+
+    listed = []
+    cursor = None
+    while True:
+        listing = repository.list_objects(limit=4, cursor=cursor)
+        page = list(listing)
+        if not page:
+            break
+        assert len(page) <= 4
+        listed.extend(page)
+        cursor = listing.cursor
+    assert sorted(listed) == sorted(ids)
+
+    assert sorted(repository.list_objects(prefix="image")) == ["image-1", "image-2"]
+    assert sorted(repository.list_objects(pattern="page-[12]")) == [
+        "page-1",
+        "page-2",
+    ]
+    assert sorted(repository.list_objects(pattern=re.compile(r"page-\d"))) == [
+        f"page-{i}" for i in range(7)
+    ]
+
+
+@pytest.mark.parametrize("transfer_mode", ["copy", "link"])
+def test_storage_write_local_file(tmpdir, transfer_mode):
+    src = tmpdir.join("src.bin")
+    src.write_binary(b"0123456789" * 1000)
+    storage = FileSystemStorage(tmpdir.mkdir("root"), transfer_mode=transfer_mode)
+
+    with open(src, "rb") as fp:
+        assert storage.write("a/full.bin", fp) == 10000
+        assert fp.read() == b""
+    with open(src, "rb") as fp:
+        fp.seek(9000)
+        assert storage.write("a/rest.bin", fp) == 1000
+
+    full = tmpdir.join("root/a/full.bin")
+    assert full.read_binary() == src.read_binary()
+    assert tmpdir.join("root/a/rest.bin").read_binary() == b"0123456789" * 100
+    linked = os.stat(full).st_ino == os.stat(src).st_ino
+    assert linked == (transfer_mode == "link")
+
+
+def test_storage_invalid_transfer_mode(tmpdir):
+    with pytest.raises(ValueError):
+        FileSystemStorage(tmpdir, transfer_mode="move")
+
+
+@pytest.mark.parametrize("durability", ["none", "batch", "strict"])
+def test_storage_durability(tmpdir, durability):
+    workspace = FileSystemStorage(tmpdir.mkdir("workspace"), durability=durability)
+    storage = FileSystemStorage(tmpdir.mkdir("root"), durability=durability)
+    workspace.write("obj/v1/content/a.txt", BytesIO(b"a"))
+    workspace.write("obj/inventory.json", BytesIO(b"{}"))
+    workspace.sync("obj")
+    storage.move(workspace, "obj")
+    assert tmpdir.join("root/obj/v1/content/a.txt").read() == "a"
+    assert not tmpdir.join("workspace/obj").exists()
+
+    # Files are replaced atomically.
+    workspace.write("obj/inventory.json", BytesIO(b"{ }"))
+    storage.move(workspace, "obj/inventory.json")
+    assert tmpdir.join("root/obj/inventory.json").read() == "{ }"
+
+    with pytest.raises(ValueError):
+        FileSystemStorage(tmpdir, durability="eventually")
+
+
+def test_storage_move_cross_device(tmpdir, monkeypatch):
+    workspace = FileSystemStorage(tmpdir.mkdir("workspace"))
+    storage = FileSystemStorage(tmpdir.mkdir("root"))
+    replace = os.replace
+
+    def cross_device_replace(src, dst):
+        if str(src).startswith(str(tmpdir.join("workspace"))):
+            raise OSError(errno.EXDEV, "Cross-device link")
+        return replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", cross_device_replace)
+    workspace.write("obj/v1/content/a.txt", BytesIO(b"a"))
+    storage.move(workspace, "obj")
+    assert tmpdir.join("root/obj/v1/content/a.txt").read() == "a"
+    assert tmpdir.join("root").listdir() == [tmpdir.join("root/obj")]
+    assert not tmpdir.join("workspace/obj").exists()
+
+
+def test_storage_write_local_file_fallback(tmpdir, monkeypatch):
+    def unsupported(*args, **kwargs):
+        raise OSError("Not supported.")
+
+    for name in ["copy_file_range", "sendfile"]:
+        monkeypatch.setattr(os, name, unsupported, raising=False)
+    src = tmpdir.join("src.bin")
+    src.write_binary(b"0123456789" * 1000)
+    storage = FileSystemStorage(tmpdir.mkdir("root"))
+
+    with open(src, "rb") as fp:
+        fp.seek(10)
+        assert storage.write("rest.bin", fp) == 9990
+    assert tmpdir.join("root/rest.bin").read_binary() == src.read_binary()[10:]
+
+
+def test_storage_write_local_file_short_copy(tmpdir, monkeypatch):
+    src = tmpdir.join("src.bin")
+    src.write_binary(b"0123456789" * 1000)
+    storage = FileSystemStorage(tmpdir.mkdir("root"))
+
+    # Methods copying nothing are not supported, try the next one.
+    monkeypatch.setattr(os, "copy_file_range", lambda *a, **kw: 0, raising=False)
+    with open(src, "rb") as fp:
+        assert storage.write("full.bin", fp) == 10000
+    assert tmpdir.join("root/full.bin").read_binary() == src.read_binary()
+
+    # The source ends before it is fully copied.
+    def shrinking(dst_fd, src_fd, offset, count):
+        if offset >= 4000:
+            return 0
+        return os.write(dst_fd, os.pread(src_fd, min(count, 1000), offset))
+
+    monkeypatch.setattr(os, "sendfile", shrinking)
+    with open(src, "rb") as fp:
+        with pytest.raises(OSError):
+            storage.write("short.bin", fp)
+
+
+def test_storage_read_apis(tmpdir):
+    storage = FileSystemStorage(tmpdir)
+    tmpdir.join("file.bin").write_binary(b"0123456789")
+
+    with storage.open("file.bin") as fp:
+        assert fp.read(4) == b"0123"
+        fp.seek(8)
+        assert fp.read() == b"89"
+    with storage.read_range("file.bin", 2, 5) as fp:
+        assert fp.read(3) == b"234"
+        assert fp.read() == b"56"
+        assert fp.read() == b""
+    with storage.read_range("file.bin", 7) as fp:
+        assert fp.read() == b"789"
+    with storage.mmap("file.bin") as mm:
+        assert bytes(mm[3:6]) == b"345"
+    assert storage.read_file("file.bin").read() == b"0123456789"
+
+    missing = storage.open("missing.bin")
+    with pytest.raises(OCFLFileNotFoundError):
+        missing.read()
+    with pytest.raises(OCFLFileNotFoundError):
+        storage.mmap("missing.bin")
+
+
+def test_async_repository(tmpdir, now):
+    executor = ThreadPoolExecutor(max_workers=2)
+    storage = AsyncFileSystemStorage(tmpdir.mkdir("root"), executor=executor)
+    workspace = AsyncFileSystemStorage(tmpdir.mkdir("workspace"), executor=executor)
+    repository = AsyncOCFLRepository(StorageRoot(TopLevelLayout()), storage, workspace)
+
+    def make_object(i):
+        v = OCFLVersion(now)
+        v.files.add_stream("file.txt", BytesIO(f"file {i}".encode()))
+        o = OCFLObject(f"object-{i}")
+        o.versions.append(v)
+        return o
+
+    async def main():
+        await repository.initialize()
+        await asyncio.gather(*(repository.add(make_object(i)) for i in range(10)))
+        ids = [object_id async for object_id in repository.list_objects()]
+        paths = [path async for path in storage.list_objects()]
+        obj = await repository.get("object-3")
+        content = await storage.read_file("object-3/v1/content/file.txt")
+        return ids, paths, obj, content
+
+    ids, paths, obj, content = asyncio.run(main())
+    assert sorted(ids) == sorted(f"object-{i}" for i in range(10))
+    assert sorted(paths) == sorted(ids)
+    assert obj.head.files["file.txt"].digest == hashlib.sha512(b"file 3").hexdigest()
+    assert content.read() == b"file 3"
+
+
+def test_async_repository_threads(tmpdir, now):
+    executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="storage")
+    storage = AsyncFileSystemStorage(tmpdir.mkdir("root"), executor=executor)
+    workspace = AsyncFileSystemStorage(tmpdir.mkdir("workspace"), executor=executor)
+    repository = AsyncOCFLRepository(
+        StorageRoot(TopLevelLayout()), storage, workspace, max_workers=2
+    )
+    threads = set()
+
+    def record(span):
+        if span.name == "storage.write":
+            threads.add(threading.current_thread())
+
+    set_tracer(CallbackTracer(record))
+
+    def make_object(i):
+        v = OCFLVersion(now)
+        for name in ["a", "b", "c"]:
+            sd = StreamDigest(BytesIO(f"{name} {i}".encode()))
+            v.files.add(f"{name}.txt", sd.stream, sd.digest)
+        o = OCFLObject(f"object-{i}")
+        o.versions.append(v)
+        return o
+
+    async def main():
+        await repository.initialize()
+        await asyncio.gather(*(repository.add(make_object(i)) for i in range(10)))
+
+    try:
+        asyncio.run(main())
+    finally:
+        set_tracer(None)
+    # Concurrent ingests share the storage executor and the write threads.
+    names = sorted({t.name.rpartition("_")[0] for t in threads})
+    assert names == ["ocflcore-write", "storage"]
+    assert len(threads) <= 3 + 2
+    assert tmpdir.join("root/object-7/v1/content/c.txt").read() == "c 7"
+
+
+def test_async_repository_sync_workspace(tmpdir, minimal_obj):
+    storage = AsyncFileSystemStorage(tmpdir.mkdir("root"))
+    workspace = FileSystemStorage(tmpdir.mkdir("workspace"))
+    repository = AsyncOCFLRepository(StorageRoot(TopLevelLayout()), storage, workspace)
+    assert repository.repository.workspace_storage is workspace
+    tmpdir.mkdir("other").mkdir("dir").join("file.txt").write(b"moved")
+
+    async def main():
+        await repository.initialize()
+        await repository.add(minimal_obj)
+        await storage.move(FileSystemStorage(tmpdir.join("other")), "dir")
+        return await repository.exists(minimal_obj.id)
+
+    assert asyncio.run(main())
+    assert tmpdir.join("root/dir/file.txt").read() == "moved"
+
+
+@pytest.fixture()
+def s3_client(monkeypatch):
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket="ocfl")
+        yield client
+
+
+@pytest.mark.parametrize("s3_workspace", [False, True])
+def test_s3_repository(tmpdir, s3_client, now, s3_workspace):
+    from boto3.s3.transfer import TransferConfig
+
+    config = TransferConfig(multipart_threshold=5 * 1024**2, max_concurrency=4)
+    storage = S3Storage("ocfl", "root", client=s3_client, transfer_config=config)
+    if s3_workspace:
+        workspace_storage = S3Storage("ocfl", "workspace", client=s3_client)
+    else:
+        workspace_storage = FileSystemStorage(tmpdir.mkdir("workspace"))
+    layout = HashAndIdNTupleLayout()
+    repository = OCFLRepository(StorageRoot(layout), storage, workspace_storage)
+    repository.initialize()
+
+    large = b"x" * (6 * 1024**2)
+    v = OCFLVersion(now)
+    v.files.add_stream("large.bin", BytesIO(large))
+    v.files.add_stream("small.txt", BytesIO(b"small"))
+    o = OCFLObject("12345-abcde")
+    o.versions.append(v)
+    repository.add(o)
+    v = OCFLVersion(now)
+    v.files.add_stream("small.txt", BytesIO(b"changed"))
+    repository.add_version("12345-abcde", v)
+
+    path = layout.path_for_id("12345-abcde")
+    assert storage.exists(f"{path}/v1/content/large.bin")
+    assert storage.size(f"{path}/v1/content/large.bin") == len(large)
+    assert not workspace_storage.exists(path)
+    assert list(repository.list_objects()) == ["12345-abcde"]
+
+    obj = repository.get("12345-abcde")
+    with obj.versions[0].files["large.bin"].open() as fp:
+        assert fp.read() == large
+    with obj.head.files["small.txt"].open() as fp:
+        assert fp.read() == b"changed"
+    assert storage.read_range(f"{path}/v1/content/small.txt", 1, 3).read() == b"mal"
+
+
+def test_s3_walk_objects(s3_client):
+    storage = S3Storage("ocfl", "root", client=s3_client)
+    for path in ["a/obj1", "a/obj2", "b/c/obj3", "extensions/ext/obj"]:
+        storage.write(f"{path}/0=ocfl_object_1.1", BytesIO(b"ocfl_object_1.1\n"))
+        for i in range(20):
+            storage.write(f"{path}/v1/content/file-{i}.txt", BytesIO(b"content"))
+    listed = []
+
+    def count_keys(parsed, **kwargs):
+        listed.extend(o["Key"] for o in parsed.get("Contents", []))
+
+    s3_client.meta.events.register("after-call.s3.ListObjectsV2", count_keys)
+    assert list(storage.walk_objects()) == ["a/obj1", "a/obj2", "b/c/obj3"]
+    assert list(storage.walk_objects(after="a/obj1")) == ["a/obj2", "b/c/obj3"]
+    # Content of the objects is never listed.
+    assert not [key for key in listed if "/v1/" in key]